@@ -0,0 +1,141 @@
+"""
+Tabela compacta de aeroportos.
+
+O airportsdata.load('IATA') monta, em cada processo, um dict de dicts com
+todos os campos de ~8 mil aeroportos, mas o serviço só usa latitude e
+longitude. O build abaixo grava só isso, em um diretório no formato dos
+outros artefatos (um .npy por vetor + meta.json):
+
+- codigos.npy: códigos IATA ordenados;
+- coordenadas.npy: (lat, lon) em float32, na mesma ordem.
+
+A tabela abre com mmap na primeira consulta (as páginas vêm do page cache e
+são compartilhadas entre os workers). Como os códigos estão ordenados, o
+índice de um lote inteiro sai de um np.searchsorted; consultas avulsas usam
+um dict código -> índice montado na primeira vez.
+
+Build (o Dockerfile já roda):
+    python airport_table.py airport_table/
+"""
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+
+def construir_tabela(diretorio):
+    """Grava a tabela compacta a partir do airportsdata."""
+    codigos, coordenadas = _do_airportsdata()
+    os.makedirs(diretorio, exist_ok=True)
+    np.save(os.path.join(diretorio, 'codigos.npy'), codigos)
+    np.save(os.path.join(diretorio, 'coordenadas.npy'), coordenadas)
+    meta = {'airports': int(len(codigos)), 'source': 'airportsdata', 'built_at': time.strftime('%Y-%m-%dT%H:%M:%S')}
+    with open(os.path.join(diretorio, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    return meta
+
+
+def _do_airportsdata():
+    import airportsdata
+
+    base = airportsdata.load('IATA')
+    codigos = np.array(sorted(base))
+    coordenadas = np.array([(base[c]['lat'], base[c]['lon']) for c in codigos], dtype=np.float32)
+    return codigos, coordenadas
+
+
+class AirportTable:
+    """
+    Coordenadas por código IATA. Abre `diretorio` (gerado por
+    construir_tabela) na primeira consulta; sem o diretório, monta a mesma
+    tabela em memória a partir do airportsdata.
+    """
+
+    def __init__(self, diretorio=None):
+        self.diretorio = diretorio
+        self.origem = None
+        self._codigos = None
+        self._coordenadas = None
+        self._indice = None
+        self._lock = threading.Lock()
+
+    def _carregar(self):
+        with self._lock:
+            if self._codigos is not None:
+                return
+            inicio = time.perf_counter()
+            if self.diretorio and os.path.exists(os.path.join(self.diretorio, 'codigos.npy')):
+                codigos = np.load(os.path.join(self.diretorio, 'codigos.npy'))
+                # ndarray sobre o mmap: indexar um np.memmap linha a linha é bem mais lento
+                self._coordenadas = np.asarray(np.load(os.path.join(self.diretorio, 'coordenadas.npy'), mmap_mode='r'))
+                self.origem = self.diretorio
+            else:
+                codigos, self._coordenadas = _do_airportsdata()
+                self.origem = 'airportsdata'
+            self._codigos = codigos
+            print(f"Tabela de aeroportos carregada ({self.origem}): {len(codigos)} aeroportos "
+                  f"em {(time.perf_counter() - inicio) * 1000:.0f} ms")
+
+    @property
+    def codigos(self):
+        if self._codigos is None:
+            self._carregar()
+        return self._codigos
+
+    @property
+    def coordenadas_array(self):
+        """Matriz (n, 2) float32 de (lat, lon), na ordem de `codigos`."""
+        if self._codigos is None:
+            self._carregar()
+        return self._coordenadas
+
+    def _mapa(self):
+        if self._indice is None:
+            self._indice = {str(c): i for i, c in enumerate(self.codigos)}
+        return self._indice
+
+    def indice(self, iata_code):
+        """Posição do código na tabela, ou -1."""
+        return self._mapa().get(iata_code, -1)
+
+    def indices(self, codigos):
+        """Posições de um lote de códigos (vetorizado); -1 para os desconhecidos."""
+        codigos = np.asarray(codigos, dtype=str)
+        pos = np.searchsorted(self.codigos, codigos)
+        pos = np.minimum(pos, len(self.codigos) - 1)
+        return np.where(self.codigos[pos] == codigos, pos, -1)
+
+    def coordenadas(self, iata_code):
+        """(lat, lon) do aeroporto. KeyError se o código não existe."""
+        i = self.indice(iata_code)
+        if i < 0:
+            raise KeyError(iata_code)
+        lat, lon = self.coordenadas_array[i].tolist()
+        return lat, lon
+
+    def __contains__(self, iata_code):
+        return iata_code in self._mapa()
+
+    def __len__(self):
+        return len(self.codigos)
+
+    def __iter__(self):
+        return (str(c) for c in self.codigos)
+
+    def stats(self):
+        carregada = self._codigos is not None
+        return {
+            'loaded': carregada,
+            'source': self.origem,
+            'airports': int(len(self._codigos)) if carregada else None,
+            'nbytes': int(self._codigos.nbytes + self._coordenadas.nbytes) if carregada else None
+        }
+
+
+if __name__ == '__main__':
+    saida = sys.argv[1] if len(sys.argv) > 1 else 'airport_table'
+    meta = construir_tabela(saida)
+    print(f"Tabela de aeroportos gravada em {saida}: {meta['airports']} aeroportos")
@@ -1,150 +1,378 @@
+import contextlib
+import os
 import sys
+import threading
+import time
 import traceback
-import joblib
 import pandas as pd
 import numpy as np
-import lightgbm as lgb
 from flask import Flask, request, jsonify
-from datetime import datetime, timedelta
-import airportsdata
-import requests
+from feature_encoder import FEATURES, converter_data, features_da_data, arredondar_dep_time
+from model_registry import ModelRegistry, carregar_pacote, validar_pacote, categorias_conhecidas
+from micro_batching import MicroBatcher
+from inference_threads import ThreadGovernor
+from ttl_cache import LRUCache
+from weather import WeatherService, CADENCIA_PREVISAO
+from weather_cells import ForecastCells
+from airport_table import AirportTable
+from forecast_store import PersistentForecastCache
+from weather_history import HistoricalWeatherStore
+from circuit_breaker import CircuitBreaker
+from weather_providers import criar_provedor
+from weather_prefetch import ForecastPrefetcher
 
 # --- 2. CONFIGURAÇÃO DO APP ---
 app = Flask(__name__)
-MODEL_FILE = 'flight_delay_model.pkl'
-model = None
+# .pkl (joblib) ou .fotm (artefato compacto gerado por model_artifact.py)
+MODEL_FILE = os.getenv('MODEL_FILE', 'flight_delay_model.pkl')
+# Diretório gerado por `python tree_engine.py <modelo> --salvar DIR`. Quando
+# definido, o modelo é aberto com mmap (sem unpickle) e as páginas são
+# compartilhadas entre todos os workers do nó.
+MODEL_ARRAYS_DIR = os.getenv('MODEL_ARRAYS_DIR')
+CAMINHO_MODELO = MODEL_ARRAYS_DIR or MODEL_FILE
+# 'library' (predict da própria biblioteca) ou 'numpy' (tree_engine.FlatForest,
+# só para florestas do scikit-learn; o LightGBM continua no Booster)
+INFERENCE_ENGINE = os.getenv('INFERENCE_ENGINE', 'library').lower()
+# Threads de inferência somadas entre todos os workers do nó (padrão: núcleos disponíveis)
+INFERENCE_THREADS_TOTAL = int(os.getenv('INFERENCE_THREADS_TOTAL', '0')) or None
+# Linhas por thread de inferência; lotes menores que o dobro disso rodam em uma thread
+INFERENCE_ROWS_PER_THREAD = int(os.getenv('INFERENCE_ROWS_PER_THREAD', '1000'))
+# Workers do gunicorn (exportado pelo gunicorn.conf.py) para dividir o total de threads
+WEB_CONCURRENCY = int(os.getenv('WEB_CONCURRENCY', '1'))
+# Segundos entre verificações de um novo arquivo de modelo (0 desliga)
+MODEL_WATCH_INTERVAL = float(os.getenv('MODEL_WATCH_INTERVAL', '30'))
+# Token exigido no header X-Admin-Token dos endpoints /admin (sem token, ficam desligados)
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN')
+# Arquivo com o caminho do modelo trocado pelo /admin/reload. Os monitores de
+# todos os workers do nó o acompanham ('' desliga)
+MODEL_POINTER_FILE = os.getenv('MODEL_POINTER_FILE', 'modelo_publicado.txt')
+# Chamadas de uma linha no aquecimento (o lote sintético cobre todos os aeroportos)
+WARMUP_SINGLE_CALLS = int(os.getenv('WARMUP_SINGLE_CALLS', '50'))
+# Micro-batching do /predict: requisições concorrentes são pontuadas juntas
+MICRO_BATCHING = os.getenv('MICRO_BATCHING', 'on').lower() in ('1', 'true', 'on')
+MICRO_BATCH_MAX_SIZE = int(os.getenv('MICRO_BATCH_MAX_SIZE', '64'))
+MICRO_BATCH_WINDOW_MS = float(os.getenv('MICRO_BATCH_WINDOW_MS', '2'))
+# Cache de probabilidades por vetor de features (0 desliga)
+PREDICTION_CACHE_SIZE = int(os.getenv('PREDICTION_CACHE_SIZE', '50000'))
+PREDICTION_CACHE_TTL = float(os.getenv('PREDICTION_CACHE_TTL', '3600'))
+# Arredonda o DepTime para faixas de N minutos antes da previsão (0 = exato).
+# Aumenta os acertos do cache à custa de uma feature menos precisa.
+PREDICTION_CACHE_DEPTIME_BUCKET = int(os.getenv('PREDICTION_CACHE_DEPTIME_BUCKET', '0'))
+# Limite de voos por chamada em /predict/batch
+MAX_BATCH_SIZE = 5000
+# Probabilidade a partir da qual o voo é classificado como atrasado
+PREDICTION_THRESHOLD = float(os.getenv('PREDICTION_THRESHOLD', '0.5'))
 
 # --- 2.1 CONFIGURAÇÕES ADICIONAIS ---
 #  SUBSTITUA PELA SUA CHAVE REAL
 OPENWEATHER_API_KEY = "SUA_CHAVE_AQUI"
-# Carrega base de dados de aeroportos (IATA -> Cidade/País)
-print("--- CARREGANDO DADOS DE AEROPORTOS ---")
-try:
-    airports_db = airportsdata.load('IATA')
-    print(f"Banco de dados carregado: {len(airports_db)} aeroportos.")
-except Exception as e:
-    print(f"Erro ao carregar airportsdata: {e}")
-    airports_db = {}
+# Validade da previsão em cache por aeroporto (padrão: cadência de 3 h do provedor)
+WEATHER_CACHE_TTL = float(os.getenv('WEATHER_CACHE_TTL', str(CADENCIA_PREVISAO)))
+# 'openweather' (API real) ou 'recorded' (previsões gravadas/sintéticas, sem rede)
+WEATHER_PROVIDER = os.getenv('WEATHER_PROVIDER', 'openweather').lower()
+# Orçamento de latência de cada chamada ao provedor
+WEATHER_LATENCY_BUDGET_MS = float(os.getenv('WEATHER_LATENCY_BUDGET_MS', '5000'))
+# Quanto uma requisição espera pela busca já em andamento do mesmo aeroporto
+WEATHER_COALESCE_WAIT_MS = float(os.getenv('WEATHER_COALESCE_WAIT_MS', str(WEATHER_LATENCY_BUDGET_MS)))
+# Circuit breaker do provedor: abre após N falhas seguidas (ou chamadas acima do limite
+# de latência), fica aberto por OPEN_SECONDS e depois libera PROBES chamadas de teste
+WEATHER_BREAKER_FAILURES = int(os.getenv('WEATHER_BREAKER_FAILURES', '5'))
+WEATHER_BREAKER_SLOW_MS = float(os.getenv('WEATHER_BREAKER_SLOW_MS', str(WEATHER_LATENCY_BUDGET_MS)))
+WEATHER_BREAKER_OPEN_SECONDS = float(os.getenv('WEATHER_BREAKER_OPEN_SECONDS', '30'))
+WEATHER_BREAKER_PROBES = int(os.getenv('WEATHER_BREAKER_PROBES', '1'))
+# Previsão vencida há menos que isto responde na hora e é atualizada em segundo plano
+WEATHER_STALE_MAX_SECONDS = float(os.getenv('WEATHER_STALE_MAX_SECONDS', str(CADENCIA_PREVISAO)))
+# Conexões keep-alive mantidas com a OpenWeather por worker
+WEATHER_POOL_SIZE = int(os.getenv('WEATHER_POOL_SIZE', '10'))
+# Gravações do /forecast: a OpenWeather grava aqui, o 'recorded' lê daqui
+WEATHER_RECORDINGS_DIR = os.getenv('WEATHER_RECORDINGS_DIR')
+# Latência simulada pelo provedor 'recorded' (base + variação aleatória)
+WEATHER_STUB_LATENCY_MS = float(os.getenv('WEATHER_STUB_LATENCY_MS', '0'))
+WEATHER_STUB_JITTER_MS = float(os.getenv('WEATHER_STUB_JITTER_MS', '0'))
+# Arquivo SQLite com as previsões, compartilhado pelos workers do nó e mantido entre
+# restarts (ex.: /var/cache/flightontime/weather.sqlite). Vazio = só memória
+WEATHER_CACHE_PATH = os.getenv('WEATHER_CACHE_PATH')
+# Histórico compilado por weather_history.py: datas passadas usam o clima observado
+WEATHER_HISTORY_DIR = os.getenv('WEATHER_HISTORY_DIR')
+# Células de previsão: aeroportos a até N km de um mesmo centro (ou na mesma célula de
+# uma grade de N graus) compartilham a previsão. 0 = uma previsão por aeroporto
+WEATHER_CELL_RADIUS_KM = float(os.getenv('WEATHER_CELL_RADIUS_KM', '0'))
+WEATHER_GRID_DEG = float(os.getenv('WEATHER_GRID_DEG', '0'))
+# Prefetch em segundo plano: lista fixa (ex.: "GRU,CGH,GIG") e/ou os N aeroportos mais consultados
+WEATHER_PREFETCH_AIRPORTS = [a.strip().upper() for a in os.getenv('WEATHER_PREFETCH_AIRPORTS', '').split(',') if a.strip()]
+WEATHER_PREFETCH_TOP_N = int(os.getenv('WEATHER_PREFETCH_TOP_N', '0'))
+WEATHER_PREFETCH_INTERVAL = float(os.getenv('WEATHER_PREFETCH_INTERVAL', '60'))
+# Renova a previsão quando faltarem menos de N segundos para vencer
+WEATHER_PREFETCH_LEAD = float(os.getenv('WEATHER_PREFETCH_LEAD', '900'))
+WEATHER_PREFETCH_CONCURRENCY = int(os.getenv('WEATHER_PREFETCH_CONCURRENCY', '4'))
+# Chamadas por segundo permitidas ao provedor no prefetch, somando todos os workers
+# do nó (plano gratuito: 60/min); cada worker fica com WEATHER_RATE_LIMIT / WEB_CONCURRENCY
+WEATHER_RATE_LIMIT = float(os.getenv('WEATHER_RATE_LIMIT', '1'))
+# Previsões buscadas em paralelo por um mesmo /predict/batch (aeroportos fora do cache)
+WEATHER_BATCH_CONCURRENCY = int(os.getenv('WEATHER_BATCH_CONCURRENCY', '4'))
+# Tabela compacta de aeroportos (IATA -> lat/lon), gerada por `python airport_table.py`.
+# Abre na primeira consulta; sem o diretório, é montada a partir do airportsdata.
+AIRPORT_TABLE_DIR = os.getenv('AIRPORT_TABLE_DIR', 'airport_table')
+airports_db = AirportTable(AIRPORT_TABLE_DIR)
 
 #--- 2.2 CARREGAMENTO DO MODELO ---
+# O modelo em produção fica no registry. Cada requisição pega o bundle atual
+# uma vez (registry.atual()) e usa só ele, então uma recarga não afeta
+# requisições em andamento.
+governador = ThreadGovernor(INFERENCE_THREADS_TOTAL, WEB_CONCURRENCY, INFERENCE_ROWS_PER_THREAD)
+registry = ModelRegistry(
+    lambda caminho: carregar_pacote(caminho, INFERENCE_ENGINE, governador),
+    aquecedor=lambda pacote: aquecer_pacote(pacote),
+    ponteiro=MODEL_POINTER_FILE
+)
+
 print(f"--- INICIANDO SERVIDOR ---")
-print(f"Tentando carregar modelo: {MODEL_FILE}")
 try:
-    model = joblib.load(MODEL_FILE)
-    print("Modelo carregado com SUCESSO!")
+    # Um arquivo já trocado pelo /admin/reload vale sobre o MODEL_FILE
+    pacote_inicial = carregar_pacote(registry.caminho_publicado() or CAMINHO_MODELO,
+                                     INFERENCE_ENGINE, governador)
+    validar_pacote(pacote_inicial)
+    registry.publicar(pacote_inicial)
+    print(f"Modelo carregado com SUCESSO! Versão: {pacote_inicial.version}")
 except Exception as e:
     print(f"❌ ERRO CRÍTICO AO CARREGAR MODELO: {e}")
     traceback.print_exc()
 
+micro_batcher = MicroBatcher(MICRO_BATCH_MAX_SIZE, MICRO_BATCH_WINDOW_MS) if MICRO_BATCHING else None
+
+cache_previsoes = LRUCache(PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL) if PREDICTION_CACHE_SIZE > 0 else None
+if cache_previsoes is not None:
+    # Probabilidades de um modelo não valem para o próximo
+    registry.ao_trocar(lambda novo, anterior: cache_previsoes.limpar())
+
+_tarefas_iniciadas_pid = None
+
+def iniciar_tarefas_de_fundo():
+    """
+    Sobe as threads de fundo (aquecimento e monitor do modelo, prefetch de
+    clima). Precisa rodar
+    depois do fork: com preload_app o gunicorn chama isto no post_fork de
+    cada worker; rodando direto (python app.py), no __main__.
+    """
+    global _tarefas_iniciadas_pid
+    if _tarefas_iniciadas_pid == os.getpid():
+        return
+    _tarefas_iniciadas_pid = os.getpid()
+
+    # Pools OpenMP/BLAS limitados ao teto deste worker
+    governador.limitar_pools_nativos()
+
+    # O modelo publicado no import chega frio em cada worker: aquece aqui,
+    # fora do caminho das requisições, e o /health/ready só libera depois
+    pacote = registry.atual()
+    if pacote is not None and pacote.aquecimento is None:
+        threading.Thread(target=aquecer_pacote, args=(pacote,),
+                         name='model-warmup', daemon=True).start()
+
+    if MODEL_WATCH_INTERVAL > 0:
+        registry.monitorar(MODEL_WATCH_INTERVAL)
+
+    if prefetch_clima.ativo:
+        prefetch_clima.iniciar()
+
 # --- FUNÇÕES DE CLIMA ---
-def classificar_clima(main_weather):
-    """
-    Mapeia o 'main' do OpenWeather para as categorias do modelo.
-    Categorias do modelo: ['Good', 'Moderate', 'Severe', 'critical']
-    
-    Valores comuns de 'main' na OpenWeather:
-    Thunderstorm, Drizzle, Rain, Snow, Mist, Smoke, Haze, Dust, Fog, Sand, Ash, Squall, Tornado, Clear, Clouds
-    """
-    if not main_weather:
-        return 'Good'
-        
-    main_weather = main_weather.lower()
-    
-    # 1. Critical: Tempestades violentas e eventos extremos
-    if main_weather in ['thunderstorm', 'tornado', 'squall', 'ash']:
-        return 'critical'
-        
-    # 2. Severe: Neve e visibilidade severamente reduzida (Areia/Poeira)
-    elif main_weather in ['snow', 'sand', 'dust']:
-        return 'Severe'
-        
-    # 3. Moderate: Chuva, Garoa e Visibilidade reduzida (Neblina)
-    elif main_weather in ['rain', 'drizzle', 'mist', 'fog', 'haze', 'smoke']:
-        return 'Moderate'
-        
-    # 4. Good: Céu limpo ou nublado (sem precipitação)
-    elif main_weather in ['clear', 'clouds']:
-        return 'Good'
-        
-    # Padrão de segurança
-    return 'Good'
+# A previsão completa de cada aeroporto fica em cache (weather.py); a API só
+# é chamada de novo depois de WEATHER_CACHE_TTL segundos
+provedor_clima = criar_provedor(
+    WEATHER_PROVIDER,
+    api_key=OPENWEATHER_API_KEY,
+    orcamento_ms=WEATHER_LATENCY_BUDGET_MS,
+    conexoes=WEATHER_POOL_SIZE,
+    diretorio=WEATHER_RECORDINGS_DIR,
+    latencia_ms=WEATHER_STUB_LATENCY_MS,
+    variacao_ms=WEATHER_STUB_JITTER_MS
+)
+print(f"Provedor de clima: {provedor_clima.nome}")
+FONTE_CLIMA = provedor_clima.fonte
+servico_clima = WeatherService(
+    airports_db, provedor_clima,
+    cache_ttl=WEATHER_CACHE_TTL,
+    espera_s=WEATHER_COALESCE_WAIT_MS / 1000.0,
+    disjuntor=CircuitBreaker(
+        falhas_para_abrir=WEATHER_BREAKER_FAILURES,
+        limite_latencia_s=WEATHER_BREAKER_SLOW_MS / 1000.0,
+        tempo_aberto_s=WEATHER_BREAKER_OPEN_SECONDS,
+        sondas=WEATHER_BREAKER_PROBES
+    ),
+    max_vencida_s=WEATHER_STALE_MAX_SECONDS,
+    celulas=ForecastCells(airports_db, resolucao_graus=WEATHER_GRID_DEG, raio_km=WEATHER_CELL_RADIUS_KM),
+    cache=PersistentForecastCache(WEATHER_CACHE_PATH, ttl=WEATHER_CACHE_TTL) if WEATHER_CACHE_PATH else None,
+    historico=HistoricalWeatherStore(WEATHER_HISTORY_DIR) if WEATHER_HISTORY_DIR else None,
+    concorrencia_lote=WEATHER_BATCH_CONCURRENCY
+)
+celulas_clima = servico_clima.celulas.stats()
+if celulas_clima['mode'] != 'airport':
+    print(f"Células de previsão: modo {celulas_clima['mode']}, "
+          f"{celulas_clima['cells']} células para {celulas_clima['airports']} aeroportos")
+prefetch_clima = ForecastPrefetcher(
+    servico_clima,
+    aeroportos=WEATHER_PREFETCH_AIRPORTS,
+    top_n=WEATHER_PREFETCH_TOP_N,
+    intervalo=WEATHER_PREFETCH_INTERVAL,
+    antecedencia=WEATHER_PREFETCH_LEAD,
+    concorrencia=WEATHER_PREFETCH_CONCURRENCY,
+    taxa_por_segundo=WEATHER_RATE_LIMIT,
+    workers=WEB_CONCURRENCY
+)
 
 def consultar_clima(iata_code, data_iso):
     """
-    Adaptação para Plano Gratuito:
-    - Passado: Retorna 'Good' (API bloqueada).
-    - Futuro (>5 dias): Retorna 'Good' (Limite da API).
-    - Futuro (<=5 dias): Consulta API Forecast.
+    Categoria de clima do modelo + 'main' da OpenWeather (ou o motivo do
+    padrão) + detalhes (previsão vencida, estado do circuito do provedor).
     """
-    if iata_code not in airports_db:
-        return 'Good', 'Aeroporto desconhecido'
+    return servico_clima.consultar(iata_code, data_iso)
 
-    airport = airports_db[iata_code]
-    lat, lon = airport['lat'], airport['lon']
-    
+def consultar_clima_lote(iata_codes, datas):
+    """
+    consultar_clima para um lote (datas já convertidas): vetores alinhados
+    de categoria, 'main' e previsão vencida. Uma previsão por aeroporto.
+    """
+    return servico_clima.consultar_lote(iata_codes, datas)
+
+def contexto_clima(weather_cat, weather_main, detalhes):
+    """Bloco weather_context das respostas."""
+    return {
+        'main': weather_main,
+        'category_used': weather_cat,
+        'source': FONTE_CLIMA,
+        'stale': detalhes['stale'],
+        'breaker_state': detalhes['breaker_state']
+    }
+
+# --- FUNÇÕES DE FEATURE ENGINEERING ---
+def extrair_campos(data_json):
+    """Aceita tanto os nomes antigos quanto os novos (padrão IATA)."""
+    origem = data_json.get('sg_iata_origem') or data_json.get('origem')
+    destino = data_json.get('sg_iata_destino') or data_json.get('destino')
+    data_str = data_json.get('dt_partida_prevista') or data_json.get('data_partida')
+    return origem, destino, data_str
+
+def converter_datas(datas_str):
+    """
+    Converte uma lista de datas de uma só vez.
+    Usa o parser ISO8601 vetorizado e só cai para a conversão item a item
+    (mesmo comportamento do /predict) nos valores que ele não reconhece.
+    Datas inválidas viram NaT.
+    """
+    serie = pd.Series(datas_str, dtype=object)
     try:
-        target_date = pd.to_datetime(data_iso)
-        now = datetime.now()
-        target_timestamp = int(target_date.timestamp())
-    except:
-        return 'Good', 'Erro na data'
-
-    # --- Logica Consulta API ---
-
-    if target_date < now:
-        # PLANO FREE NÃO TEM HISTÓRICO.
-        # Não chamamos a API para evitar erro 401.
-        print(f"Data no passado ({target_date}). Plano gratuito não permite histórico. Usando padrão.")
-        return 'Good', 'Sem Histórico (Plano Gratuito)'
-    
-    elif target_date > now + timedelta(days=5):
-        print(f"Data muito distante ({target_date}). Limite é 5 dias.")
-        return 'Good', 'Data excede limite 5 dias'
-    
-    else:
-        # PREVISÃO (Disponível no Free)
-        url = (f"https://api.openweathermap.org/data/2.5/forecast"
-               f"?lat={lat}&lon={lon}"
-               f"&appid={OPENWEATHER_API_KEY}")
-        
-        print(f"Consultando Previsão: {iata_code} em {target_date}...")
+        convertidas = pd.to_datetime(serie, format='ISO8601', errors='coerce')
+    except (ValueError, TypeError):
+        # Ex.: fusos horários misturados no mesmo lote
+        convertidas = pd.Series([pd.NaT] * len(serie), dtype=object)
+
+    faltantes = convertidas.isna().to_numpy().nonzero()[0]
+    if len(faltantes) == 0:
+        return convertidas
 
+    convertidas = convertidas.astype(object)
+    for i in faltantes:
         try:
-            response = requests.get(url, timeout=5)
-            data = response.json()
-
-            if response.status_code != 200:
-                msg = data.get('message', 'Erro desconhecido')
-                print(f"   -> Erro API: {msg}")
-                return 'Good', f"Erro API: {msg}"
-
-            # Procura o horário mais próximo na lista de 3 em 3 horas
-            lista_previsoes = data.get('list', [])
-            weather_main = None
-            melhor_dif = float('inf')
-
-            for item in lista_previsoes:
-                dt_item = int(item['dt'])
-                dif = abs(dt_item - target_timestamp)
-                
-                if dif < melhor_dif:
-                    melhor_dif = dif
-                    weather_main = item['weather'][0]['main']
-                
-                # Se a diferença for menor que 90 min, é o slot perfeito
-                if dif < 5400: 
-                    break
-            
-            if weather_main:
-                cat = classificar_clima(weather_main)
-                print(f"   -> Previsão: '{weather_main}' -> '{cat}'")
-                return cat, weather_main
-            
-            return 'Good', 'Sem dados correspondentes'
+            convertidas.iat[i] = pd.to_datetime(serie.iat[i])
+        except Exception:
+            convertidas.iat[i] = pd.NaT
+    return convertidas
+
+def colunas_lote(datas, origens, destinos, climas):
+    """Monta as colunas de features do lote inteiro de forma vetorizada."""
+    if isinstance(datas, pd.Series) and pd.api.types.is_datetime64_any_dtype(datas):
+        meses = datas.dt.month.to_numpy()
+        dias_semana = datas.dt.dayofweek.to_numpy() + 1
+        dep_times = (datas.dt.hour * 100 + datas.dt.minute).to_numpy()
+    else:
+        meses = np.array([d.month for d in datas])
+        dias_semana = np.array([d.dayofweek + 1 for d in datas])
+        dep_times = np.array([d.hour * 100 + d.minute for d in datas])
+
+    return {
+        'Month': meses.astype(int),
+        'DayOfWeek': dias_semana.astype(int),
+        'DepTime': dep_times.astype(float),
+        'Origin': [str(o) for o in origens],
+        'Dest': [str(d) for d in destinos],
+        'weather_category': [str(c) for c in climas]
+    }
+
+def anunciar_previsao(pacote):
+    """
+    Anuncia a requisição ao micro-batcher logo na entrada do /predict, para
+    que o lote em formação espere por ela. Sem batching (ou sem encoder, no
+    caminho com DataFrame) devolve um contexto vazio.
+    """
+    if micro_batcher is None or pacote.encoder is None:
+        return contextlib.nullcontext()
+    return micro_batcher.requisicao()
 
-        except Exception as e:
-            print(f"   -> Exceção: {e}")
-            return 'Good', 'Erro Conexão'
+def chave_previsao(pacote, features):
+    """Chave do cache: versão do modelo + features já processadas, na ordem do treino."""
+    return (pacote.version,) + tuple(features[nome] for nome in FEATURES)
+
+def erro_item(indice, mensagem):
+    return {'index': indice, 'status': 'error', 'message': mensagem}
+
+# --- AQUECIMENTO DO MODELO ---
+def aquecer_pacote(pacote):
+    """
+    Passa um lote sintético pelo mesmo caminho do /predict/batch (datas,
+    colunas, encoder, inferência) e repete o caminho do /predict em uma
+    linha, cobrindo todos os aeroportos e categorias de clima conhecidos
+    pelo modelo. Só a consulta de clima fica de fora, para não chamar a API.
+    O resultado fica em pacote.aquecimento e alimenta o /health/ready.
+    """
+    pacote.aquecimento = {'status': 'running', 'started_at': time.strftime('%Y-%m-%dT%H:%M:%S')}
+    try:
+        aeroportos, climas = categorias_conhecidas(pacote)
+        datas_str, origens, destinos, climas_lote = [], [], [], []
+        for i, origem in enumerate(aeroportos):
+            for j, clima in enumerate(climas):
+                datas_str.append(f"2025-{(i + j) % 12 + 1:02d}-{(i + j) % 28 + 1:02d}"
+                                 f"T{(6 + 4 * j) % 24:02d}:{i % 60:02d}:00")
+                origens.append(origem)
+                destinos.append(aeroportos[(i + 1) % len(aeroportos)])
+                climas_lote.append(clima)
+
+        inicio = time.perf_counter()
+        colunas = colunas_lote(converter_datas(datas_str), origens, destinos, climas_lote)
+        pacote.probabilidades(pacote.entrada_lote(colunas))
+        lote_ms = (time.perf_counter() - inicio) * 1000
+
+        chamadas = min(WARMUP_SINGLE_CALLS, len(datas_str))
+        inicio = time.perf_counter()
+        for k in range(chamadas):
+            mes, dia_semana, dep_time = features_da_data(converter_data(datas_str[k]))
+            X = pacote.entrada_unica({
+                'Month': mes,
+                'DayOfWeek': dia_semana,
+                'DepTime': dep_time,
+                'Origin': origens[k],
+                'Dest': destinos[k],
+                'weather_category': climas_lote[k]
+            })
+            pacote.probabilidades(X)
+        unica_ms = (time.perf_counter() - inicio) * 1000
+
+        pacote.aquecimento = {
+            'status': 'done',
+            'rows': len(datas_str),
+            'single_calls': chamadas,
+            'batch_ms': round(lote_ms, 2),
+            'single_ms': round(unica_ms, 2),
+            'duration_ms': round(lote_ms + unica_ms, 2),
+            'started_at': pacote.aquecimento['started_at'],
+            'finished_at': time.strftime('%Y-%m-%dT%H:%M:%S')
+        }
+        print(f"Modelo aquecido ({pacote.version}): {len(datas_str)} voos sintéticos "
+              f"em {pacote.aquecimento['duration_ms']:.0f} ms")
+    except Exception as e:
+        print(f"❌ Falha no aquecimento do modelo: {e}")
+        traceback.print_exc()
+        pacote.aquecimento = {'status': 'error', 'message': str(e)}
+        raise
 
 # --- 3. ENDPOINT HEALTH (Blindado contra erros 500) ---
 
@@ -152,13 +380,14 @@ def consultar_clima(iata_code, data_iso):
 def health():
     try:
        
-        model_obj = globals().get('model')
-        is_up = model_obj is not None
+        is_up = registry.atual() is not None
 
+        # Mantém o contrato antigo (UP com modelo carregado); a prontidão
+        # para receber tráfego fica no campo "ready" e no /health/ready
         status_data = {
             "status": "UP" if is_up else "DOWN",
             "service": "modelos-ml",
-            "model_loaded": is_up
+            **registry.status()
         }
 
         code = 200 if is_up else 503
@@ -171,81 +400,286 @@ def health():
         traceback.print_exc()
         return jsonify({'status': 'ERROR', 'message': str(e)}), 500
 
+@app.route('/health/live', methods=['GET'])
+def health_live():
+    """Liveness: o processo está de pé e respondendo. Não depende do modelo."""
+    return jsonify({'status': 'UP', 'service': 'modelos-ml'}), 200
+
+@app.route('/health/ready', methods=['GET'])
+def health_ready():
+    """
+    Readiness: modelo carregado e aquecido neste worker. Responde 503
+    enquanto o aquecimento não termina, para o balanceador não mandar
+    tráfego a um processo frio.
+    """
+    # Rodando sem gunicorn/__main__ (ex.: flask run), o primeiro probe dispara o aquecimento
+    iniciar_tarefas_de_fundo()
+
+    pacote = registry.atual()
+    pronto = pacote is not None and pacote.aquecido
+    status_data = {
+        'status': 'READY' if pronto else 'NOT_READY',
+        'service': 'modelos-ml',
+        'model_version': pacote.version if pacote else None,
+        'warmup': pacote.aquecimento if pacote else None
+    }
+    return jsonify(status_data), 200 if pronto else 503
+
 # --- 4. ENDPOINT PREDICT (Com validação solicitada) ---
 
 
 @app.route('/predict', methods=['POST'])
 def predict():
-    # Verifica modelo
-    current_model = globals().get('model')
-    if current_model is None:
+    # Verifica modelo (o mesmo bundle é usado até o fim da requisição)
+    pacote = registry.atual()
+    if pacote is None:
         return jsonify({'message': 'Modelo offline - falha no carregamento', 'status': 'error'}), 503
 
-    try:
-        data_json = request.get_json()
-        if not data_json:
-            return jsonify({'status': 'error', 'message': 'JSON vazio.'}), 400
-
-
-# Aceita tanto os nomes antigos quanto os novos (padrão IATA)
-        origem = data_json.get('sg_iata_origem') or data_json.get('origem')
-        destino = data_json.get('sg_iata_destino') or data_json.get('destino')
-        data_str = data_json.get('dt_partida_prevista') or data_json.get('data_partida')
-       
-        if not all([origem, destino, data_str]):
-            return jsonify({'message': 'Faltam campos obrigatórios'}), 400
-
-        weather_cat, weather_main = consultar_clima(origem, data_str)
-
-        # 2. Feature Engineering
+    with anunciar_previsao(pacote) as micro:
         try:
-            dt_obj = pd.to_datetime(data_str)
-        except:
-            return jsonify({'message': 'Formato de data inválido'}), 400
-
-        features = {
-            'Month': int(dt_obj.month),
-            'DayOfWeek': int(dt_obj.dayofweek) + 1,
-            'DepTime': float(dt_obj.hour * 100 + dt_obj.minute),
-            'Origin': str(origem),
-            'Dest': str(destino),
-            'weather_category': str(weather_cat)
-        }
-
-        # Cria DataFrame
-        df_input = pd.DataFrame([features])
-        
-        # Conversão obrigatória para category (LightGBM)
-        for col in ['Origin', 'Dest', 'weather_category']:
-            df_input[col] = df_input[col].astype('category')
+            data_json = request.get_json()
+            if not data_json:
+                return jsonify({'status': 'error', 'message': 'JSON vazio.'}), 400
+
+            origem, destino, data_str = extrair_campos(data_json)
+
+            if not all([origem, destino, data_str]):
+                return jsonify({'message': 'Faltam campos obrigatórios'}), 400
+
+            weather_cat, weather_main, detalhes_clima = consultar_clima(origem, data_str)
+
+            # 2. Feature Engineering
+            try:
+                dt_obj = converter_data(data_str)
+            except:
+                return jsonify({'message': 'Formato de data inválido'}), 400
+
+            mes, dia_semana, dep_time = features_da_data(dt_obj)
+            dep_time = arredondar_dep_time(dep_time, PREDICTION_CACHE_DEPTIME_BUCKET)
+            features = {
+                'Month': mes,
+                'DayOfWeek': dia_semana,
+                'DepTime': dep_time,
+                'Origin': str(origem),
+                'Dest': str(destino),
+                'weather_category': str(weather_cat)
+            }
+
+            # Mesmas features já pontuadas por este modelo: pula a inferência
+            chave = chave_previsao(pacote, features)
+            proba = cache_previsoes.obter(chave) if cache_previsoes is not None else None
+
+            if proba is None:
+                X = pacote.entrada_unica(features)
+
+                # Previsão (o ensemble roda uma única vez; com o encoder, a linha
+                # entra no micro-batch junto com as requisições concorrentes)
+                if micro is not None:
+                    proba = micro.probabilidade(pacote, X)
+                else:
+                    proba = float(pacote.probabilidades(X)[0])
+
+                if cache_previsoes is not None:
+                    cache_previsoes.guardar(chave, proba)
+            prediction = 1 if proba >= PREDICTION_THRESHOLD else 0
+
+            return jsonify({
+                'prediction': prediction,
+                'label': "Delayed" if prediction == 1 else "On Time",
+                'probability_delay': proba,
+                'weather_context': contexto_clima(weather_cat, weather_main, detalhes_clima),
+                'model_version': pacote.version,
+                'status': 'success'
+            })
 
-        # Previsão
-        prediction = current_model.predict(df_input)[0]
+        except Exception as e:
+            print("Erro durante o processamento da previsão:")
+            traceback.print_exc()
+            return jsonify({'message': str(e), 'status': 'error'}), 500
 
-        proba = 0.0
+# --- 5. ENDPOINT PREDICT EM LOTE ---
 
-        try:
-            proba = float(current_model.predict_proba(df_input)[0][1])
-        except:
-            pass
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    """
+    Recebe uma lista de voos (mesmos campos do /predict) e pontua todos com
+    uma única chamada ao modelo. Aceita tanto uma lista JSON quanto
+    {"voos": [...]}. Erros de um voo não derrubam o lote: o item volta com
+    status 'error' na mesma posição.
+    """
+    pacote = registry.atual()
+    if pacote is None:
+        return jsonify({'message': 'Modelo offline - falha no carregamento', 'status': 'error'}), 503
 
+    try:
+        data_json = request.get_json(silent=True)
+        voos = data_json.get('voos') if isinstance(data_json, dict) else data_json
+
+        if not isinstance(voos, list) or not voos:
+            return jsonify({'status': 'error', 'message': 'Envie uma lista de voos não vazia.'}), 400
+
+        if len(voos) > MAX_BATCH_SIZE:
+            return jsonify({
+                'status': 'error',
+                'message': f'Lote excede o limite de {MAX_BATCH_SIZE} voos.'
+            }), 413
+
+        resultados = [None] * len(voos)
+
+        # 1. Validação dos campos de cada item
+        indices, origens, destinos, datas_str = [], [], [], []
+        for i, voo in enumerate(voos):
+            if not isinstance(voo, dict):
+                resultados[i] = erro_item(i, 'Item inválido: esperado um objeto JSON')
+                continue
+
+            origem, destino, data_str = extrair_campos(voo)
+            if not all([origem, destino, data_str]):
+                resultados[i] = erro_item(i, 'Faltam campos obrigatórios')
+                continue
+
+            indices.append(i)
+            origens.append(origem)
+            destinos.append(destino)
+            datas_str.append(data_str)
+
+        # 2. Conversão das datas do lote inteiro
+        datas = converter_datas(datas_str)
+        validos = [k for k in range(len(indices)) if not pd.isna(datas.iat[k])]
+        for k in range(len(indices)):
+            if pd.isna(datas.iat[k]):
+                resultados[indices[k]] = erro_item(indices[k], 'Formato de data inválido')
+
+        if validos:
+            # 3. Clima (uma previsão por aeroporto do lote)
+            datas_validas = datas.iloc[validos].reset_index(drop=True)
+            origens_validas = [origens[k] for k in validos]
+            categorias_clima, mains_clima, vencidas_clima = consultar_clima_lote(origens_validas, datas_validas)
+            estado_circuito = servico_clima.disjuntor.estado
+
+            # 4. Feature Engineering vetorizada + uma única inferência
+            colunas = colunas_lote(
+                datas_validas,
+                origens_validas,
+                [destinos[k] for k in validos],
+                categorias_clima.tolist()
+            )
+
+            colunas['DepTime'] = arredondar_dep_time(colunas['DepTime'], PREDICTION_CACHE_DEPTIME_BUCKET)
+
+            # Voos já pontuados saem do cache; só o restante vai ao modelo
+            probs_atraso = np.empty(len(validos), dtype=float)
+            faltantes = list(range(len(validos)))
+            if cache_previsoes is not None:
+                valores = {nome: np.asarray(col).tolist() for nome, col in colunas.items()}
+                chaves = [
+                    chave_previsao(pacote, {nome: valores[nome][pos] for nome in FEATURES})
+                    for pos in range(len(validos))
+                ]
+                faltantes = []
+                for pos, chave in enumerate(chaves):
+                    valor = cache_previsoes.obter(chave)
+                    if valor is None:
+                        faltantes.append(pos)
+                    else:
+                        probs_atraso[pos] = valor
+
+            if faltantes:
+                if len(faltantes) < len(validos):
+                    colunas = {nome: np.asarray(col)[faltantes] for nome, col in colunas.items()}
+                X = pacote.entrada_lote(colunas)
+                calculadas = np.asarray(pacote.probabilidades(X), dtype=float)
+                probs_atraso[faltantes] = calculadas
+                if cache_previsoes is not None:
+                    for pos, proba in zip(faltantes, calculadas):
+                        cache_previsoes.guardar(chaves[pos], float(proba))
+
+            predicoes = (probs_atraso >= PREDICTION_THRESHOLD).astype(int)
+
+            for pos, k in enumerate(validos):
+                prediction = int(predicoes[pos])
+                detalhes_clima = {'stale': bool(vencidas_clima[pos]), 'breaker_state': estado_circuito}
+                resultados[indices[k]] = {
+                    'index': indices[k],
+                    'prediction': prediction,
+                    'label': "Delayed" if prediction == 1 else "On Time",
+                    'probability_delay': float(probs_atraso[pos]),
+                    'weather_context': contexto_clima(categorias_clima[pos], mains_clima[pos], detalhes_clima),
+                    'status': 'success'
+                }
+
+        sucesso = sum(1 for r in resultados if r['status'] == 'success')
         return jsonify({
-            'prediction': int(prediction),
-            'label': "Delayed" if prediction == 1 else "On Time",
-            'probability_delay': proba,
-            'weather_context': {
-                'main': weather_main,
-                'category_used': weather_cat,
-                'source': 'OpenWeatherMap (Main Field)'
-            },
+            'results': resultados,
+            'total': len(resultados),
+            'succeeded': sucesso,
+            'failed': len(resultados) - sucesso,
+            'model_version': pacote.version,
             'status': 'success'
         })
 
     except Exception as e:
-        print("Erro durante o processamento da previsão:")
+        print("Erro durante o processamento do lote:")
         traceback.print_exc()
         return jsonify({'message': str(e), 'status': 'error'}), 500
 
+# --- 6. MÉTRICAS ---
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Métricas internas deste worker em JSON."""
+    return jsonify({
+        'service': 'modelos-ml',
+        'pid': os.getpid(),
+        'micro_batching': micro_batcher.stats() if micro_batcher is not None else {'enabled': False},
+        'prediction_cache': cache_previsoes.stats() if cache_previsoes is not None else {'enabled': False},
+        'weather': servico_clima.stats(),
+        'weather_prefetch': prefetch_clima.stats() if prefetch_clima.ativo else {'enabled': False}
+    })
+
+@app.route('/diagnostics/threads', methods=['GET'])
+def diagnostics_threads():
+    """Política de threads ativa neste worker e uso por chamada."""
+    return jsonify(governador.stats())
+
+# --- 7. ENDPOINT DE RECARGA DO MODELO ---
+
+@app.route('/admin/reload', methods=['POST'])
+def admin_reload():
+    """
+    Carrega um novo modelo em segundo plano, valida em entradas canário e só
+    então troca. Corpo opcional: {"model_file": "caminho"}; sem ele, relê o
+    arquivo atual. O worker que recebeu a chamada troca primeiro e grava o
+    caminho novo no MODEL_POINTER_FILE; os demais o leem pelo monitor
+    (MODEL_WATCH_INTERVAL), inclusive os que o gunicorn recriar depois.
+    """
+    if not ADMIN_TOKEN or request.headers.get('X-Admin-Token') != ADMIN_TOKEN:
+        return jsonify({'status': 'error', 'message': 'Acesso negado'}), 403
+
+    data_json = request.get_json(silent=True) or {}
+    caminho = data_json.get('model_file')
+    if caminho and not os.path.exists(caminho):
+        return jsonify({'status': 'error', 'message': f'Arquivo não encontrado: {caminho}'}), 400
+    if caminho and WEB_CONCURRENCY > 1 and (MODEL_WATCH_INTERVAL <= 0 or not MODEL_POINTER_FILE):
+        # Sem monitor ou sem ponteiro, só este worker trocaria de arquivo
+        return jsonify({'status': 'error',
+                        'message': 'Troca de arquivo com vários workers requer MODEL_WATCH_INTERVAL '
+                                   'e MODEL_POINTER_FILE'}), 409
+    if caminho and caminho.endswith('.pkl'):
+        print(f"⚠️ Recarga de pickle ({caminho}): cada worker faz o seu unpickle e guarda uma cópia "
+              "própria do modelo. Prefira .fotm ou MODEL_ARRAYS_DIR, que ficam compartilhados.")
+
+    if not registry.recarregar_em_segundo_plano(caminho):
+        return jsonify({'status': 'error', 'message': 'Já existe uma recarga em andamento'}), 409
+
+    atual = registry.atual()
+    return jsonify({
+        'status': 'accepted',
+        'current_version': atual.version if atual else None,
+        'last_reload': registry.ultima_recarga
+    }), 202
+
 
 if __name__ == '__main__':
+    iniciar_tarefas_de_fundo()
     app.run(host='0.0.0.0', port=5000, debug=False)
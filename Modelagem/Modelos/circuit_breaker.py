@@ -0,0 +1,137 @@
+"""
+Circuit breaker para dependências externas (provedor de clima).
+
+- closed: as chamadas passam. `falhas_para_abrir` falhas seguidas abrem o
+  circuito; uma chamada que dá certo mas passa de `limite_latencia_s`
+  conta como falha.
+- open: as chamadas são recusadas na hora, sem esperar o timeout, por
+  `tempo_aberto_s` segundos.
+- half_open: passado esse tempo, até `sondas` chamadas de teste passam. Se
+  todas dão certo o circuito fecha; qualquer falha reabre.
+
+permitir() devolve uma Permissao com a geração do circuito (incrementada a
+cada troca de estado) e se a chamada é sonda; registrar() recebe essa
+Permissao. Um resultado de outra geração (ex.: chamada liberada antes de o
+circuito abrir que só termina no half_open) é descartado, então não fecha
+nem reabre o circuito no lugar das sondas.
+"""
+import threading
+import time
+from typing import NamedTuple
+
+FECHADO = 'closed'
+ABERTO = 'open'
+SEMIABERTO = 'half_open'
+
+
+class Permissao(NamedTuple):
+    """Chamada liberada por permitir(): geração do circuito e se é sonda."""
+    geracao: int
+    sonda: bool
+
+
+class CircuitBreaker:
+    """Estado do circuito de uma dependência, seguro para uso entre threads."""
+
+    def __init__(self, falhas_para_abrir=5, limite_latencia_s=None, tempo_aberto_s=30, sondas=1):
+        self.falhas_para_abrir = max(1, int(falhas_para_abrir))
+        self.limite_latencia = float(limite_latencia_s) if limite_latencia_s else None
+        self.tempo_aberto = float(tempo_aberto_s)
+        self.sondas = max(1, int(sondas))
+        self._lock = threading.Lock()
+        self._estado = FECHADO
+        self._aberto_em = 0.0
+        self._sondas_em_voo = 0
+        self._sondas_ok = 0
+        self._geracao = 0
+        self.falhas_seguidas = 0
+        self.aberturas = 0
+        self.recusadas = 0
+        self.falhas = 0
+        self.lentas = 0
+        self.obsoletos = 0
+        self.ultima_abertura = None
+
+    @property
+    def estado(self):
+        with self._lock:
+            if self._estado == ABERTO and time.monotonic() - self._aberto_em >= self.tempo_aberto:
+                return SEMIABERTO
+            return self._estado
+
+    def permitir(self):
+        """
+        Permissao se a chamada pode ir à dependência (em half_open, ocupa uma
+        vaga de sonda), ou None se o circuito recusa.
+        """
+        with self._lock:
+            if self._estado == ABERTO:
+                if time.monotonic() - self._aberto_em < self.tempo_aberto:
+                    self.recusadas += 1
+                    return None
+                self._mudar(SEMIABERTO)
+                self._sondas_em_voo = 0
+                self._sondas_ok = 0
+            if self._estado == SEMIABERTO:
+                if self._sondas_em_voo >= self.sondas:
+                    self.recusadas += 1
+                    return None
+                self._sondas_em_voo += 1
+                return Permissao(self._geracao, sonda=True)
+            return Permissao(self._geracao, sonda=False)
+
+    def registrar(self, permissao, sucesso, duracao):
+        """Resultado de uma chamada liberada por permitir(), com a Permissao recebida."""
+        lenta = sucesso and self.limite_latencia is not None and duracao > self.limite_latencia
+        with self._lock:
+            if permissao.geracao != self._geracao:
+                # O circuito trocou de estado desde a liberação
+                self.obsoletos += 1
+                return
+            sonda = permissao.sonda
+            if sonda:
+                self._sondas_em_voo = max(0, self._sondas_em_voo - 1)
+
+            if sucesso and not lenta:
+                self.falhas_seguidas = 0
+                if sonda:
+                    self._sondas_ok += 1
+                    if self._sondas_ok >= self.sondas:
+                        self._mudar(FECHADO)
+                return
+
+            self.falhas_seguidas += 1
+            if lenta:
+                self.lentas += 1
+            else:
+                self.falhas += 1
+            if sonda or (self._estado == FECHADO and self.falhas_seguidas >= self.falhas_para_abrir):
+                self._abrir()
+
+    def _mudar(self, estado):
+        self._estado = estado
+        self._geracao += 1
+
+    def _abrir(self):
+        self._mudar(ABERTO)
+        self._aberto_em = time.monotonic()
+        self.aberturas += 1
+        self.ultima_abertura = time.strftime('%Y-%m-%dT%H:%M:%S')
+
+    def stats(self):
+        estado = self.estado
+        with self._lock:
+            return {
+                'state': estado,
+                'consecutive_failures': self.falhas_seguidas,
+                'failure_threshold': self.falhas_para_abrir,
+                'latency_threshold_ms': self.limite_latencia * 1000 if self.limite_latencia else None,
+                'open_seconds': self.tempo_aberto,
+                'half_open_probes': self.sondas,
+                'failures': self.falhas,
+                'slow_calls': self.lentas,
+                'times_opened': self.aberturas,
+                'last_opened_at': self.ultima_abertura,
+                'rejected': self.recusadas,
+                'stale_results': self.obsoletos
+            }
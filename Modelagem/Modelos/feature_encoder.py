@@ -0,0 +1,182 @@
+"""
+Encoder de features pré-compilado para o modelo de atraso de voos.
+
+Construído uma única vez no carregamento do modelo a partir dos vocabulários
+de categorias que o LightGBM guarda junto com o booster (pandas_categorical).
+Transforma uma requisição direto em uma linha numérica, sem DataFrame e sem
+astype('category'), usando exatamente os mesmos códigos do treino.
+
+Para um Pipeline do scikit-learn exportado pelo motor NumPy, as tabelas do
+pré-processamento (ex.: TargetEncoder) fazem o papel dos vocabulários, e as
+features extraídas de uma data são recalculadas aqui a partir da coluna bruta.
+"""
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# Ordem e tipos das features usadas no treino (ver app.py)
+FEATURES = ['Month', 'DayOfWeek', 'DepTime', 'Origin', 'Dest', 'weather_category']
+CATEGORICAS = ['Origin', 'Dest', 'weather_category']
+
+
+def converter_data(data_str):
+    """
+    Converte a data de partida sem passar pelo pandas no caso comum (ISO 8601,
+    com 'T' ou espaço). Qualquer outro formato cai no pd.to_datetime, que era
+    o comportamento original.
+    """
+    try:
+        return datetime.fromisoformat(data_str)
+    except (TypeError, ValueError):
+        return pd.to_datetime(data_str).to_pydatetime()
+
+
+def features_da_data(dt_obj):
+    """Extrai Month, DayOfWeek (segunda = 1) e DepTime (HHMM) de um datetime."""
+    return int(dt_obj.month), int(dt_obj.weekday()) + 1, float(dt_obj.hour * 100 + dt_obj.minute)
+
+
+def arredondar_dep_time(dep_time, minutos):
+    """
+    Arredonda um DepTime (HHMM) para o início da faixa de `minutos`
+    (ex.: 15 -> 1837 vira 1830). Aceita um número ou um vetor NumPy de
+    floats. Com minutos <= 1 devolve o valor original.
+    """
+    if minutos <= 1:
+        return dep_time
+    total = dep_time // 100 * 60 + dep_time % 100
+    total = total // minutos * minutos
+    return total // 60 * 100 + total % 60
+
+
+class FeatureEncoder:
+    """
+    Converte features de voo em linhas numéricas na ordem esperada pelo modelo.
+
+    Categorias desconhecidas (ex.: aeroporto fora do treino) viram NaN, que é
+    o mesmo tratamento que o LightGBM aplica a categorias novas no DataFrame.
+    Com tabelas de pré-processamento, viram o valor padrão da tabela.
+
+    Em `datas`, cada feature derivada de uma data aponta para a coluna bruta
+    e para a parte extraída ({'source', 'part', 'dayfirst'}). A conversão é a
+    mesma do pipeline de treino (pd.to_datetime com errors='coerce'), e datas
+    inválidas viram NaN.
+    """
+
+    def __init__(self, feature_names, vocabularios, padroes=None, datas=None):
+        self.feature_names = list(feature_names)
+        # Listas de categorias viram códigos 0..n-1; dicts já trazem o valor
+        self.vocabularios = {
+            col: ({str(cat): float(valor) for cat, valor in categorias.items()}
+                  if isinstance(categorias, dict)
+                  else {str(cat): float(codigo) for codigo, cat in enumerate(categorias)})
+            for col, categorias in vocabularios.items()
+        }
+        padroes = padroes or {}
+        self.datas = dict(datas or {})
+        # (nome, vocabulário ou None, valor de categoria desconhecida,
+        #  (coluna de origem, parte, dayfirst) ou None) para o laço do encode
+        self._plano = [(nome, self.vocabularios.get(nome), padroes.get(nome, np.nan),
+                        (self.datas[nome]['source'], self.datas[nome]['part'],
+                         bool(self.datas[nome].get('dayfirst', False))) if nome in self.datas else None)
+                       for nome in self.feature_names]
+
+    @property
+    def colunas_de_entrada(self):
+        """Colunas brutas que o encoder lê (a origem, no caso das partes de data)."""
+        return {data[0] if data is not None else nome for nome, _, _, data in self._plano}
+
+    @classmethod
+    def from_model(cls, model):
+        """
+        Monta o encoder a partir do modelo carregado. Retorna None quando o
+        modelo não expõe vocabulários compatíveis (ex.: pipeline do Random
+        Forest carregado do pickle), e nesse caso o app segue pelo caminho com
+        DataFrame.
+        """
+        preprocessamento = getattr(model, 'preprocessamento', None)
+        if preprocessamento is not None:
+            # O serviço só tem as FEATURES para entregar ao pipeline
+            encoder = cls.from_tabelas(preprocessamento)
+            return None if encoder.colunas_de_entrada - set(FEATURES) else encoder
+
+        booster = getattr(model, 'booster_', model)
+        pandas_categorical = getattr(booster, 'pandas_categorical', None)
+        feature_names = getattr(booster, 'feature_names', None)
+        if feature_names is None and callable(getattr(booster, 'feature_name', None)):
+            feature_names = booster.feature_name()
+
+        if not feature_names or not pandas_categorical:
+            return None
+
+        # O LightGBM guarda os vocabulários na ordem em que as colunas
+        # categóricas aparecem no DataFrame de treino
+        categoricas = [nome for nome in feature_names if nome in CATEGORICAS]
+        desconhecidas = set(feature_names) - set(FEATURES)
+        if desconhecidas or len(categoricas) != len(pandas_categorical):
+            return None
+
+        return cls(feature_names, dict(zip(categoricas, pandas_categorical)))
+
+    @classmethod
+    def from_tabelas(cls, preprocessamento):
+        """Encoder a partir das tabelas exportadas por tree_engine.preprocessamento_sklearn."""
+        tabelas = preprocessamento['tables']
+        return cls(preprocessamento['columns'],
+                   {col: t['values'] for col, t in tabelas.items()},
+                   {col: t['default'] for col, t in tabelas.items()},
+                   preprocessamento.get('dates'))
+
+    def _valores(self, features):
+        valores = []
+        convertidas = {}
+        for nome, vocab, padrao, data in self._plano:
+            if data is not None:
+                origem, parte, dayfirst = data
+                if origem not in convertidas:
+                    convertidas[origem] = pd.to_datetime(features[origem], dayfirst=dayfirst, errors='coerce')
+                dt_obj = convertidas[origem]
+                valores.append(np.nan if pd.isna(dt_obj) else float(getattr(dt_obj, parte)))
+                continue
+            valor = features[nome]
+            if vocab is None:
+                valores.append(float(valor))
+            else:
+                valores.append(vocab.get(str(valor), padrao))
+        return valores
+
+    def encode(self, features):
+        """Codifica um único voo (dict de features) em uma matriz 1 x n."""
+        return np.array([self._valores(features)], dtype=np.float64)
+
+    def encode_many(self, lista_features):
+        """Codifica vários voos de uma vez em uma matriz len(lista) x n."""
+        if not lista_features:
+            return np.empty((0, len(self.feature_names)), dtype=np.float64)
+        return np.array([self._valores(f) for f in lista_features], dtype=np.float64)
+
+    def encode_colunas(self, colunas):
+        """
+        Codifica um lote já organizado por coluna ({nome: sequência}),
+        usado pelo /predict/batch para evitar montar um dict por voo.
+        """
+        saida = []
+        convertidas = {}
+        for nome, vocab, padrao, data in self._plano:
+            if data is not None:
+                # A coluna inteira de uma vez, como no pipeline: o pandas
+                # infere o formato pelo lote
+                origem, parte, dayfirst = data
+                if origem not in convertidas:
+                    convertidas[origem] = pd.to_datetime(pd.Series(colunas[origem]), dayfirst=dayfirst,
+                                                         errors='coerce')
+                saida.append(getattr(convertidas[origem].dt, parte).to_numpy(dtype=np.float64,
+                                                                             na_value=np.nan))
+                continue
+            coluna = colunas[nome]
+            if vocab is None:
+                saida.append(np.asarray(coluna, dtype=np.float64))
+            else:
+                saida.append(np.array([vocab.get(str(v), padrao) for v in coluna], dtype=np.float64))
+        return np.column_stack(saida)
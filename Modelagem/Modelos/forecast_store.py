@@ -0,0 +1,165 @@
+"""
+Cache de previsões persistente em SQLite, compartilhado pelos workers do nó.
+
+O ForecastCache em memória é de cada processo e some no restart: quatro
+workers fazem quatro vezes as chamadas à API e todo deploy começa frio.
+Aqui a memória do worker continua sendo a primeira camada, e atrás dela
+fica um arquivo SQLite que todos os processos do nó leem e escrevem:
+
+- a previsão buscada por um worker vale para os outros;
+- um worker que reinicia (ou um worker novo) já começa com as previsões
+  que estão no arquivo;
+- o SQLite em modo WAL cuida da concorrência entre processos (leitores não
+  bloqueiam o escritor; escritores esperam o lock até `busy_timeout`).
+
+A validade continua sendo `ttl` segundos desde `obtido_em`. Linhas mais
+velhas que `retencao_s` são apagadas de tempos em tempos; até lá seguem
+disponíveis como última previsão conhecida (circuito aberto).
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from weather import CADENCIA_PREVISAO, ForecastCache, ForecastSlots
+
+# Previsões vencidas ficam no arquivo por um dia (servem com o circuito aberto)
+RETENCAO_PADRAO = 24 * 3600
+
+
+class PersistentForecastCache(ForecastCache):
+    """ForecastCache em memória com um arquivo SQLite compartilhado por trás."""
+
+    def __init__(self, caminho, ttl=CADENCIA_PREVISAO, retencao_s=RETENCAO_PADRAO, timeout_s=5.0):
+        super().__init__(ttl)
+        self.caminho = caminho
+        self.retencao = max(float(retencao_s), self.ttl)
+        self.timeout = float(timeout_s)
+        self._local = threading.local()
+        self._ultima_limpeza = 0.0
+        self.disk_hits = 0
+        self.disk_writes = 0
+        self.disk_errors = 0
+
+        diretorio = os.path.dirname(os.path.abspath(caminho))
+        os.makedirs(diretorio, exist_ok=True)
+        conexao = self._abrir()
+        with conexao:
+            conexao.execute(
+                'CREATE TABLE IF NOT EXISTS previsoes ('
+                ' chave TEXT PRIMARY KEY,'
+                ' obtido_em REAL NOT NULL,'
+                ' timestamps TEXT NOT NULL,'
+                ' mains TEXT NOT NULL)'
+            )
+        # A conexão do import (no master, com preload_app) não atravessa o fork
+        conexao.close()
+
+    def _abrir(self):
+        conexao = sqlite3.connect(self.caminho, timeout=self.timeout, isolation_level=None)
+        conexao.execute('PRAGMA journal_mode=WAL')
+        conexao.execute('PRAGMA synchronous=NORMAL')
+        return conexao
+
+    def _conexao(self):
+        """Uma conexão por thread e por processo."""
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            local.conexao = self._abrir()
+            local.pid = os.getpid()
+        return local.conexao
+
+    def _falha(self, operacao, erro):
+        with self._lock:
+            self.disk_errors += 1
+        print(f"⚠️ Cache de clima em disco ({operacao}): {erro}")
+
+    def _ler(self, chave):
+        try:
+            linha = self._conexao().execute(
+                'SELECT obtido_em, timestamps, mains FROM previsoes WHERE chave = ?', (chave,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            self._falha('leitura', e)
+            return None
+        if linha is None:
+            return None
+        obtido_em, timestamps, mains = linha
+        return ForecastSlots(json.loads(timestamps), json.loads(mains), obtido_em=obtido_em)
+
+    def _do_disco(self, chave, atual):
+        """Versão do arquivo, se for mais nova que a da memória (outro worker pode ter atualizado)."""
+        slots = self._ler(chave)
+        if slots is None or (atual is not None and slots.obtido_em <= atual.obtido_em):
+            return atual
+        with self._lock:
+            self._itens[chave] = slots
+        return slots
+
+    def obter(self, chave):
+        slots = self._itens.get(chave)
+        if self.valida(slots):
+            with self._lock:
+                self.hits += 1
+            return slots
+
+        do_disco = self._do_disco(chave, slots)
+        if self.valida(do_disco):
+            with self._lock:
+                self.hits += 1
+                self.disk_hits += 1
+            return do_disco
+
+        with self._lock:
+            self.misses += 1
+            if do_disco is not None:
+                self.expirations += 1
+        return None
+
+    def espiar(self, chave):
+        slots = self._itens.get(chave)
+        if self.valida(slots):
+            return slots
+        return self._do_disco(chave, slots)
+
+    def guardar(self, chave, slots):
+        super().guardar(chave, slots)
+        try:
+            conexao = self._conexao()
+            conexao.execute(
+                'INSERT OR REPLACE INTO previsoes (chave, obtido_em, timestamps, mains) VALUES (?, ?, ?, ?)',
+                (chave, slots.obtido_em, json.dumps(slots.timestamps), json.dumps(slots.mains))
+            )
+            with self._lock:
+                self.disk_writes += 1
+            self._limpar_antigas(conexao)
+        except sqlite3.Error as e:
+            self._falha('escrita', e)
+
+    def _limpar_antigas(self, conexao):
+        agora = time.time()
+        if agora - self._ultima_limpeza < self.ttl:
+            return
+        self._ultima_limpeza = agora
+        conexao.execute('DELETE FROM previsoes WHERE obtido_em < ?', (agora - self.retencao,))
+
+    def _linhas_no_disco(self):
+        try:
+            return self._conexao().execute('SELECT COUNT(*) FROM previsoes').fetchone()[0]
+        except sqlite3.Error:
+            return None
+
+    def stats(self):
+        stats = super().stats()
+        linhas = self._linhas_no_disco()
+        with self._lock:
+            stats['persistent'] = {
+                'path': self.caminho,
+                'disk_entries': linhas,
+                'retention_s': self.retencao,
+                'disk_hits': self.disk_hits,
+                'disk_writes': self.disk_writes,
+                'disk_errors': self.disk_errors
+            }
+        return stats
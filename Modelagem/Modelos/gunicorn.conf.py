@@ -0,0 +1,38 @@
+"""
+Configuração do gunicorn para o serviço de modelos.
+
+O app é carregado uma única vez no processo master (preload_app) e os
+workers são criados por fork, compartilhando as páginas do modelo em
+copy-on-write. Com MODEL_ARRAYS_DIR os vetores são mapeados do disco e o
+compartilhamento vale até entre reinícios de worker.
+
+Uso:
+    gunicorn -c gunicorn.conf.py app:app
+"""
+import gc
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', '4'))
+# O app divide o orçamento de threads de inferência entre os workers
+os.environ['WEB_CONCURRENCY'] = str(workers)
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+timeout = 120
+
+# Carrega o modelo no master, antes do fork
+preload_app = True
+
+
+def when_ready(server):
+    # Move os objetos já carregados (modelo, encoder, aeroportos) para a
+    # geração permanente do GC. Sem isso, a primeira coleta em cada worker
+    # escreve nos cabeçalhos desses objetos e duplica as páginas.
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Threads não sobrevivem ao fork: as tarefas de fundo (monitor do
+    # arquivo do modelo) sobem em cada worker, depois do fork.
+    from app import iniciar_tarefas_de_fundo
+    iniciar_tarefas_de_fundo()
@@ -0,0 +1,105 @@
+"""
+Política de threads da inferência.
+
+O Random Forest é treinado com n_jobs=-1, e esse valor vai junto no pickle:
+no serviço, cada predict de uma linha abriria um pool do joblib com todos os
+núcleos. O LightGBM também usa todos os núcleos por padrão. Com vários
+workers do gunicorn isso multiplica as threads muito além dos núcleos.
+
+O ThreadGovernor decide quantas threads cada chamada usa:
+- lotes pequenos rodam em uma thread;
+- lotes grandes ganham uma thread a cada `linhas_por_thread` linhas, até o
+  teto do worker;
+- o teto é o total de threads do nó dividido pelo número de workers.
+
+Os pools nativos (OpenMP/BLAS) são limitados ao mesmo teto em cada worker.
+"""
+import os
+import threading
+
+from joblib import parallel_config
+
+try:
+    from threadpoolctl import threadpool_info, threadpool_limits
+except ImportError:  # vem junto com o scikit-learn; sem ele só não limitamos os pools nativos
+    threadpool_info = threadpool_limits = None
+
+
+def nucleos_disponiveis():
+    """Núcleos que este processo pode usar (respeita cpuset/affinity de containers)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+class ThreadGovernor:
+    """Decide e aplica o número de threads de cada chamada ao modelo."""
+
+    def __init__(self, total_threads=None, workers=1, linhas_por_thread=1000):
+        self.nucleos = nucleos_disponiveis()
+        self.total_threads = int(total_threads) if total_threads else self.nucleos
+        self.workers = max(1, int(workers))
+        self.teto = max(1, self.total_threads // self.workers)
+        self.linhas_por_thread = max(1, int(linhas_por_thread))
+        self.ajustes_modelo = {}
+        self._limites_nativos = None
+        self._lock = threading.Lock()
+        self._chamadas = {}
+
+    def threads_para(self, n_linhas):
+        """1 thread para lotes pequenos; uma a mais a cada `linhas_por_thread` linhas, até o teto."""
+        return max(1, min(self.teto, n_linhas // self.linhas_por_thread))
+
+    def preparar_modelo(self, model):
+        """
+        Tira o n_jobs gravado no pickle dos estimadores (o do Pipeline e os
+        passos internos) para que o número de threads venha desta política.
+        """
+        estimadores = [model]
+        if hasattr(model, 'steps'):
+            estimadores += [passo for _, passo in model.steps]
+        for estimador in estimadores:
+            # LightGBM recebe num_threads por chamada; aqui só os do scikit-learn
+            if hasattr(estimador, 'booster_'):
+                continue
+            n_jobs = getattr(estimador, 'n_jobs', None)
+            if n_jobs is not None:
+                self.ajustes_modelo[type(estimador).__name__] = n_jobs
+                estimador.n_jobs = None
+        return model
+
+    def limitar_pools_nativos(self):
+        """Limita OpenMP/BLAS ao teto do worker. Chamar depois do fork."""
+        if threadpool_limits is not None and self._limites_nativos is None:
+            self._limites_nativos = threadpool_limits(limits=self.teto)
+
+    def registrar(self, threads):
+        with self._lock:
+            self._chamadas[threads] = self._chamadas.get(threads, 0) + 1
+
+    def contexto_joblib(self, threads):
+        """Contexto (local da thread) com o n_jobs usado pelos estimadores do scikit-learn."""
+        return parallel_config(backend='threading', n_jobs=threads)
+
+    def stats(self):
+        pools = []
+        if threadpool_info is not None:
+            pools = [
+                {'api': info.get('internal_api'), 'library': os.path.basename(info.get('filepath', '')),
+                 'num_threads': info.get('num_threads')}
+                for info in threadpool_info()
+            ]
+        with self._lock:
+            chamadas = {str(k): v for k, v in sorted(self._chamadas.items())}
+        return {
+            'cpu_count': self.nucleos,
+            'node_thread_budget': self.total_threads,
+            'workers': self.workers,
+            'per_worker_cap': self.teto,
+            'rows_per_thread': self.linhas_por_thread,
+            'single_thread_below_rows': self.linhas_por_thread * 2,
+            'pickled_n_jobs_overridden': self.ajustes_modelo,
+            'native_pools': pools,
+            'calls_by_threads': chamadas
+        }
@@ -0,0 +1,206 @@
+"""
+Micro-batching das previsões de uma linha.
+
+Requisições concorrentes do /predict entram em uma fila; uma thread coleta o
+que chegou e pontua tudo com uma única chamada ao modelo, devolvendo a
+probabilidade de cada requisição separadamente. O lote é fechado quando
+atinge `tamanho_maximo` ou quando a janela (`janela_ms`, contada a partir do
+primeiro item) expira.
+
+A janela é adaptativa: cada requisição se anuncia ao entrar no /predict
+(`with batcher.requisicao() as r:`) e a thread só espera enquanto houver
+requisições anunciadas que ainda não chegaram à fila (validando campos,
+consultando clima). Sem ninguém a caminho o lote sai na hora, então uma
+requisição sozinha não paga a janela.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+# Quantos tempos de fila recentes entram nos percentis
+AMOSTRAS_ESPERA = 2048
+
+
+class _Pedido:
+    __slots__ = ('pacote', 'X', 'enfileirado', 'pronto', 'resultado', 'erro')
+
+    def __init__(self, pacote, X):
+        self.pacote = pacote
+        self.X = X
+        self.enfileirado = time.perf_counter()
+        self.pronto = threading.Event()
+        self.resultado = None
+        self.erro = None
+
+
+class _Requisicao:
+    """Uma requisição anunciada; envia no máximo uma linha ao lote."""
+
+    def __init__(self, batcher):
+        self._batcher = batcher
+        self._enviada = False
+
+    def __enter__(self):
+        self._batcher._anunciar()
+        return self
+
+    def __exit__(self, *exc):
+        if not self._enviada:
+            self._batcher._desistir()
+        return False
+
+    def probabilidade(self, pacote, X):
+        """
+        Enfileira a linha X (matriz 1 x n do encoder) e espera a probabilidade
+        de atraso calculada no lote. Exceções do modelo são repassadas.
+        """
+        self._enviada = True
+        return self._batcher._enviar(pacote, X)
+
+
+class MicroBatcher:
+    """Agrupa linhas de requisições concorrentes em uma única inferência."""
+
+    def __init__(self, tamanho_maximo=64, janela_ms=2.0):
+        self.tamanho_maximo = max(1, int(tamanho_maximo))
+        self.janela = max(0.0, float(janela_ms)) / 1000.0
+        self._cond = threading.Condition()
+        self._fila = []
+        self._a_caminho = 0
+        self._pid = None
+
+        self._estatisticas = threading.Lock()
+        self._esperas = deque(maxlen=AMOSTRAS_ESPERA)
+        self._lotes = 0
+        self._itens = 0
+        self._maior_lote = 0
+        self._por_tamanho = 0
+        self._por_janela = 0
+        self._sem_espera = 0
+        self._espera_max = 0.0
+
+    def requisicao(self):
+        """Context manager que anuncia uma requisição que vai pontuar uma linha."""
+        return _Requisicao(self)
+
+    def probabilidade(self, pacote, X):
+        """Atalho para pontuar uma linha sem anúncio prévio."""
+        with self.requisicao() as r:
+            return r.probabilidade(pacote, X)
+
+    def _garantir_thread(self):
+        # Threads não sobrevivem ao fork: cada worker sobe a sua na primeira chamada
+        if self._pid == os.getpid():
+            return
+        with self._cond:
+            if self._pid != os.getpid():
+                self._fila = []
+                self._a_caminho = 0
+                threading.Thread(target=self._laco, name='micro-batcher', daemon=True).start()
+                self._pid = os.getpid()
+
+    def _anunciar(self):
+        self._garantir_thread()
+        with self._cond:
+            self._a_caminho += 1
+
+    def _desistir(self):
+        with self._cond:
+            self._a_caminho -= 1
+            self._cond.notify_all()
+
+    def _enviar(self, pacote, X):
+        pedido = _Pedido(pacote, X)
+        with self._cond:
+            self._a_caminho -= 1
+            self._fila.append(pedido)
+            self._cond.notify_all()
+        pedido.pronto.wait()
+        if pedido.erro is not None:
+            raise pedido.erro
+        return pedido.resultado
+
+    def _coletar(self):
+        with self._cond:
+            while not self._fila:
+                self._cond.wait()
+            prazo = self._fila[0].enfileirado + self.janela
+            esperou = False
+            while len(self._fila) < self.tamanho_maximo and self._a_caminho > 0:
+                restante = prazo - time.perf_counter()
+                if restante <= 0:
+                    break
+                esperou = True
+                self._cond.wait(restante)
+            lote = self._fila[:self.tamanho_maximo]
+            del self._fila[:self.tamanho_maximo]
+        return lote, esperou
+
+    def _laco(self):
+        while True:
+            lote, esperou = self._coletar()
+            inicio = time.perf_counter()
+            self._pontuar(lote)
+            self._registrar(lote, esperou, inicio)
+
+    @staticmethod
+    def _pontuar(lote):
+        # Depois de uma troca de modelo o lote pode misturar versões:
+        # cada grupo roda no bundle que a sua requisição pegou
+        grupos = {}
+        for pedido in lote:
+            grupos.setdefault(id(pedido.pacote), []).append(pedido)
+
+        for pedidos in grupos.values():
+            pacote = pedidos[0].pacote
+            try:
+                probs = np.asarray(pacote.probabilidades(np.vstack([p.X for p in pedidos])), dtype=float)
+                for pedido, proba in zip(pedidos, probs):
+                    pedido.resultado = float(proba)
+            except Exception as e:
+                for pedido in pedidos:
+                    pedido.erro = e
+            for pedido in pedidos:
+                pedido.pronto.set()
+
+    def _registrar(self, lote, esperou, inicio):
+        tamanho = len(lote)
+        with self._estatisticas:
+            self._lotes += 1
+            self._itens += tamanho
+            self._maior_lote = max(self._maior_lote, tamanho)
+            if tamanho >= self.tamanho_maximo:
+                self._por_tamanho += 1
+            elif esperou:
+                self._por_janela += 1
+            else:
+                self._sem_espera += 1
+            for pedido in lote:
+                espera = inicio - pedido.enfileirado
+                self._esperas.append(espera)
+                self._espera_max = max(self._espera_max, espera)
+
+    def stats(self):
+        with self._estatisticas:
+            esperas = np.array(self._esperas) * 1000 if self._esperas else np.zeros(1)
+            return {
+                'enabled': True,
+                'max_batch_size': self.tamanho_maximo,
+                'window_ms': self.janela * 1000,
+                'batches': self._lotes,
+                'requests': self._itens,
+                'avg_batch_size': round(self._itens / self._lotes, 2) if self._lotes else 0.0,
+                'max_batch_seen': self._maior_lote,
+                'flushed_by_size': self._por_tamanho,
+                'flushed_by_window': self._por_janela,
+                'flushed_idle': self._sem_espera,
+                'queue_depth': len(self._fila),
+                'queue_wait_ms': {
+                    'p50': round(float(np.percentile(esperas, 50)), 3),
+                    'p99': round(float(np.percentile(esperas, 99)), 3),
+                    'max': round(self._espera_max * 1000, 3)
+                }
+            }
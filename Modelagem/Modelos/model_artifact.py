@@ -0,0 +1,206 @@
+"""
+Artefato compacto do modelo (.fotm).
+
+Um único arquivo binário com o ensemble achatado (tree_engine.FlatForest) e
+as tabelas de pré-processamento (nomes das features, vocabulários de
+categorias do LightGBM ou, em um Pipeline do scikit-learn, as tabelas do
+ColumnTransformer), em tipos estreitos: folhas em float32, índices de feature em
+int8/int16, filhos em int32 e, nas florestas do scikit-learn, limiares em
+float32. O carregamento é uma leitura em bloco ou um mmap, sem unpickle.
+Um LightGBM leva também o texto do Booster, que o serviço usa para
+reconstruir o lightgbm.Booster (mais rápido que o motor NumPy).
+
+Layout (versão 1):
+    8 bytes   assinatura b'FOTMODEL'
+    uint32    versão do formato
+    uint32    tamanho do cabeçalho JSON
+    N bytes   cabeçalho JSON (meta, tabela de vetores, sha256 dos dados)
+    ...       preenchimento até múltiplo de 64
+    dados     vetores contíguos, cada um alinhado em 64 bytes
+
+Converter:
+    python model_artifact.py flight_delay_model.pkl flight_delay_model.fotm
+"""
+import hashlib
+import json
+import os
+import struct
+import sys
+import time
+
+import numpy as np
+
+from tree_engine import (FlatForest, amostra_sintetica, json_padrao, referencia_do_modelo,
+                         verificar_paridade_modelo)
+
+ASSINATURA = b'FOTMODEL'
+VERSAO_FORMATO = 1
+ALINHAMENTO = 64
+_PREFIXO = struct.Struct('<8sII')
+
+# Diferença máxima de probabilidade aceita em relação ao modelo original.
+# Vem só do arredondamento das folhas para float32: os limiares continuam
+# exatos (float64 no LightGBM; no scikit-learn a comparação já é em float32).
+TOLERANCIA_ARTEFATO = 1e-5
+
+
+def _menor_inteiro(valores):
+    """Menor tipo inteiro com sinal que comporta todos os valores."""
+    minimo, maximo = (int(valores.min()), int(valores.max())) if valores.size else (0, 0)
+    for tipo in (np.int8, np.int16, np.int32):
+        info = np.iinfo(tipo)
+        if info.min <= minimo and maximo <= info.max:
+            return tipo
+    return np.int64
+
+
+def _float32_para_baixo(valores):
+    """
+    Maior float32 <= cada limiar. Assim x <= limiar32 continua equivalente a
+    x <= limiar para qualquer x em float32.
+    """
+    arredondado = valores.astype(np.float32)
+    acima = arredondado.astype(np.float64) > valores
+    arredondado[acima] = np.nextafter(arredondado[acima], np.float32(-np.inf))
+    return arredondado
+
+
+def compactar(floresta):
+    """Converte os vetores de uma FlatForest para os tipos estreitos do artefato."""
+    a = floresta.arrays
+    limiares = np.asarray(a['threshold'], dtype=np.float64)
+    opcionais = {nome: np.asarray(a[nome], dtype=np.uint8) for nome in FlatForest.OPCIONAIS if nome in a}
+    return {
+        **opcionais,
+        'feature': a['feature'].astype(_menor_inteiro(a['feature'])),
+        'threshold': _float32_para_baixo(limiares) if floresta.meta['float32_input'] else limiares,
+        'left': a['left'].astype(np.int32),
+        'right': a['right'].astype(np.int32),
+        'value': a['value'].astype(np.float32),
+        'default_left': a['default_left'].astype(bool),
+        'missing_type': a['missing_type'].astype(np.int8),
+        'cat_index': a['cat_index'].astype(_menor_inteiro(a['cat_index'])),
+        'cat_mask': a['cat_mask'].astype(bool),
+        'roots': a['roots'].astype(np.int32),
+    }
+
+
+def _alinhar(posicao):
+    return (posicao + ALINHAMENTO - 1) // ALINHAMENTO * ALINHAMENTO
+
+
+def salvar_artefato(floresta, caminho, origem=None):
+    """Grava a floresta compactada em um único arquivo .fotm."""
+    arrays = compactar(floresta)
+
+    tabela, posicao = [], 0
+    for nome in floresta.nomes_gravados():
+        vetor = np.ascontiguousarray(arrays[nome])
+        posicao = _alinhar(posicao)
+        tabela.append({'name': nome, 'dtype': vetor.dtype.str, 'shape': list(vetor.shape),
+                       'offset': posicao, 'nbytes': vetor.nbytes})
+        posicao += vetor.nbytes
+
+    dados = bytearray(_alinhar(posicao))
+    for entrada in tabela:
+        vetor = np.ascontiguousarray(arrays[entrada['name']])
+        dados[entrada['offset']:entrada['offset'] + entrada['nbytes']] = vetor.tobytes()
+
+    cabecalho = json.dumps({
+        'meta': floresta.meta,
+        'arrays': tabela,
+        'data_nbytes': len(dados),
+        'sha256': hashlib.sha256(dados).hexdigest(),
+        'tolerance': TOLERANCIA_ARTEFATO,
+        'source': origem,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }, ensure_ascii=False, default=json_padrao).encode('utf-8')
+
+    inicio_dados = _alinhar(_PREFIXO.size + len(cabecalho))
+    temporario = f'{caminho}.tmp'
+    with open(temporario, 'wb') as f:
+        f.write(_PREFIXO.pack(ASSINATURA, VERSAO_FORMATO, len(cabecalho)))
+        f.write(cabecalho)
+        f.write(b'\0' * (inicio_dados - _PREFIXO.size - len(cabecalho)))
+        f.write(dados)
+    # Troca atômica: quem estiver lendo o arquivo antigo não vê um arquivo pela metade
+    os.replace(temporario, caminho)
+
+
+def carregar_artefato(caminho, mmap=True, verificar=True):
+    """
+    Abre um .fotm e devolve a FlatForest. Com mmap=True os vetores são views
+    somente-leitura sobre o arquivo mapeado (compartilhadas entre processos);
+    com mmap=False o arquivo é lido em um único bloco.
+    """
+    with open(caminho, 'rb') as f:
+        assinatura, versao, tamanho = _PREFIXO.unpack(f.read(_PREFIXO.size))
+        if assinatura != ASSINATURA:
+            raise ValueError(f"{caminho} não é um artefato de modelo (.fotm)")
+        if versao != VERSAO_FORMATO:
+            raise ValueError(f"Versão de artefato não suportada: {versao} (esperada {VERSAO_FORMATO})")
+        cabecalho = json.loads(f.read(tamanho).decode('utf-8'))
+
+    inicio_dados = _alinhar(_PREFIXO.size + tamanho)
+    if mmap:
+        dados = np.memmap(caminho, dtype=np.uint8, mode='r', offset=inicio_dados,
+                          shape=(cabecalho['data_nbytes'],))
+    else:
+        with open(caminho, 'rb') as f:
+            f.seek(inicio_dados)
+            dados = np.frombuffer(f.read(cabecalho['data_nbytes']), dtype=np.uint8)
+
+    if len(dados) != cabecalho['data_nbytes']:
+        raise ValueError(f"{caminho} está truncado")
+    if verificar and hashlib.sha256(dados).hexdigest() != cabecalho['sha256']:
+        raise ValueError(f"Checksum inválido em {caminho}")
+
+    arrays = {}
+    for entrada in cabecalho['arrays']:
+        bruto = dados[entrada['offset']:entrada['offset'] + entrada['nbytes']]
+        arrays[entrada['name']] = bruto.view(np.dtype(entrada['dtype'])).reshape(entrada['shape'])
+
+    return FlatForest(arrays, cabecalho['meta'])
+
+
+if __name__ == '__main__':
+    import joblib
+
+    if len(sys.argv) != 3:
+        print("Uso: python model_artifact.py <modelo.pkl> <saida.fotm>")
+        sys.exit(2)
+    entrada, saida = sys.argv[1], sys.argv[2]
+
+    print(f"Carregando {entrada}...")
+    inicio = time.perf_counter()
+    modelo = joblib.load(entrada)
+    tempo_pickle = time.perf_counter() - inicio
+
+    try:
+        floresta = FlatForest.from_model(modelo)
+    except ValueError as e:
+        print(f"Modelo não convertido: {e}")
+        sys.exit(1)
+    salvar_artefato(floresta, saida, origem=os.path.basename(entrada))
+
+    inicio = time.perf_counter()
+    compacta = carregar_artefato(saida, mmap=False)
+    tempo_artefato = time.perf_counter() - inicio
+
+    # Compara o artefato com o modelo inteiro: num Pipeline, a partir das
+    # features brutas, com o pré-processamento dos dois lados
+    ok, diferenca = verificar_paridade_modelo(compacta, modelo, TOLERANCIA_ARTEFATO)
+    booster = compacta.booster_lightgbm()
+    if booster is not None:
+        # O serviço usa o Booster reconstruído do artefato, não o motor NumPy
+        X = amostra_sintetica(compacta)
+        diferenca = max(diferenca, float(np.max(np.abs(booster.predict(X) - referencia_do_modelo(modelo)(X)))))
+        ok = diferenca <= TOLERANCIA_ARTEFATO
+    print(f"Tamanho: {os.path.getsize(entrada) / 1e6:.1f} MB -> {os.path.getsize(saida) / 1e6:.1f} MB")
+    print(f"Carga:   {tempo_pickle:.2f}s (pickle) -> {tempo_artefato:.2f}s (artefato)")
+    print(f"Paridade: {'OK' if ok else 'FALHOU'} (maior diferença {diferenca:.2e}, "
+          f"tolerância {TOLERANCIA_ARTEFATO:.0e})")
+
+    if not ok:
+        os.remove(saida)
+        sys.exit(1)
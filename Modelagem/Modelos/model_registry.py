@@ -0,0 +1,386 @@
+"""
+Registro do modelo em produção com troca atômica.
+
+Tudo o que uma previsão precisa (modelo, encoder, motor de inferência e
+versão) é carregado junto em um ModelBundle. Cada requisição pega o
+bundle atual uma única vez e usa só ele até o fim, então uma troca de modelo
+no meio do caminho não afeta requisições em andamento: elas terminam no
+modelo antigo e as novas já chegam no novo.
+
+A recarga (por chamada administrativa ou por mudança no arquivo) acontece em
+uma thread de fundo: carrega, valida em entradas canário e só então publica.
+Com vários workers, o caminho de uma versão nova é gravado em um arquivo
+ponteiro compartilhado, que o monitor de cada worker acompanha.
+"""
+import contextlib
+import os
+import threading
+import time
+import traceback
+
+import joblib
+import lightgbm as lgb
+import numpy as np
+import pandas as pd
+
+from feature_encoder import FeatureEncoder, FEATURES, CATEGORICAS
+from model_artifact import carregar_artefato
+from tree_engine import FlatForest, servir_com_numpy, verificar_paridade_modelo
+
+# Usados nas entradas canário quando o modelo não traz vocabulário próprio
+AEROPORTOS_CANARIO = ['GRU', 'CGH', 'GIG', 'SDU', 'BSB', 'CNF']
+CLIMAS_CANARIO = ['Good', 'Moderate', 'Severe', 'critical']
+
+
+def versao_do_arquivo(caminho):
+    """Identificador da versão em disco: nome + data de modificação."""
+    alvo = os.path.join(caminho, 'meta.json') if os.path.isdir(caminho) else caminho
+    modificado = time.localtime(os.stat(alvo).st_mtime)
+    return f"{os.path.basename(caminho.rstrip('/'))}@{time.strftime('%Y-%m-%dT%H:%M:%S', modificado)}"
+
+
+class ModelBundle:
+    """Modelo carregado + encoder + motor de inferência de uma versão."""
+
+    def __init__(self, model, encoder, motor, version, source, paridade=None, governador=None):
+        self.model = model
+        self.encoder = encoder
+        self.motor = motor
+        self.version = version
+        self.source = source
+        self.paridade = paridade
+        # inference_threads.ThreadGovernor: threads por chamada (None = padrão da biblioteca)
+        self.governador = governador
+        self.loaded_at = time.time()
+        # Preenchido pelo aquecimento do app (status, tempos); None = ainda frio
+        self.aquecimento = None
+
+    @property
+    def aquecido(self):
+        return self.aquecimento is not None and self.aquecimento.get('status') == 'done'
+
+    @property
+    def engine(self):
+        return 'numpy' if isinstance(self.motor, FlatForest) else 'library'
+
+    def entrada_unica(self, features):
+        """Um voo (dict de features) -> entrada do modelo."""
+        if self.encoder is not None:
+            # Caminho rápido: linha numérica direto, sem DataFrame
+            return self.encoder.encode(features)
+        return self.montar_dataframe({k: [v] for k, v in features.items()})
+
+    def entrada_lote(self, colunas):
+        """Lote organizado por coluna ({nome: sequência}) -> entrada do modelo."""
+        if self.encoder is not None:
+            return self.encoder.encode_colunas(colunas)
+        return self.montar_dataframe(colunas)
+
+    @staticmethod
+    def montar_dataframe(colunas):
+        """Caminho com DataFrame, usado só quando o modelo não tem encoder compilado."""
+        df_input = pd.DataFrame(colunas)
+
+        # Conversão obrigatória para category (LightGBM)
+        for col in CATEGORICAS:
+            df_input[col] = df_input[col].astype('category')
+
+        return df_input
+
+    def probabilidades(self, X):
+        """
+        Roda o ensemble uma única vez e devolve a probabilidade da classe 1.
+        A classe prevista é derivada dessa probabilidade com o limiar do app,
+        em vez de chamar predict e predict_proba separadamente.
+        """
+        motor = self.motor
+        if isinstance(motor, FlatForest):
+            return motor.predict_proba(X)[:, 1]
+
+        if self.governador is None:
+            threads, opcoes, contexto = None, {}, contextlib.nullcontext()
+        else:
+            threads = self.governador.threads_para(len(X))
+            self.governador.registrar(threads)
+            opcoes = {'num_threads': threads}
+            contexto = self.governador.contexto_joblib(threads)
+
+        if isinstance(motor, lgb.Booster):
+            return motor.predict(X, **opcoes)
+        booster = getattr(motor, 'booster_', None)
+        if booster is not None and not isinstance(X, pd.DataFrame):
+            return booster.predict(X, **opcoes)
+        if booster is not None:
+            return motor.predict_proba(X, **opcoes)[:, 1]
+        # scikit-learn: o n_jobs vem do contexto do joblib (ver ThreadGovernor.preparar_modelo)
+        with contexto:
+            return motor.predict_proba(X)[:, 1]
+
+
+def carregar_pacote(caminho, engine='library', governador=None):
+    """
+    Carrega um modelo do disco e monta o bundle completo.
+    `caminho` pode ser um .pkl (joblib), um .fotm (artefato compacto) ou um
+    diretório de vetores gravado por tree_engine.py --salvar. Com um
+    `governador`, o n_jobs gravado no pickle é substituído pela política dele.
+    """
+    version = versao_do_arquivo(caminho)
+
+    if os.path.isdir(caminho):
+        print(f"Abrindo vetores do modelo (mmap): {caminho}")
+        model = FlatForest.load(caminho, mmap=True)
+    elif caminho.endswith('.fotm'):
+        print(f"Abrindo artefato compacto (mmap): {caminho}")
+        model = carregar_artefato(caminho, mmap=True)
+    else:
+        print(f"Tentando carregar modelo: {caminho}")
+        model = joblib.load(caminho)
+        if governador is not None:
+            governador.preparar_modelo(model)
+
+    # O formato de carga não decide o motor: um LightGBM gravado em vetores
+    # volta a ser um Booster, que é mais rápido que o motor NumPy
+    if isinstance(model, FlatForest) and not servir_com_numpy(model):
+        booster = model.booster_lightgbm()
+        if booster is not None:
+            print("Modelo LightGBM: Booster reconstruído a partir dos vetores gravados.")
+            model = booster
+        else:
+            print("⚠️ Vetores do LightGBM sem o texto do Booster (exportação antiga). "
+                  "Usando o motor NumPy, mais lento; exporte de novo para usar o Booster.")
+
+    # Encoder pré-compilado com os vocabulários de categorias do treino
+    encoder = FeatureEncoder.from_model(model)
+    if encoder is not None:
+        tamanhos = {col: len(v) for col, v in encoder.vocabularios.items()}
+        print(f"Encoder de features compilado: {tamanhos}")
+    elif isinstance(model, FlatForest) and model.preprocessamento is not None:
+        # O pipeline foi treinado com outras colunas (ex.: dados brutos da ANAC)
+        faltantes = FeatureEncoder.from_tabelas(model.preprocessamento).colunas_de_entrada - set(FEATURES)
+        raise ValueError(f"{caminho} espera colunas que o serviço não recebe: {sorted(faltantes)}")
+    elif isinstance(model, FlatForest):
+        # Sem vocabulários nem tabelas de pré-processamento, a floresta receberia
+        # as categorias como texto
+        raise ValueError(f"{caminho} não traz as tabelas de pré-processamento das features "
+                         "(exporte de novo com tree_engine.py / model_artifact.py).")
+    else:
+        print("Modelo sem vocabulários de categorias. Usando caminho com DataFrame.")
+
+    motor, paridade = model, None
+
+    # Motor NumPy: só é ativado se bater com o modelo original nas features
+    # brutas (vetores abertos de um diretório ou de um .fotm já foram
+    # conferidos na exportação)
+    if engine == 'numpy' and not isinstance(model, FlatForest) and not servir_com_numpy(model):
+        print("Motor NumPy não é usado com o LightGBM (o Booster é mais rápido). "
+              "Mantendo o predict da biblioteca.")
+    elif engine == 'numpy' and not isinstance(model, FlatForest):
+        try:
+            floresta = FlatForest.from_model(model)
+            # Pipeline: o encoder aplica as tabelas do pré-processamento exportado
+            encoder_numpy = (FeatureEncoder.from_model(floresta)
+                             if floresta.preprocessamento is not None else encoder)
+            if encoder_numpy is None:
+                print("⚠️ Motor NumPy requer o encoder compilado. Mantendo o predict da biblioteca.")
+            else:
+                ok, paridade = verificar_paridade_modelo(floresta, model)
+                if ok:
+                    motor, encoder = floresta, encoder_numpy
+                    print(f"Motor NumPy ativo: {floresta.n_trees} árvores, "
+                          f"{floresta.nbytes / 1e6:.1f} MB (paridade {paridade:.1e})")
+                else:
+                    print(f"⚠️ Motor NumPy divergiu do modelo (diferença {paridade:.1e}). "
+                          "Mantendo o predict da biblioteca.")
+        except Exception as e:
+            print(f"⚠️ Falha ao exportar o motor NumPy: {e}. Mantendo o predict da biblioteca.")
+
+    return ModelBundle(model, encoder, motor, version, caminho, paridade, governador)
+
+
+def categorias_conhecidas(pacote):
+    """Aeroportos e categorias de clima que o modelo viu no treino (ou os padrões)."""
+    vocab = pacote.encoder.vocabularios if pacote.encoder is not None else {}
+    aeroportos = list(vocab.get('Origin', {})) or AEROPORTOS_CANARIO
+    climas = list(vocab.get('weather_category', {})) or CLIMAS_CANARIO
+    return aeroportos, climas
+
+
+def colunas_canario(pacote):
+    """Entradas fixas para validar um modelo recém-carregado antes da troca."""
+    aeroportos, climas = categorias_conhecidas(pacote)
+    aeroportos = aeroportos[:len(AEROPORTOS_CANARIO)]
+
+    colunas = {nome: [] for nome in FEATURES}
+    for i, origem in enumerate(aeroportos):
+        for j, clima in enumerate(climas):
+            colunas['Month'].append((i + j) % 12 + 1)
+            colunas['DayOfWeek'].append((i + j) % 7 + 1)
+            colunas['DepTime'].append(float((6 + 4 * j) % 24 * 100))
+            colunas['Origin'].append(origem)
+            colunas['Dest'].append(aeroportos[(i + 1) % len(aeroportos)])
+            colunas['weather_category'].append(clima)
+    return colunas
+
+
+def validar_pacote(pacote):
+    """
+    Roda as entradas canário no bundle (o que também aquece o caminho de
+    inferência) e falha se as probabilidades não forem válidas.
+    """
+    colunas = colunas_canario(pacote)
+    probs = np.asarray(pacote.probabilidades(pacote.entrada_lote(colunas)), dtype=float)
+    esperado = len(colunas['Origin'])
+    if probs.shape != (esperado,):
+        raise ValueError(f"Canário retornou formato {probs.shape}, esperado ({esperado},)")
+    if not np.all(np.isfinite(probs)) or probs.min() < 0 or probs.max() > 1:
+        raise ValueError("Canário retornou probabilidades fora de [0, 1]")
+    return probs
+
+
+class ModelRegistry:
+    """Guarda o bundle em produção e faz a troca atômica na recarga."""
+
+    def __init__(self, carregador, aquecedor=None, ponteiro=None):
+        # carregador(caminho) -> ModelBundle
+        self._carregador = carregador
+        # aquecedor(pacote): roda antes da publicação, para a versão nova já entrar quente
+        self._aquecedor = aquecedor
+        # Arquivo com o caminho do modelo publicado, visto por todos os workers do nó
+        self._ponteiro = ponteiro
+        self._pacote = None
+        self._recarga = threading.Lock()
+        self._ouvintes = []
+        self._ultima_tentativa = None
+        self.ultima_recarga = None
+
+    def atual(self):
+        """Bundle em produção. Pegue uma vez por requisição e use só ele."""
+        return self._pacote
+
+    def ao_trocar(self, callback):
+        """Registra callback(novo, anterior) chamado a cada troca de modelo."""
+        self._ouvintes.append(callback)
+
+    def caminho_publicado(self):
+        """Caminho gravado no arquivo ponteiro, ou None (sem ponteiro ou alvo inexistente)."""
+        if not self._ponteiro:
+            return None
+        try:
+            with open(self._ponteiro, encoding='utf-8') as f:
+                caminho = f.read().strip()
+        except OSError:
+            return None
+        return caminho if caminho and os.path.exists(caminho) else None
+
+    def _gravar_ponteiro(self, caminho):
+        # tmp + os.replace: um monitor nunca lê o arquivo pela metade
+        tmp = f"{self._ponteiro}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                f.write(caminho)
+            os.replace(tmp, self._ponteiro)
+        except OSError as e:
+            print(f"⚠️ Falha ao gravar o ponteiro do modelo {self._ponteiro}: {e}. "
+                  "Os demais workers seguem na versão anterior.")
+            with contextlib.suppress(OSError):
+                os.remove(tmp)
+
+    def publicar(self, pacote):
+        anterior = self._pacote
+        # A troca de referência é atômica; quem já pegou o bundle antigo segue com ele
+        self._pacote = pacote
+        for callback in self._ouvintes:
+            try:
+                callback(pacote, anterior)
+            except Exception:
+                traceback.print_exc()
+
+    def recarregar(self, caminho=None):
+        """
+        Carrega, valida e publica uma nova versão (síncrono).
+        Retorna False se já houver uma recarga em andamento.
+        """
+        if not self._recarga.acquire(blocking=False):
+            return False
+        try:
+            atual = self._pacote
+            caminho = caminho or (atual.source if atual else None)
+            self._ultima_tentativa = (caminho, versao_do_arquivo(caminho))
+            print(f"--- RECARREGANDO MODELO: {caminho} ---")
+
+            inicio = time.perf_counter()
+            pacote = self._carregador(caminho)
+            validar_pacote(pacote)
+            if self._aquecedor is not None:
+                self._aquecedor(pacote)
+            self.publicar(pacote)
+            # Arquivo novo: avisa os demais workers (só depois de validado aqui)
+            if self._ponteiro and (atual is None or pacote.source != atual.source):
+                self._gravar_ponteiro(pacote.source)
+
+            self.ultima_recarga = {
+                'status': 'success',
+                'version': pacote.version,
+                'previous_version': atual.version if atual else None,
+                'duration_s': round(time.perf_counter() - inicio, 3),
+                'at': time.strftime('%Y-%m-%dT%H:%M:%S')
+            }
+            print(f"Modelo trocado: {self.ultima_recarga['previous_version']} -> {pacote.version}")
+        except Exception as e:
+            print(f"❌ Recarga falhou, mantendo o modelo atual: {e}")
+            traceback.print_exc()
+            self.ultima_recarga = {
+                'status': 'error',
+                'message': str(e),
+                'at': time.strftime('%Y-%m-%dT%H:%M:%S')
+            }
+        finally:
+            self._recarga.release()
+        return True
+
+    def recarregar_em_segundo_plano(self, caminho=None):
+        """Dispara a recarga em uma thread. Retorna False se já houver uma em andamento."""
+        if self._recarga.locked():
+            return False
+        threading.Thread(target=self.recarregar, args=(caminho,),
+                         name='model-reload', daemon=True).start()
+        return True
+
+    def monitorar(self, intervalo):
+        """
+        Verifica a cada `intervalo` segundos se o arquivo do modelo em produção
+        mudou, ou se o arquivo ponteiro indica outro arquivo, e recarrega em
+        segundo plano. Uma versão que já falhou não é tentada de novo até o
+        arquivo mudar outra vez.
+        """
+        def laco():
+            while True:
+                time.sleep(intervalo)
+                atual = self._pacote
+                if atual is None:
+                    continue
+                caminho = self.caminho_publicado() or atual.source
+                try:
+                    versao = versao_do_arquivo(caminho)
+                except OSError:
+                    continue
+                mudou = caminho != atual.source or versao != atual.version
+                if mudou and (caminho, versao) != self._ultima_tentativa:
+                    self.recarregar(caminho)
+
+        threading.Thread(target=laco, name='model-watch', daemon=True).start()
+
+    def status(self):
+        pacote = self._pacote
+        dados = {
+            'model_loaded': pacote is not None,
+            'model_version': pacote.version if pacote else None,
+            'inference_engine': pacote.engine if pacote else None,
+            'ready': pacote is not None and pacote.aquecido,
+            'warmup': pacote.aquecimento if pacote else None,
+            'reload_in_progress': self._recarga.locked(),
+            'last_reload': self.ultima_recarga
+        }
+        if pacote is not None and pacote.paridade is not None:
+            dados['engine_parity_max_diff'] = pacote.paridade
+        return dados
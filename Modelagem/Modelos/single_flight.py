@@ -0,0 +1,83 @@
+"""
+Single-flight: chamadas concorrentes com a mesma chave viram uma só.
+
+Quando chega uma rajada de requisições para a mesma origem (todo mundo
+consultando partidas de GRU às 07:00), só a primeira thread chama o
+provedor; as outras esperam pela mesma chamada e recebem o mesmo resultado,
+ou a mesma exceção. Quem espera desiste depois de `timeout` segundos.
+"""
+import threading
+
+
+class _Voo:
+    """Uma chamada em andamento e quem está esperando por ela."""
+
+    __slots__ = ('evento', 'resultado', 'erro', 'seguidores')
+
+    def __init__(self):
+        self.evento = threading.Event()
+        self.resultado = None
+        self.erro = None
+        self.seguidores = 0
+
+
+class SingleFlight:
+    """Agrupa execuções concorrentes de `funcao` pela chave."""
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout
+        self._voos = {}
+        self._lock = threading.Lock()
+        self.execucoes = 0
+        self.compartilhadas = 0
+        self.timeouts = 0
+        self.maior_grupo = 0
+
+    def executar(self, chave, funcao, timeout=None):
+        """
+        Executa `funcao()` se não há chamada em andamento para a chave; senão
+        espera a que já está em andamento. Levanta TimeoutError se a espera
+        passar de `timeout` (padrão do construtor; None = sem limite).
+        """
+        with self._lock:
+            voo = self._voos.get(chave)
+            lider = voo is None
+            if lider:
+                voo = self._voos[chave] = _Voo()
+                self.execucoes += 1
+            else:
+                voo.seguidores += 1
+                self.compartilhadas += 1
+                self.maior_grupo = max(self.maior_grupo, voo.seguidores + 1)
+
+        if lider:
+            try:
+                voo.resultado = funcao()
+            except Exception as e:
+                voo.erro = e
+            finally:
+                with self._lock:
+                    del self._voos[chave]
+                voo.evento.set()
+        elif not voo.evento.wait(self.timeout if timeout is None else timeout):
+            with self._lock:
+                self.timeouts += 1
+            raise TimeoutError(f'Tempo esgotado aguardando {chave!r}')
+
+        if voo.erro is not None:
+            raise voo.erro
+        return voo.resultado
+
+    def em_andamento(self, chave):
+        with self._lock:
+            return chave in self._voos
+
+    def stats(self):
+        with self._lock:
+            return {
+                'executions': self.execucoes,
+                'shared': self.compartilhadas,
+                'timeouts': self.timeouts,
+                'in_flight': len(self._voos),
+                'largest_group': self.maior_grupo
+            }
@@ -0,0 +1,66 @@
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+from feature_encoder import CATEGORICAS
+
+AEROPORTOS = ['GRU', 'CGH', 'GIG', 'SDU', 'BSB', 'CNF', 'POA', 'REC']
+CLIMAS = ['Good', 'Moderate', 'Severe', 'Critical']
+
+
+@pytest.fixture(scope='session')
+def voos():
+    """Voos sintéticos com as FEATURES do serviço e o alvo de atraso"""
+    rng = np.random.default_rng(0)
+    n = 2000
+    df = pd.DataFrame({
+        'Month': rng.integers(1, 13, n),
+        'DayOfWeek': rng.integers(1, 8, n),
+        'DepTime': rng.integers(0, 2400, n).astype(float),
+        'Origin': rng.choice(AEROPORTOS, n),
+        'Dest': rng.choice(AEROPORTOS, n),
+        'weather_category': rng.choice(CLIMAS, n)
+    })
+    y = (df['Origin'].isin(['GRU', 'GIG']) ^ (df['DepTime'] > 1500) ^ (rng.random(n) < 0.2)).astype(int)
+    return df, y
+
+
+@pytest.fixture(scope='session')
+def modelo_lightgbm(voos):
+    """LGBMClassifier treinado com as categóricas como 'category' (como no serviço)"""
+    lgb = pytest.importorskip('lightgbm')
+    df, y = voos
+    df = df.copy()
+    for coluna in CATEGORICAS:
+        df[coluna] = df[coluna].astype('category')
+    return lgb.LGBMClassifier(n_estimators=20, num_leaves=15, verbose=-1).fit(df, y)
+
+
+@pytest.fixture(scope='session')
+def pipeline_rf(voos):
+    """Pipeline do scikit-learn com TargetEncoder + Random Forest"""
+    from sklearn.compose import ColumnTransformer
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import TargetEncoder
+
+    df, y = voos
+    pre = ColumnTransformer([
+        ('cat', TargetEncoder(target_type='binary'), CATEGORICAS),
+        ('num', 'passthrough', ['Month', 'DayOfWeek', 'DepTime'])
+    ], verbose_feature_names_out=False)
+    return Pipeline([
+        ('preprocessor', pre),
+        ('modelo', RandomForestClassifier(n_estimators=10, max_depth=8, random_state=0))
+    ]).fit(df, y)
+
+
+@pytest.fixture(scope='session')
+def arquivos_modelo(tmp_path_factory, modelo_lightgbm, pipeline_rf):
+    """Os dois modelos gravados com joblib, como o serviço os recebe"""
+    diretorio = tmp_path_factory.mktemp('modelos')
+    caminhos = {'lightgbm': str(diretorio / 'lgb.pkl'), 'rf': str(diretorio / 'rf.pkl')}
+    joblib.dump(modelo_lightgbm, caminhos['lightgbm'])
+    joblib.dump(pipeline_rf, caminhos['rf'])
+    return caminhos
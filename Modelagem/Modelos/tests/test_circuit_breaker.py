@@ -0,0 +1,104 @@
+"""
+Testes do circuit breaker do provedor de clima
+"""
+
+import time
+import pytest
+from circuit_breaker import CircuitBreaker, FECHADO, ABERTO, SEMIABERTO
+
+
+class TestCircuitBreaker:
+    """Testes do CircuitBreaker"""
+
+    @pytest.fixture
+    def disjuntor(self):
+        return CircuitBreaker(falhas_para_abrir=3, tempo_aberto_s=0.05, sondas=1)
+
+    def chamar(self, disjuntor, sucesso, duracao=0.0):
+        permissao = disjuntor.permitir()
+        assert permissao
+        disjuntor.registrar(permissao, sucesso, duracao)
+
+    def abrir(self, disjuntor):
+        for _ in range(disjuntor.falhas_para_abrir):
+            self.chamar(disjuntor, False)
+
+    def test_abre_apos_falhas_seguidas(self, disjuntor):
+        """Testa que falhas_para_abrir falhas seguidas abrem o circuito"""
+
+        self.chamar(disjuntor, False)
+        self.chamar(disjuntor, False)
+        assert disjuntor.estado == FECHADO
+
+        self.chamar(disjuntor, False)
+        assert disjuntor.estado == ABERTO
+        assert disjuntor.permitir() is None
+        assert disjuntor.stats()['rejected'] == 1
+
+    def test_chamada_lenta_conta_como_falha(self):
+        """Testa o limite de latência"""
+
+        disjuntor = CircuitBreaker(falhas_para_abrir=2, limite_latencia_s=0.5)
+        self.chamar(disjuntor, True, duracao=0.1)
+        self.chamar(disjuntor, True, duracao=0.9)
+        self.chamar(disjuntor, True, duracao=1.2)
+
+        assert disjuntor.estado == ABERTO
+        assert disjuntor.stats()['slow_calls'] == 2
+
+    def test_semiaberto_limita_sondas(self, disjuntor):
+        """Testa que só `sondas` chamadas passam depois de tempo_aberto_s"""
+
+        self.abrir(disjuntor)
+        time.sleep(0.06)
+
+        assert disjuntor.estado == SEMIABERTO
+        permissao = disjuntor.permitir()
+        assert permissao.sonda
+        assert disjuntor.permitir() is None
+
+    def test_sonda_fecha_ou_reabre(self, disjuntor):
+        """Testa half_open -> closed e half_open -> open"""
+
+        self.abrir(disjuntor)
+        time.sleep(0.06)
+        self.chamar(disjuntor, False)
+        assert disjuntor.estado == ABERTO
+
+        time.sleep(0.06)
+        self.chamar(disjuntor, True)
+        assert disjuntor.estado == FECHADO
+
+    def test_sucesso_obsoleto_nao_fecha(self, disjuntor):
+        """Testa que uma chamada liberada antes da abertura não fecha o circuito"""
+
+        antiga = disjuntor.permitir()
+        self.abrir(disjuntor)
+        time.sleep(0.06)
+        sonda = disjuntor.permitir()
+        assert sonda.sonda
+
+        disjuntor.registrar(antiga, True, 0.0)
+        assert disjuntor.estado == SEMIABERTO
+        assert disjuntor.permitir() is None
+        assert disjuntor.stats()['stale_results'] == 1
+
+        disjuntor.registrar(sonda, False, 0.0)
+        assert disjuntor.estado == ABERTO
+
+    def test_falha_obsoleta_e_ignorada(self):
+        """Testa que uma sonda de um half_open anterior não reabre o circuito"""
+
+        disjuntor = CircuitBreaker(falhas_para_abrir=1, tempo_aberto_s=0.05, sondas=2)
+        self.chamar(disjuntor, False)
+        time.sleep(0.06)
+        primeira, segunda = disjuntor.permitir(), disjuntor.permitir()
+        disjuntor.registrar(primeira, False, 0.0)
+        time.sleep(0.06)
+        self.chamar(disjuntor, True)
+        self.chamar(disjuntor, True)
+        assert disjuntor.estado == FECHADO
+
+        disjuntor.registrar(segunda, False, 0.0)
+        assert disjuntor.estado == FECHADO
+        assert disjuntor.falhas_seguidas == 0
@@ -0,0 +1,109 @@
+"""
+Testes do encoder de features pré-compilado
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from feature_encoder import CATEGORICAS, FEATURES, FeatureEncoder, arredondar_dep_time
+from tree_engine import FlatForest
+
+VOO = {'Month': 3, 'DayOfWeek': 2, 'DepTime': 1830.0,
+       'Origin': 'GRU', 'Dest': 'GIG', 'weather_category': 'Good'}
+
+
+class TestFeatureEncoder:
+    """Testes do FeatureEncoder"""
+
+    @pytest.fixture
+    def encoder(self):
+        return FeatureEncoder(FEATURES, {
+            'Origin': ['CGH', 'GRU'],
+            'Dest': ['GIG', 'SDU'],
+            'weather_category': ['Good', 'Severe']
+        })
+
+    def test_categorias_viram_codigos_do_treino(self, encoder):
+        """Testa que cada categoria vira a sua posição no vocabulário"""
+
+        X = encoder.encode(VOO)
+        assert X.shape == (1, len(FEATURES))
+        assert X.tolist() == [[3.0, 2.0, 1830.0, 1.0, 0.0, 0.0]]
+
+    def test_categoria_desconhecida_vira_nan(self, encoder):
+        """Testa que uma categoria fora do treino vira NaN, como no LightGBM"""
+
+        X = encoder.encode({**VOO, 'Origin': 'XXX', 'weather_category': 'Tornado'})
+        assert np.isnan(X[0, FEATURES.index('Origin')])
+        assert np.isnan(X[0, FEATURES.index('weather_category')])
+        assert X[0, FEATURES.index('Dest')] == 0.0
+
+    def test_tabela_usa_o_valor_padrao(self):
+        """Testa que, com tabelas de pré-processamento, a desconhecida recebe o padrão"""
+
+        encoder = FeatureEncoder(['Origin', 'DepTime'], {'Origin': {'GRU': 0.7, 'CGH': 0.2}},
+                                 {'Origin': 0.45})
+        assert encoder.encode({'Origin': 'GRU', 'DepTime': 900}).tolist() == [[0.7, 900.0]]
+        assert encoder.encode({'Origin': 'XXX', 'DepTime': 900}).tolist() == [[0.45, 900.0]]
+
+    def test_lote_por_coluna_igual_ao_por_voo(self, encoder):
+        """Testa que encode_colunas e encode_many geram a mesma matriz"""
+
+        voos = [VOO, {**VOO, 'Origin': 'XXX', 'Dest': 'SDU'}, {**VOO, 'weather_category': 'Severe'}]
+        colunas = {nome: [v[nome] for v in voos] for nome in FEATURES}
+
+        np.testing.assert_array_equal(encoder.encode_many(voos), encoder.encode_colunas(colunas))
+        assert encoder.encode_many([]).shape == (0, len(FEATURES))
+
+    def test_from_model_lightgbm(self, modelo_lightgbm):
+        """Testa que os vocabulários vêm do pandas_categorical do LightGBM"""
+
+        encoder = FeatureEncoder.from_model(modelo_lightgbm)
+        # No DataFrame, a categoria desconhecida é um valor ausente
+        df = pd.DataFrame([VOO, {**VOO, 'Origin': None}])
+        for coluna, categorias in zip(CATEGORICAS, modelo_lightgbm.booster_.pandas_categorical):
+            df[coluna] = pd.Categorical(df[coluna], categories=categorias)
+
+        esperado = modelo_lightgbm.predict_proba(df)[:, 1]
+        obtido = modelo_lightgbm.booster_.predict(encoder.encode_many([VOO, {**VOO, 'Origin': 'XXX'}]))
+        np.testing.assert_allclose(obtido, esperado)
+
+    def test_from_model_pipeline(self, pipeline_rf):
+        """Testa que o pipeline exportado usa as tabelas do TargetEncoder"""
+
+        floresta = FlatForest.from_model(pipeline_rf)
+        encoder = FeatureEncoder.from_model(floresta)
+        voos = [VOO, {**VOO, 'Origin': 'XXX', 'weather_category': 'Tornado'}]
+
+        esperado = pipeline_rf.predict_proba(pd.DataFrame(voos))[:, 1]
+        np.testing.assert_allclose(floresta.predict_positive(encoder.encode_many(voos)), esperado, atol=1e-9)
+
+    def test_partes_de_data(self):
+        """Testa a conversão de datas com dayfirst, como o ExtratorDeDatas do treino"""
+
+        datas = {nome: {'source': 'dt_partida', 'part': parte, 'dayfirst': True}
+                 for nome, parte in (('mes', 'month'), ('hora', 'hour'))}
+        encoder = FeatureEncoder(['mes', 'hora'], {}, datas=datas)
+
+        assert encoder.colunas_de_entrada == {'dt_partida'}
+        assert encoder.encode({'dt_partida': '02/01/2024 10:30'}).tolist() == [[1.0, 10.0]]
+        assert np.isnan(encoder.encode({'dt_partida': 'sem data'})).all()
+        lote = encoder.encode_colunas({'dt_partida': ['02/01/2024 10:30', 'sem data', '15/07/2024 23:00']})
+        np.testing.assert_array_equal(lote, [[1.0, 10.0], [np.nan, np.nan], [7.0, 23.0]])
+
+    def test_pipeline_com_outras_colunas_nao_serve(self):
+        """Testa que um pipeline com colunas que o serviço não recebe não ganha encoder"""
+
+        class Modelo:
+            preprocessamento = {'columns': ['nr_voo'], 'tables': {}, 'dates': {},
+                                'input_columns': ['nr_voo']}
+
+        assert FeatureEncoder.from_model(Modelo()) is None
+
+
+def test_arredondar_dep_time():
+    """Testa o arredondamento do DepTime para o início da faixa"""
+
+    assert arredondar_dep_time(1837.0, 15) == 1830.0
+    assert arredondar_dep_time(1837.0, 1) == 1837.0
+    np.testing.assert_array_equal(arredondar_dep_time(np.array([59.0, 2359.0]), 30), [30.0, 2330.0])
@@ -0,0 +1,140 @@
+"""
+Testes do micro-batching das previsões de uma linha
+"""
+
+import threading
+import time
+import numpy as np
+import pytest
+from micro_batching import MicroBatcher
+
+
+class PacoteFalso:
+    """Bundle mínimo: a probabilidade é a primeira coluna, e cada lote fica registrado"""
+
+    def __init__(self, erro=None):
+        self.lotes = []
+        self.erro = erro
+
+    def probabilidades(self, X):
+        self.lotes.append(len(X))
+        if self.erro is not None:
+            raise self.erro
+        return X[:, 0]
+
+
+def linha(valor):
+    return np.array([[valor, 0.0]])
+
+
+class TestMicroBatcher:
+    """Testes do MicroBatcher"""
+
+    def disparar(self, batcher, chamadas, liberar):
+        """
+        Anuncia cada requisição na hora e só envia a linha depois de `liberar`.
+        chamadas: [(pacote, valor ou None para desistir)]
+        """
+        resultados = [None] * len(chamadas)
+        anunciadas = threading.Barrier(len(chamadas) + 1)
+
+        def requisicao(i, pacote, valor):
+            try:
+                with batcher.requisicao() as r:
+                    anunciadas.wait()
+                    liberar.wait()
+                    if valor is not None:
+                        resultados[i] = r.probabilidade(pacote, linha(valor))
+            except Exception as e:
+                resultados[i] = e
+
+        threads = [threading.Thread(target=requisicao, args=(i, pacote, valor))
+                   for i, (pacote, valor) in enumerate(chamadas)]
+        for thread in threads:
+            thread.start()
+        anunciadas.wait()
+        return threads, resultados
+
+    def test_requisicao_sozinha_nao_espera_a_janela(self):
+        """Testa que sem ninguém a caminho o lote sai na hora"""
+
+        batcher = MicroBatcher(tamanho_maximo=8, janela_ms=2000)
+        pacote = PacoteFalso()
+
+        inicio = time.perf_counter()
+        assert batcher.probabilidade(pacote, linha(0.25)) == 0.25
+        assert time.perf_counter() - inicio < 1.0
+
+    def test_requisicoes_anunciadas_viram_um_lote(self):
+        """Testa que requisições concorrentes são pontuadas em uma única chamada"""
+
+        batcher = MicroBatcher(tamanho_maximo=8, janela_ms=2000)
+        pacote = PacoteFalso()
+        liberar = threading.Event()
+        valores = [0.1, 0.2, 0.3, 0.4]
+
+        threads, resultados = self.disparar(batcher, [(pacote, v) for v in valores], liberar)
+        liberar.set()
+        for thread in threads:
+            thread.join(5)
+
+        assert resultados == valores
+        assert pacote.lotes == [4]
+
+    def test_desistencia_libera_o_lote(self):
+        """Testa que uma requisição anunciada que não envia não segura a janela"""
+
+        batcher = MicroBatcher(tamanho_maximo=8, janela_ms=2000)
+        pacote = PacoteFalso()
+        liberar = threading.Event()
+
+        inicio = time.perf_counter()
+        threads, resultados = self.disparar(batcher, [(pacote, 0.5), (pacote, None)], liberar)
+        liberar.set()
+        for thread in threads:
+            thread.join(5)
+
+        assert resultados == [0.5, None]
+        assert time.perf_counter() - inicio < 1.0
+        assert pacote.lotes == [1]
+
+    def test_lote_cheio_sai_sem_esperar(self):
+        """Testa o fechamento por tamanho_maximo"""
+
+        batcher = MicroBatcher(tamanho_maximo=2, janela_ms=2000)
+        pacote = PacoteFalso()
+        liberar = threading.Event()
+
+        threads, resultados = self.disparar(batcher, [(pacote, v) for v in (0.1, 0.2, 0.3, 0.4)], liberar)
+        liberar.set()
+        for thread in threads:
+            thread.join(5)
+
+        assert sorted(resultados) == [0.1, 0.2, 0.3, 0.4]
+        assert pacote.lotes == [2, 2]
+
+    def test_versoes_diferentes_pontuam_separado(self):
+        """Testa que um lote com dois bundles (troca de modelo) roda cada grupo no seu"""
+
+        batcher = MicroBatcher(tamanho_maximo=8, janela_ms=2000)
+        antigo, novo = PacoteFalso(), PacoteFalso()
+        liberar = threading.Event()
+
+        threads, resultados = self.disparar(
+            batcher, [(antigo, 0.1), (novo, 0.2), (antigo, 0.3)], liberar)
+        liberar.set()
+        for thread in threads:
+            thread.join(5)
+
+        assert resultados == [0.1, 0.2, 0.3]
+        assert antigo.lotes == [2]
+        assert novo.lotes == [1]
+
+    def test_erro_do_modelo_chega_a_requisicao(self):
+        """Testa que a exceção do modelo é repassada a quem enviou a linha"""
+
+        batcher = MicroBatcher(tamanho_maximo=8, janela_ms=1)
+
+        with pytest.raises(ValueError, match='modelo quebrado'):
+            batcher.probabilidade(PacoteFalso(erro=ValueError('modelo quebrado')), linha(0.5))
+        assert batcher.probabilidade(PacoteFalso(), linha(0.5)) == 0.5
@@ -0,0 +1,122 @@
+"""
+Testes do registro do modelo em produção (troca atômica e recarga)
+"""
+
+import os
+import shutil
+import time
+import numpy as np
+import pytest
+from model_registry import ModelRegistry, carregar_pacote, validar_pacote
+
+
+def sabotar(pacote):
+    """Bundle que carrega mas devolve probabilidades inválidas no canário"""
+    pacote.probabilidades = lambda X: np.full(len(X), np.nan)
+    return pacote
+
+
+class TestModelRegistry:
+    """Testes do ModelRegistry"""
+
+    @pytest.fixture
+    def carregador(self):
+        """carregar_pacote que sabota os arquivos chamados ruim.*"""
+        def carregar(caminho):
+            pacote = carregar_pacote(caminho)
+            return sabotar(pacote) if os.path.basename(caminho).startswith('ruim.') else pacote
+        return carregar
+
+    @pytest.fixture
+    def ruim(self, arquivos_modelo, tmp_path):
+        caminho = str(tmp_path / 'ruim.pkl')
+        shutil.copy(arquivos_modelo['rf'], caminho)
+        return caminho
+
+    @pytest.fixture
+    def registry(self, carregador, arquivos_modelo):
+        registry = ModelRegistry(carregador)
+        registry.publicar(carregador(arquivos_modelo['lightgbm']))
+        return registry
+
+    def test_recarga_troca_o_bundle(self, registry, arquivos_modelo):
+        """Testa a troca para um arquivo novo e o aviso aos ouvintes"""
+
+        trocas = []
+        registry.ao_trocar(lambda novo, anterior: trocas.append((anterior.source, novo.source)))
+        anterior = registry.atual()
+
+        assert registry.recarregar(arquivos_modelo['rf'])
+        assert registry.atual().source == arquivos_modelo['rf']
+        assert registry.ultima_recarga['status'] == 'success'
+        assert registry.ultima_recarga['previous_version'] == anterior.version
+        assert trocas == [(arquivos_modelo['lightgbm'], arquivos_modelo['rf'])]
+
+    def test_validacao_falha_mantem_o_atual(self, registry, ruim):
+        """Testa que um modelo que não passa no canário não é publicado"""
+
+        anterior = registry.atual()
+
+        assert registry.recarregar(ruim)
+        assert registry.atual() is anterior
+        assert registry.ultima_recarga['status'] == 'error'
+        assert 'fora de [0, 1]' in registry.ultima_recarga['message']
+
+    def test_arquivo_invalido_mantem_o_atual(self, registry, tmp_path):
+        """Testa que uma falha de carga não derruba o modelo em produção"""
+
+        anterior = registry.atual()
+        corrompido = tmp_path / 'corrompido.pkl'
+        corrompido.write_bytes(b'nao e um pickle')
+
+        assert registry.recarregar(str(corrompido))
+        assert registry.atual() is anterior
+        assert registry.ultima_recarga['status'] == 'error'
+
+    def test_uma_recarga_por_vez(self, registry, arquivos_modelo):
+        """Testa que uma segunda recarga é recusada enquanto a primeira roda"""
+
+        registry._recarga.acquire()
+        try:
+            assert not registry.recarregar(arquivos_modelo['rf'])
+            assert not registry.recarregar_em_segundo_plano(arquivos_modelo['rf'])
+        finally:
+            registry._recarga.release()
+
+    def test_ponteiro_leva_a_troca_aos_outros_workers(self, carregador, arquivos_modelo, ruim, tmp_path):
+        """Testa que o caminho validado em um worker chega ao monitor dos demais"""
+
+        ponteiro = str(tmp_path / 'modelo_publicado.txt')
+        workers = [ModelRegistry(carregador, ponteiro=ponteiro) for _ in range(2)]
+        for registry in workers:
+            registry.publicar(carregador(arquivos_modelo['lightgbm']))
+
+        # Versão que falha na validação: o ponteiro não muda
+        workers[0].recarregar(ruim)
+        assert workers[0].caminho_publicado() is None
+
+        workers[1].monitorar(0.05)
+        workers[0].recarregar(arquivos_modelo['rf'])
+        assert workers[1].caminho_publicado() == arquivos_modelo['rf']
+
+        prazo = time.monotonic() + 10
+        while workers[1].atual().source != arquivos_modelo['rf'] and time.monotonic() < prazo:
+            time.sleep(0.05)
+        assert workers[1].atual().source == arquivos_modelo['rf']
+        assert workers[1].atual().version == workers[0].atual().version
+
+
+def test_motor_numpy_so_para_o_random_forest(arquivos_modelo):
+    """Testa a escolha do motor: NumPy para o pipeline, biblioteca para o LightGBM"""
+
+    rf = carregar_pacote(arquivos_modelo['rf'], engine='numpy')
+    assert rf.engine == 'numpy'
+    assert rf.paridade is not None and rf.paridade < 1e-9
+
+    lightgbm = carregar_pacote(arquivos_modelo['lightgbm'], engine='numpy')
+    assert lightgbm.engine == 'library'
+    assert lightgbm.encoder is not None
+
+    for pacote in (rf, lightgbm):
+        probs = validar_pacote(pacote)
+        assert np.all((probs >= 0) & (probs <= 1))
@@ -0,0 +1,160 @@
+"""
+Testes do motor de inferência NumPy (tree_engine)
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from tree_engine import (MISSING_NAN, MISSING_ZERO, TOLERANCIA_PARIDADE, FlatForest, amostra_sintetica,
+                         referencia_do_modelo, servir_com_numpy, verificar_paridade,
+                         verificar_paridade_modelo)
+
+
+def numericos(n=1500, seed=0, zeros=0.3, ausentes=0.1):
+    """Matriz com zeros exatos e NaN, e um alvo que depende deles"""
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n, 4))
+    X[rng.random(X.shape) < zeros] = 0.0
+    y = ((X[:, 0] > 0) ^ (X[:, 1] == 0) ^ (rng.random(n) < 0.1)).astype(int)
+    X[rng.random(X.shape) < ausentes] = np.nan
+    return X, y
+
+
+class TestFlatForest:
+    """Testes da paridade da FlatForest com o modelo original"""
+
+    @pytest.fixture(scope='class')
+    def lightgbm_zero(self):
+        """LightGBM com zero_as_missing: os splits ganham missing_type 'Zero'"""
+        lgb = pytest.importorskip('lightgbm')
+        X, y = numericos()
+        return lgb.LGBMClassifier(n_estimators=15, num_leaves=15, zero_as_missing=True,
+                                  verbose=-1).fit(X, y)
+
+    @pytest.fixture(scope='class')
+    def floresta_sklearn(self):
+        from sklearn.ensemble import RandomForestClassifier
+        X, y = numericos()
+        return RandomForestClassifier(n_estimators=10, max_depth=8, random_state=0).fit(X, y)
+
+    def test_lightgbm_com_nan(self, modelo_lightgbm):
+        """Testa a paridade do LightGBM com categóricas e valores ausentes"""
+
+        floresta = FlatForest.from_model(modelo_lightgbm)
+        X = amostra_sintetica(floresta)
+        ok, diferenca = verificar_paridade(floresta, referencia_do_modelo(modelo_lightgbm), X)
+        assert ok, diferenca
+
+    def test_missing_zero_em_lote_sem_nan(self, lightgbm_zero):
+        """Testa que zeros vão para o lado padrão mesmo sem nenhum NaN no lote"""
+
+        floresta = FlatForest.from_model(lightgbm_zero)
+        assert np.any(floresta.missing_type == MISSING_ZERO)
+
+        X, _ = numericos(n=500, seed=1, ausentes=0.0)
+        assert not np.isnan(X).any() and (X == 0).any()
+        esperado = lightgbm_zero.booster_.predict(X)
+        np.testing.assert_allclose(floresta.predict_positive(X), esperado, atol=TOLERANCIA_PARIDADE)
+
+        X_nan, _ = numericos(n=500, seed=2)
+        np.testing.assert_allclose(floresta.predict_positive(X_nan), lightgbm_zero.booster_.predict(X_nan),
+                                   atol=TOLERANCIA_PARIDADE)
+        assert verificar_paridade_modelo(floresta, lightgbm_zero)[0]
+
+    def test_sklearn_com_nan(self, floresta_sklearn):
+        """Testa a paridade de uma floresta do scikit-learn com valores ausentes"""
+
+        floresta = FlatForest.from_model(floresta_sklearn)
+        X, _ = numericos(n=500, seed=3)
+        np.testing.assert_allclose(floresta.predict_positive(X), floresta_sklearn.predict_proba(X)[:, 1],
+                                   atol=1e-12)
+        assert not np.any(floresta.missing_type == MISSING_ZERO)
+        assert np.any(floresta.missing_type == MISSING_NAN)
+
+    def test_pipeline_em_linhas_brutas(self, pipeline_rf):
+        """Testa a paridade do pipeline exportado a partir das features brutas"""
+
+        floresta = FlatForest.from_model(pipeline_rf)
+        ok, diferenca = verificar_paridade_modelo(floresta, pipeline_rf)
+        assert ok, diferenca
+
+    def test_gravar_e_abrir(self, tmp_path, floresta_sklearn, modelo_lightgbm):
+        """Testa que os vetores gravados voltam iguais (com mmap) e o LightGBM volta a ser Booster"""
+
+        floresta = FlatForest.from_model(floresta_sklearn)
+        floresta.save(str(tmp_path / 'rf'))
+        aberta = FlatForest.load(str(tmp_path / 'rf'), mmap=True)
+        X, _ = numericos(n=200, seed=4)
+        np.testing.assert_array_equal(aberta.predict_positive(X), floresta.predict_positive(X))
+        assert aberta.booster_lightgbm() is None
+
+        lightgbm = FlatForest.from_model(modelo_lightgbm)
+        lightgbm.save(str(tmp_path / 'lgb'))
+        booster = FlatForest.load(str(tmp_path / 'lgb')).booster_lightgbm()
+        X = amostra_sintetica(lightgbm)
+        np.testing.assert_allclose(booster.predict(X), modelo_lightgbm.booster_.predict(X))
+
+    def test_motor_numpy_so_para_sklearn(self, floresta_sklearn, modelo_lightgbm, pipeline_rf):
+        """Testa que o motor NumPy fica restrito às florestas do scikit-learn"""
+
+        assert servir_com_numpy(floresta_sklearn)
+        assert servir_com_numpy(pipeline_rf)
+        assert servir_com_numpy(FlatForest.from_model(pipeline_rf))
+        assert not servir_com_numpy(modelo_lightgbm)
+        assert not servir_com_numpy(FlatForest.from_model(modelo_lightgbm))
+
+
+def test_pipeline_com_etapa_desconhecida(voos):
+    """Testa que uma etapa que não vira tabela é recusada na exportação"""
+    from sklearn.compose import ColumnTransformer
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import StandardScaler
+
+    df, y = voos
+    colunas = ['Month', 'DayOfWeek', 'DepTime']
+    pipeline = Pipeline([
+        ('pre', ColumnTransformer([('escala', StandardScaler(), colunas)])),
+        ('modelo', RandomForestClassifier(n_estimators=2, random_state=0))
+    ]).fit(df[colunas], y)
+
+    with pytest.raises(ValueError, match='não suportado'):
+        FlatForest.from_model(pipeline)
+
+
+def test_extrator_de_datas(voos):
+    """Testa a exportação da etapa de datas do pipeline do Random Forest"""
+    from sklearn.base import BaseEstimator, TransformerMixin
+    from sklearn.compose import ColumnTransformer
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.pipeline import Pipeline
+
+    class ExtratorDeDatas(BaseEstimator, TransformerMixin):
+        def fit(self, X, y=None):
+            return self
+
+        def transform(self, X):
+            datas = pd.to_datetime(pd.DataFrame(X).iloc[:, 0], dayfirst=True, errors='coerce')
+            return pd.DataFrame({'mes': datas.dt.month, 'dia_semana': datas.dt.dayofweek,
+                                 'hora': datas.dt.hour, 'dia_ano': datas.dt.day_of_year})
+
+        def get_feature_names_out(self, input_features=None):
+            return ['mes', 'dia_semana', 'hora', 'dia_ano']
+
+    df, y = voos
+    rng = np.random.default_rng(0)
+    instantes = pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 366 * 24 * 60, len(df)), unit='m')
+    brutos = pd.DataFrame({'dt_partida_prevista': instantes.strftime('%d/%m/%Y %H:%M'),
+                           'nr_assentos_ofertados': rng.integers(100, 200, len(df))})
+    pipeline = Pipeline([
+        ('pre', ColumnTransformer([('data_proc', ExtratorDeDatas(), ['dt_partida_prevista']),
+                                   ('num', 'passthrough', ['nr_assentos_ofertados'])],
+                                  verbose_feature_names_out=False)),
+        ('modelo', RandomForestClassifier(n_estimators=5, max_depth=6, random_state=0))
+    ]).fit(brutos, y)
+
+    floresta = FlatForest.from_model(pipeline)
+    assert floresta.preprocessamento['dates']['hora'] == {
+        'source': 'dt_partida_prevista', 'part': 'hour', 'dayfirst': True}
+    ok, diferenca = verificar_paridade_modelo(floresta, pipeline)
+    assert ok, diferenca
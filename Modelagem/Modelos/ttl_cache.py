@@ -0,0 +1,74 @@
+"""
+Cache LRU com expiração (TTL), seguro para uso entre threads.
+
+Usado para guardar probabilidades já calculadas: as features do modelo são
+discretas e rotas populares em horários populares chegam repetidas.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Até `capacidade` itens; cada um vale por `ttl` segundos (0 = sem expiração)."""
+
+    def __init__(self, capacidade, ttl=0):
+        self.capacidade = int(capacidade)
+        self.ttl = float(ttl)
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def obter(self, chave):
+        """Valor guardado ou None (ausente ou expirado)."""
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None:
+                self.misses += 1
+                return None
+            expira, valor = item
+            if expira is not None and expira < time.monotonic():
+                del self._itens[chave]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._itens.move_to_end(chave)
+            self.hits += 1
+            return valor
+
+    def guardar(self, chave, valor):
+        expira = time.monotonic() + self.ttl if self.ttl > 0 else None
+        with self._lock:
+            self._itens[chave] = (expira, valor)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.capacidade:
+                self._itens.popitem(last=False)
+                self.evictions += 1
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+            self.invalidations += 1
+
+    def __len__(self):
+        return len(self._itens)
+
+    def stats(self):
+        with self._lock:
+            consultas = self.hits + self.misses
+            return {
+                'enabled': True,
+                'size': len(self._itens),
+                'capacity': self.capacidade,
+                'ttl_s': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / consultas, 4) if consultas else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations
+            }
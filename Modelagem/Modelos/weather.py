@@ -0,0 +1,535 @@
+"""
+Consulta de clima para as previsões de atraso.
+
+O endpoint /forecast da OpenWeather devolve a previsão inteira de 5 dias em
+slots de 3 horas para uma coordenada. Em vez de usar um slot e descartar o
+resto, a lista completa fica em cache por célula de previsão (um aeroporto,
+ou vários aeroportos próximos; ver weather_cells.py), e qualquer horário de
+partida dentro da janela é respondido localmente por busca binária nos
+timestamps ordenados. A API é chamada no máximo uma vez por célula a cada
+intervalo de atualização do provedor, e consultas simultâneas à mesma
+célula com o cache vazio compartilham uma única chamada (single-flight).
+
+consultar_lote() resolve um lote inteiro de voos com uma previsão por
+aeroporto, casando slots e categorias de forma vetorizada.
+
+Um circuit breaker protege o provedor: com o circuito aberto, a consulta
+responde na hora com a última previsão conhecida (ou 'Good'), em vez de
+esperar o timeout a cada voo.
+"""
+import calendar
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from circuit_breaker import ABERTO, CircuitBreaker
+from feature_encoder import converter_data
+from single_flight import SingleFlight
+from weather_cells import ForecastCells
+
+# A OpenWeather publica a previsão em passos de 3 horas
+CADENCIA_PREVISAO = 3 * 3600
+# Categorias de clima do modelo, da menos à mais severa
+CATEGORIAS_CLIMA = ['Good', 'Moderate', 'Severe', 'critical']
+
+
+class ErroClima(Exception):
+    """Falha ao obter a previsão. A mensagem vai para weather_context.main."""
+
+
+class CircuitoAberto(ErroClima):
+    """O provedor não foi chamado porque o circuito está aberto."""
+
+
+def classificar_clima(main_weather):
+    """
+    Mapeia o 'main' do OpenWeather para as categorias do modelo.
+    Categorias do modelo: ['Good', 'Moderate', 'Severe', 'critical']
+
+    Valores comuns de 'main' na OpenWeather:
+    Thunderstorm, Drizzle, Rain, Snow, Mist, Smoke, Haze, Dust, Fog, Sand, Ash, Squall, Tornado, Clear, Clouds
+    """
+    if not main_weather:
+        return 'Good'
+
+    main_weather = main_weather.lower()
+
+    # 1. Critical: Tempestades violentas e eventos extremos
+    if main_weather in ['thunderstorm', 'tornado', 'squall', 'ash']:
+        return 'critical'
+
+    # 2. Severe: Neve e visibilidade severamente reduzida (Areia/Poeira)
+    elif main_weather in ['snow', 'sand', 'dust']:
+        return 'Severe'
+
+    # 3. Moderate: Chuva, Garoa e Visibilidade reduzida (Neblina)
+    elif main_weather in ['rain', 'drizzle', 'mist', 'fog', 'haze', 'smoke']:
+        return 'Moderate'
+
+    # 4. Good: Céu limpo ou nublado (sem precipitação)
+    elif main_weather in ['clear', 'clouds']:
+        return 'Good'
+
+    # Padrão de segurança
+    return 'Good'
+
+
+def timestamp_alvo(dt_obj):
+    """
+    Timestamp usado para escolher o slot. Datas sem fuso são tratadas como
+    UTC, como o pd.Timestamp.timestamp() fazia na versão anterior.
+    """
+    if dt_obj.tzinfo is not None:
+        return int(dt_obj.timestamp())
+    return calendar.timegm(dt_obj.timetuple())
+
+
+class ForecastSlots:
+    """Lista de slots de uma previsão, ordenada por horário."""
+
+    __slots__ = ('timestamps', 'mains', 'obtido_em', '_vetores')
+
+    def __init__(self, timestamps, mains, obtido_em=None):
+        ordem = sorted(range(len(timestamps)), key=lambda i: timestamps[i])
+        self.timestamps = [int(timestamps[i]) for i in ordem]
+        self.mains = [mains[i] for i in ordem]
+        self.obtido_em = time.time() if obtido_em is None else obtido_em
+        self._vetores = None
+
+    @classmethod
+    def from_openweather(cls, data):
+        """
+        Monta a partir da resposta JSON do /forecast. Uma resposta fora do
+        formato esperado levanta ErroClima, como uma falha de rede.
+        """
+        try:
+            lista = data.get('list', [])
+            return cls([int(item['dt']) for item in lista], [item['weather'][0]['main'] for item in lista])
+        except (AttributeError, KeyError, IndexError, TypeError, ValueError) as e:
+            print(f"   -> Resposta de previsão inválida: {e!r}")
+            raise ErroClima('Erro API: resposta inválida') from e
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def slot_mais_proximo(self, timestamp):
+        """'main' do slot mais próximo do timestamp (busca binária), ou None se vazio."""
+        if not self.timestamps:
+            return None
+        i = bisect_left(self.timestamps, timestamp)
+        if i == len(self.timestamps):
+            return self.mains[-1]
+        if i > 0 and timestamp - self.timestamps[i - 1] <= self.timestamps[i] - timestamp:
+            return self.mains[i - 1]
+        return self.mains[i]
+
+    def slots_mais_proximos(self, timestamps):
+        """Versão vetorizada de slot_mais_proximo: vetor de 'main' (object) para um vetor de timestamps."""
+        if self._vetores is None:
+            self._vetores = (np.asarray(self.timestamps, dtype=np.int64), np.asarray(self.mains, dtype=object))
+        ts, mains = self._vetores
+        alvos = np.asarray(timestamps, dtype=np.int64)
+        if len(ts) == 0:
+            return np.full(len(alvos), None, dtype=object)
+        i = np.searchsorted(ts, alvos, side='left')
+        anterior = np.maximum(i - 1, 0)
+        seguinte = np.minimum(i, len(ts) - 1)
+        # Empate fica com o slot anterior, como na busca escalar
+        usa_anterior = (i > 0) & ((i == len(ts)) | (alvos - ts[anterior] <= ts[seguinte] - alvos))
+        return mains[np.where(usa_anterior, anterior, seguinte)]
+
+
+class ForecastCache:
+    """Previsões completas por chave (célula de previsão), válidas por `ttl` segundos."""
+
+    def __init__(self, ttl=CADENCIA_PREVISAO):
+        self.ttl = float(ttl)
+        self._itens = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+
+    def valida(self, slots):
+        return slots is not None and time.time() - slots.obtido_em <= self.ttl
+
+    def obter(self, chave):
+        """Previsão ainda válida para a chave, ou None."""
+        slots = self._itens.get(chave)
+        if slots is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        if not self.valida(slots):
+            with self._lock:
+                self.expirations += 1
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return slots
+
+    def espiar(self, chave):
+        """Previsão guardada (mesmo expirada), sem contar como consulta."""
+        return self._itens.get(chave)
+
+    def guardar(self, chave, slots):
+        with self._lock:
+            self._itens[chave] = slots
+
+    def __len__(self):
+        return len(self._itens)
+
+    def stats(self):
+        with self._lock:
+            consultas = self.hits + self.misses
+            return {
+                'entries': len(self._itens),
+                'ttl_s': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / consultas, 4) if consultas else 0.0,
+                'expirations': self.expirations
+            }
+
+
+class WeatherService:
+    """
+    Resolve a categoria de clima de um voo (aeroporto + data de partida).
+
+    `airports_db` (airport_table.AirportTable) dá a coordenada de cada
+    aeroporto. `provedor` (weather_providers.WeatherProvider) devolve a previsão completa
+    de uma coordenada ou levanta ErroClima. As regras do plano gratuito
+    continuam valendo: datas no passado ou além do horizonte não consultam
+    a API e usam 'Good'.
+
+    `celulas` (weather_cells.ForecastCells) diz qual previsão cada aeroporto
+    usa; sem ela, cada aeroporto tem a sua. `cache` troca o ForecastCache em
+    memória por outro com a mesma interface (ex.: forecast_store).
+    `historico` (weather_history.HistoricalWeatherStore) responde as datas
+    passadas com o clima observado, sem chamar a API.
+
+    Buscas simultâneas da mesma célula viram uma só chamada ao provedor;
+    quem chega depois espera até `espera_s` (padrão: o orçamento do
+    provedor) e recebe o mesmo resultado ou o mesmo erro.
+
+    Previsões vencidas há menos de `max_vencida_s` respondem na hora e são
+    atualizadas em segundo plano (stale-while-revalidate). Com o circuito
+    (`disjuntor`) aberto ou a busca falhando, qualquer previsão guardada
+    serve; sem nenhuma, o voo segue com 'Good'.
+    """
+
+    def __init__(self, airports_db, provedor, cache_ttl=CADENCIA_PREVISAO, horizonte_dias=5, espera_s=None,
+                 disjuntor=None, max_vencida_s=CADENCIA_PREVISAO, celulas=None, cache=None,
+                 historico=None, concorrencia_lote=4):
+        self.airports_db = airports_db
+        self.celulas = celulas if celulas is not None else ForecastCells(airports_db)
+        self.provedor = provedor
+        self.cache = cache if cache is not None else ForecastCache(cache_ttl)
+        self.voos = SingleFlight(provedor.orcamento if espera_s is None else espera_s)
+        self.disjuntor = disjuntor if disjuntor is not None else CircuitBreaker()
+        self.max_vencida = float(max_vencida_s)
+        self.vencidas_servidas = 0
+        self.revalidacoes = 0
+        self.horizonte = timedelta(days=horizonte_dias)
+        self.historico = historico
+        self.concorrencia_lote = max(1, int(concorrencia_lote))
+        self.chamadas_api = 0
+        # Demanda recente por aeroporto (usada pelo prefetch dos mais consultados)
+        self._demanda = Counter()
+        self._lock = threading.Lock()
+
+    def previsao(self, iata_code):
+        """Previsão completa do aeroporto (do cache ou da API) e se ela está vencida."""
+        chave = self.celulas.celula(iata_code)
+        slots = self.cache.obter(chave)
+        if slots is not None:
+            return slots, False
+
+        guardada = self.cache.espiar(chave)
+        if guardada is not None and (
+            self.disjuntor.estado == ABERTO
+            or time.time() - guardada.obtido_em <= self.cache.ttl + self.max_vencida
+        ):
+            self._revalidar(chave)
+            return self._servir_vencida(guardada)
+
+        try:
+            return self._em_voo(chave, lambda: self._buscar_se_vencida(chave)), False
+        except ErroClima:
+            if guardada is None:
+                raise
+            return self._servir_vencida(guardada)
+
+    def _servir_vencida(self, slots):
+        with self._lock:
+            self.vencidas_servidas += 1
+        return slots, True
+
+    def _revalidar(self, chave):
+        """Atualiza a previsão em segundo plano, se o circuito deixa e ninguém já está buscando."""
+        if self.disjuntor.estado == ABERTO or self.voos.em_andamento(chave):
+            return
+        with self._lock:
+            self.revalidacoes += 1
+        threading.Thread(target=self._revalidar_agora, args=(chave,), daemon=True).start()
+
+    def _revalidar_agora(self, chave):
+        try:
+            self._em_voo(chave, lambda: self._buscar(chave))
+        except ErroClima:
+            pass
+
+    def atualizar(self, iata_code):
+        """Busca a previsão no provedor e guarda no cache, mesmo que a atual ainda valha."""
+        chave = self.celulas.celula(iata_code)
+        return self._em_voo(chave, lambda: self._buscar(chave))
+
+    def _em_voo(self, chave, funcao):
+        try:
+            return self.voos.executar(chave, funcao)
+        except TimeoutError as e:
+            raise ErroClima('Erro Conexão') from e
+
+    def _buscar_se_vencida(self, chave):
+        # Outra busca pode ter terminado entre o miss e a entrada no voo
+        slots = self.cache.espiar(chave)
+        return slots if self.cache.valida(slots) else self._buscar(chave)
+
+    def _buscar(self, chave):
+        permissao = self.disjuntor.permitir()
+        if permissao is None:
+            raise CircuitoAberto('Circuito aberto')
+        lat, lon = self.celulas.coordenadas(chave)
+        print(f"Consultando Previsão: {chave}...")
+        with self._lock:
+            self.chamadas_api += 1
+        inicio = time.perf_counter()
+        try:
+            slots = self.provedor.buscar(lat, lon)
+        except Exception:
+            self.disjuntor.registrar(permissao, False, time.perf_counter() - inicio)
+            raise
+        self.disjuntor.registrar(permissao, True, time.perf_counter() - inicio)
+        self.cache.guardar(chave, slots)
+        return slots
+
+    def idade(self, iata_code):
+        """Segundos desde que a previsão em cache foi obtida (None se não há)."""
+        slots = self.cache.espiar(self.celulas.celula(iata_code))
+        return None if slots is None else time.time() - slots.obtido_em
+
+    def registrar_demanda(self, iata_code, vezes=1):
+        with self._lock:
+            self._demanda[iata_code] += vezes
+
+    def mais_consultados(self, n, decair=True):
+        """
+        Os `n` aeroportos mais consultados desde a última chamada. Com
+        `decair`, as contagens caem pela metade a cada chamada, então o
+        ranking acompanha o tráfego recente.
+        """
+        with self._lock:
+            ranking = [iata for iata, _ in self._demanda.most_common(n)]
+            if decair:
+                self._demanda = Counter({k: v // 2 for k, v in self._demanda.items() if v > 1})
+        return ranking
+
+    def consultar(self, iata_code, data_iso):
+        """
+        Adaptação para Plano Gratuito:
+        - Passado: clima observado no histórico local, se houver; senão 'Good' (API bloqueada).
+        - Futuro (>5 dias): Retorna 'Good' (Limite da API).
+        - Futuro (<=5 dias): Consulta API Forecast (com cache por célula).
+
+        Devolve (categoria, main, detalhes); `detalhes` diz se a previsão
+        usada estava vencida e o estado do circuito do provedor.
+        """
+        if iata_code not in self.airports_db:
+            return 'Good', 'Aeroporto desconhecido', self._detalhes()
+
+        try:
+            data_partida = target_date = converter_data(data_iso)
+            target_timestamp = timestamp_alvo(target_date)
+            if target_date.tzinfo is not None:
+                # Compara no horário local, como o datetime.now() abaixo
+                target_date = target_date.astimezone().replace(tzinfo=None)
+            now = datetime.now()
+        except Exception:
+            return 'Good', 'Erro na data', self._detalhes()
+
+        if target_date < now:
+            if self.historico is not None:
+                # O histórico usa o relógio da própria data (o do VRA), sem converter o fuso
+                categoria = self.historico.categoria_em(iata_code, data_partida)
+                if categoria is not None:
+                    return categoria, 'Histórico NOAA', self._detalhes()
+            # PLANO FREE NÃO TEM HISTÓRICO.
+            # Não chamamos a API para evitar erro 401.
+            print(f"Data no passado ({target_date}). Plano gratuito não permite histórico. Usando padrão.")
+            return 'Good', 'Sem Histórico (Plano Gratuito)', self._detalhes()
+
+        if target_date > now + self.horizonte:
+            print(f"Data muito distante ({target_date}). Limite é 5 dias.")
+            return 'Good', 'Data excede limite 5 dias', self._detalhes()
+
+        # PREVISÃO (Disponível no Free)
+        self.registrar_demanda(iata_code)
+        try:
+            slots, vencida = self.previsao(iata_code)
+        except ErroClima as e:
+            return 'Good', str(e), self._detalhes()
+
+        weather_main = slots.slot_mais_proximo(target_timestamp)
+        if weather_main:
+            return classificar_clima(weather_main), weather_main, self._detalhes(vencida)
+
+        return 'Good', 'Sem dados correspondentes', self._detalhes(vencida)
+
+    def consultar_lote(self, iata_codes, datas):
+        """
+        consultar() para um lote inteiro. `datas` são as datas já convertidas
+        (ex.: a pd.Series do /predict/batch; NaT = data inválida).
+
+        Cada aeroporto com voos na janela de previsão é resolvido uma vez (os
+        que estão fora do cache são buscados em paralelo, até
+        `concorrencia_lote` por vez). O slot de cada voo sai de um
+        searchsorted e as categorias são mapeadas por 'main' distinto.
+
+        Devolve três vetores alinhados com a entrada: categorias, mains e se
+        a previsão usada estava vencida.
+        """
+        n = len(iata_codes)
+        codigos = np.asarray(iata_codes, dtype=object)
+        categorias = np.full(n, 'Good', dtype=object)
+        mains = np.full(n, 'Sem dados correspondentes', dtype=object)
+        vencidas = np.zeros(n, dtype=bool)
+        if n == 0:
+            return categorias, mains, vencidas
+
+        alvo, local, proprio, validas = self._relogios(datas)
+        conhecidos = self.airports_db.indices(codigos.astype(str)) >= 0
+        mains[~conhecidos] = 'Aeroporto desconhecido'
+        mains[conhecidos & ~validas] = 'Erro na data'
+
+        agora = datetime.now()
+        agora_us = calendar.timegm(agora.timetuple()) * 1_000_000 + agora.microsecond
+        limite_us = agora_us + int(self.horizonte.total_seconds() * 1_000_000)
+        ok = conhecidos & validas
+        passado = ok & (local < agora_us)
+        distante = ok & ~passado & (local > limite_us)
+        futuro = ok & ~passado & ~distante
+
+        if passado.any():
+            self._historico_lote(codigos, proprio, passado, categorias, mains)
+        mains[distante] = 'Data excede limite 5 dias'
+
+        if futuro.any():
+            linhas_por_aeroporto = {}
+            for linha, iata in zip(np.flatnonzero(futuro).tolist(), codigos[futuro].tolist()):
+                linhas_por_aeroporto.setdefault(iata, []).append(linha)
+            for iata, linhas in linhas_por_aeroporto.items():
+                self.registrar_demanda(iata, len(linhas))
+
+            for iata, (slots, vencida, erro) in self._previsoes(list(linhas_por_aeroporto)).items():
+                linhas = np.asarray(linhas_por_aeroporto[iata])
+                if erro is not None:
+                    mains[linhas] = erro
+                    continue
+                mains[linhas] = slots.slots_mais_proximos(alvo[linhas])
+                vencidas[linhas] = vencida
+
+            # 'main' vazio (ou sem slots) fica como no consultar(): 'Good' sem dados correspondentes
+            encontrados = futuro & np.array([bool(m) for m in mains])
+            mains[futuro & ~encontrados] = 'Sem dados correspondentes'
+            distintos = {m: classificar_clima(m) for m in set(mains[encontrados].tolist())}
+            categorias[encontrados] = [distintos[m] for m in mains[encontrados].tolist()]
+
+        return categorias, mains, vencidas
+
+    def _relogios(self, datas):
+        """
+        Para cada data: timestamp do slot (s, como timestamp_alvo), relógio
+        local (µs, para comparar com agora), relógio da própria data (s, para
+        o histórico) e se é válida.
+        """
+        valores = np.asarray(datas)
+        if valores.dtype.kind == 'M':
+            # Datas sem fuso (o caso comum): os três relógios coincidem
+            micros = valores.astype('datetime64[us]')
+            validas = ~np.isnat(micros)
+            local = np.where(validas, micros.astype(np.int64), 0)
+            segundos = local // 1_000_000
+            return segundos, local, segundos, validas
+
+        n = len(valores)
+        alvo = np.zeros(n, dtype=np.int64)
+        local = np.zeros(n, dtype=np.int64)
+        proprio = np.zeros(n, dtype=np.int64)
+        validas = np.zeros(n, dtype=bool)
+        for i, data in enumerate(valores.tolist()):
+            if data is None or data != data or not hasattr(data, 'timetuple'):
+                continue
+            if hasattr(data, 'to_pydatetime'):
+                data = data.to_pydatetime()
+            validas[i] = True
+            alvo[i] = timestamp_alvo(data)
+            proprio[i] = calendar.timegm(data.timetuple())
+            relogio = data.astimezone().replace(tzinfo=None) if data.tzinfo is not None else data
+            local[i] = calendar.timegm(relogio.timetuple()) * 1_000_000 + relogio.microsecond
+        return alvo, local, proprio, validas
+
+    def _historico_lote(self, codigos, proprio, passado, categorias, mains):
+        mains[passado] = 'Sem Histórico (Plano Gratuito)'
+        sem_historico = int(passado.sum())
+        if self.historico is not None:
+            from weather_history import SEM_DADO
+            linhas = np.flatnonzero(passado)
+            observadas = self.historico.categorias(codigos[linhas].astype(str), proprio[linhas] // 3600)
+            achadas = observadas != SEM_DADO
+            categorias[linhas[achadas]] = np.asarray(CATEGORIAS_CLIMA, dtype=object)[observadas[achadas]]
+            mains[linhas[achadas]] = 'Histórico NOAA'
+            sem_historico -= int(achadas.sum())
+        if sem_historico:
+            print(f"{sem_historico} datas no passado sem histórico. Plano gratuito não permite histórico. Usando padrão.")
+
+    def _previsoes(self, iata_codes):
+        """(slots, vencida, erro) por aeroporto; os que estão fora do cache são buscados em paralelo."""
+        frios = [i for i in iata_codes if not self.cache.valida(self.cache.espiar(self.celulas.celula(i)))]
+        resultados = {}
+        if len(frios) > 1 and self.concorrencia_lote > 1:
+            with ThreadPoolExecutor(max_workers=min(self.concorrencia_lote, len(frios))) as executor:
+                resultados.update(zip(frios, executor.map(self._previsao_ou_erro, frios)))
+        for iata in iata_codes:
+            if iata not in resultados:
+                resultados[iata] = self._previsao_ou_erro(iata)
+        return resultados
+
+    def _previsao_ou_erro(self, iata_code):
+        try:
+            slots, vencida = self.previsao(iata_code)
+            return slots, vencida, None
+        except ErroClima as e:
+            return None, False, str(e)
+
+    def _detalhes(self, vencida=False):
+        return {'stale': vencida, 'breaker_state': self.disjuntor.estado}
+
+    def stats(self):
+        return {
+            'upstream_calls': self.chamadas_api,
+            'forecast_cache': self.cache.stats(),
+            'cells': self.celulas.stats(),
+            'airport_table': self.airports_db.stats(),
+            'single_flight': self.voos.stats(),
+            'breaker': self.disjuntor.stats(),
+            'stale_served': self.vencidas_servidas,
+            'background_revalidations': self.revalidacoes,
+            'history': self.historico.stats() if self.historico is not None else {'enabled': False},
+            'provider': self.provedor.stats()
+        }
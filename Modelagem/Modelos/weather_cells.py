@@ -0,0 +1,117 @@
+"""
+Células de previsão: aeroportos próximos compartilham a mesma previsão.
+
+A previsão da OpenWeather é de uma grade bem mais grossa que a distância
+entre aeroportos de uma mesma região (GRU/CGH/VCP, GIG/SDU). Em vez de buscar
+cada aeroporto pela sua coordenada, cada um é mapeado para uma célula, e a
+previsão é buscada e guardada uma vez por célula.
+
+Modos:
+- 'airport' (padrão): uma célula por aeroporto, como antes.
+- 'grid': grade regular de `resolucao_graus`; a previsão é do centro da
+  célula.
+- 'radius': aeroportos a até `raio_km` de um aeroporto-centro entram na
+  célula dele; a previsão é da coordenada do centro. Os centros são
+  escolhidos em ordem de código IATA, então todos os workers chegam às
+  mesmas células.
+"""
+import math
+from collections import Counter, defaultdict
+
+import numpy as np
+
+RAIO_TERRA_KM = 6371.0
+KM_POR_GRAU = 111.195
+
+
+def distancia_km(lat1, lon1, lat2, lon2):
+    """Distância de círculo máximo (haversine) entre duas coordenadas."""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * RAIO_TERRA_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class ForecastCells:
+    """
+    Mapeia cada aeroporto para a chave da célula de previsão que ele usa.
+    `airports_db` é a airport_table.AirportTable do serviço.
+    """
+
+    def __init__(self, airports_db, resolucao_graus=0.0, raio_km=0.0):
+        self.airports_db = airports_db
+        self.resolucao = float(resolucao_graus)
+        self.raio = float(raio_km)
+        self._mapa = {}
+        self._coordenadas = {}
+
+        if self.raio > 0:
+            self.modo = 'radius'
+            self._agrupar_por_raio()
+        elif self.resolucao > 0:
+            self.modo = 'grid'
+            self._agrupar_por_grade()
+        else:
+            self.modo = 'airport'
+        self._tamanhos = Counter(self._mapa.values())
+
+    def _agrupar_por_grade(self):
+        coordenadas = self.airports_db.coordenadas_array.astype(np.float64)
+        centros = (np.floor(coordenadas / self.resolucao) + 0.5) * self.resolucao
+        for iata, (lat, lon) in zip(self.airports_db, centros.tolist()):
+            chave = f"{lat:.4f},{lon:.4f}"
+            self._mapa[iata] = chave
+            self._coordenadas[chave] = (lat, lon)
+
+    def _agrupar_por_raio(self):
+        # Baldes de `raio` de lado: só os centros dos baldes vizinhos podem estar no raio
+        passo = self.raio / KM_POR_GRAU
+        baldes = defaultdict(list)
+        # A tabela já vem ordenada por código IATA
+        coordenadas = self.airports_db.coordenadas_array.astype(np.float64).tolist()
+        for iata, (lat, lon) in zip(self.airports_db, coordenadas):
+            i, j = int(math.floor(lat / passo)), int(math.floor(lon / passo))
+            # Perto dos polos um grau de longitude encolhe: olha mais baldes a leste e oeste
+            alcance = int(math.ceil(1 / max(math.cos(math.radians(lat)), 0.01)))
+
+            melhor, menor = None, self.raio
+            for di in (-1, 0, 1):
+                for dj in range(-alcance, alcance + 1):
+                    for centro in baldes.get((i + di, j + dj), ()):
+                        clat, clon = self._coordenadas[centro]
+                        d = distancia_km(lat, lon, clat, clon)
+                        if d <= menor:
+                            melhor, menor = centro, d
+
+            if melhor is None:
+                melhor = iata
+                self._coordenadas[iata] = (lat, lon)
+                baldes[(i, j)].append(iata)
+            self._mapa[iata] = melhor
+
+    def celula(self, iata_code):
+        """Chave da célula do aeroporto (o próprio código no modo 'airport')."""
+        return self._mapa.get(iata_code, iata_code)
+
+    def coordenadas(self, chave):
+        """Coordenada (lat, lon) usada para buscar a previsão da célula."""
+        coordenadas = self._coordenadas.get(chave)
+        if coordenadas is None:
+            return self.airports_db.coordenadas(chave)
+        return coordenadas
+
+    def stats(self):
+        if self.modo == 'airport':
+            # Sem agrupamento não há o que contar (e a tabela de aeroportos segue sem carregar)
+            return {'mode': self.modo}
+        tamanhos = self._tamanhos
+        return {
+            'mode': self.modo,
+            'resolution_deg': self.resolucao if self.modo == 'grid' else None,
+            'radius_km': self.raio if self.modo == 'radius' else None,
+            'airports': len(self._mapa),
+            'cells': len(tamanhos),
+            'shared_cells': sum(1 for n in tamanhos.values() if n > 1),
+            'largest_cells': [{'cell': chave, 'airports': n} for chave, n in tamanhos.most_common(5)]
+        }
@@ -0,0 +1,217 @@
+"""
+Histórico de clima local para previsões de datas passadas.
+
+O plano gratuito da OpenWeather não tem histórico, então datas no passado
+usavam 'Good', e backtests e replays rodavam com o clima errado. O
+Pipeline_Climática_VRA.ipynb já cruza cada voo do VRA com a observação
+horária da NOAA (e o resgate pela Open-Meteo), gravando
+dados_anac_coord_clima.csv com `sg_iata_origem`, `dt_partida_prevista`,
+`st_clima_viagem`, `chuva_mm`, `vento_kmh` e `teto_m`.
+
+Este módulo compila esse CSV em um diretório colunar (um .npy por coluna +
+meta.json, como o tree_engine), aberto com mmap:
+
+- aeroportos.npy: códigos IATA ordenados;
+- inicio.npy / offsets.npy: primeira hora (horas desde 1970) e início do
+  bloco de cada aeroporto;
+- categoria.npy (uint8, índice em CATEGORIAS_CLIMA; 255 = sem dado),
+  chuva_mm.npy, vento_kmh.npy, teto_m.npy (float32): uma linha por hora.
+
+Cada aeroporto ocupa um bloco contínuo de horas, então a consulta de
+(aeroporto, hora) é aritmética de índice, O(1), e lotes inteiros são
+resolvidos de forma vetorizada. As horas são as do relógio do VRA (sem
+fuso), do mesmo jeito que a data chega no /predict.
+
+Uso:
+    python weather_history.py dados_anac_coord_clima.csv historico_clima/
+"""
+import argparse
+import calendar
+import json
+import os
+import time
+
+import numpy as np
+
+from weather import CATEGORIAS_CLIMA
+
+SEM_DADO = 255
+COLUNAS_FISICAS = ['chuva_mm', 'vento_kmh', 'teto_m']
+# O pipeline tem 'critical' (NOAA) e 'Critical' (Open-Meteo); o modelo usa CATEGORIAS_CLIMA
+_CODIGO_CATEGORIA = {nome.lower(): i for i, nome in enumerate(CATEGORIAS_CLIMA)}
+
+
+def horas_epoch(datas):
+    """datetime64 (ou Series de datas sem fuso) -> horas inteiras desde 1970."""
+    return np.asarray(datas, dtype='datetime64[h]').astype(np.int64)
+
+
+def compilar_historico(caminho_csv, diretorio, tolerancia_horas=1):
+    """
+    Lê a saída do pipeline climático e grava o histórico colunar em
+    `diretorio`. Vários voos na mesma hora e aeroporto ficam com a
+    categoria mais severa.
+    """
+    import pandas as pd
+
+    colunas = ['sg_iata_origem', 'dt_partida_prevista', 'st_clima_viagem'] + COLUNAS_FISICAS
+    df = pd.read_csv(caminho_csv, usecols=lambda c: c in colunas, low_memory=False)
+    for coluna in COLUNAS_FISICAS:
+        if coluna not in df.columns:
+            df[coluna] = np.nan
+
+    df['categoria'] = df['st_clima_viagem'].astype(str).str.lower().map(_CODIGO_CATEGORIA)
+    df['hora'] = horas_epoch(pd.to_datetime(df['dt_partida_prevista'], errors='coerce'))
+    df = df.dropna(subset=['sg_iata_origem', 'categoria'])
+    df = df[df['hora'] > np.iinfo(np.int64).min]
+
+    por_hora = (
+        df.groupby(['sg_iata_origem', 'hora'], sort=True)
+        .agg(categoria=('categoria', 'max'), **{c: (c, 'mean') for c in COLUNAS_FISICAS})
+        .reset_index()
+    )
+
+    aeroportos = np.array(sorted(por_hora['sg_iata_origem'].unique()))
+    limites = por_hora.groupby('sg_iata_origem')['hora'].agg(['min', 'max']).loc[aeroportos]
+    inicio = limites['min'].to_numpy(np.int64)
+    tamanhos = (limites['max'] - limites['min'] + 1).to_numpy(np.int64)
+    offsets = np.concatenate([[0], np.cumsum(tamanhos)]).astype(np.int64)
+
+    indice = np.searchsorted(aeroportos, por_hora['sg_iata_origem'].to_numpy())
+    linhas = offsets[indice] + (por_hora['hora'].to_numpy(np.int64) - inicio[indice])
+
+    total = int(offsets[-1])
+    arrays = {
+        'aeroportos': aeroportos,
+        'inicio': inicio,
+        'offsets': offsets,
+        'categoria': np.full(total, SEM_DADO, dtype=np.uint8),
+    }
+    arrays['categoria'][linhas] = por_hora['categoria'].to_numpy(np.uint8)
+    for coluna in COLUNAS_FISICAS:
+        arrays[coluna] = np.full(total, np.nan, dtype=np.float32)
+        arrays[coluna][linhas] = por_hora[coluna].to_numpy(np.float32)
+
+    meta = {
+        'source': os.path.basename(caminho_csv),
+        'categories': CATEGORIAS_CLIMA,
+        'airports': len(aeroportos),
+        'hours_with_data': int(len(por_hora)),
+        'first_hour': str(np.datetime64(int(inicio.min()), 'h')),
+        'last_hour': str(np.datetime64(int((inicio + tamanhos - 1).max()), 'h')),
+        'tolerance_hours': int(tolerancia_horas),
+        'built_at': time.strftime('%Y-%m-%dT%H:%M:%S')
+    }
+    os.makedirs(diretorio, exist_ok=True)
+    for nome, array in arrays.items():
+        np.save(os.path.join(diretorio, f'{nome}.npy'), np.ascontiguousarray(array))
+    with open(os.path.join(diretorio, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+    return meta
+
+
+class HistoricalWeatherStore:
+    """
+    Histórico compilado por compilar_historico(), aberto com mmap. Sem
+    observação na hora exata, usa a mais próxima dentro de
+    `tolerance_hours` (a mesma tolerância do merge_asof do pipeline).
+    """
+
+    ARRAYS = ['aeroportos', 'inicio', 'offsets', 'categoria'] + COLUNAS_FISICAS
+
+    def __init__(self, diretorio, mmap=True):
+        self.diretorio = diretorio
+        with open(os.path.join(diretorio, 'meta.json'), encoding='utf-8') as f:
+            self.meta = json.load(f)
+        modo = 'r' if mmap else None
+        self.arrays = {
+            nome: np.load(os.path.join(diretorio, f'{nome}.npy'), mmap_mode=modo)
+            for nome in self.ARRAYS
+        }
+        self.aeroportos = self.arrays['aeroportos']
+        self.inicio = self.arrays['inicio']
+        self.offsets = self.arrays['offsets']
+        self.categoria = self.arrays['categoria']
+        self.tolerancia = int(self.meta.get('tolerance_hours', 1))
+        self._indice = {str(codigo): i for i, codigo in enumerate(self.aeroportos)}
+        self.consultas = 0
+        self.encontradas = 0
+
+    def __contains__(self, iata_code):
+        return iata_code in self._indice
+
+    def _linha(self, i, hora):
+        deslocamento = hora - int(self.inicio[i])
+        tamanho = int(self.offsets[i + 1] - self.offsets[i])
+        base = int(self.offsets[i])
+        for delta in range(self.tolerancia + 1):
+            for d in ((0,) if delta == 0 else (-delta, delta)):
+                if 0 <= deslocamento + d < tamanho and self.categoria[base + deslocamento + d] != SEM_DADO:
+                    return base + deslocamento + d
+        return None
+
+    def observacao(self, iata_code, hora):
+        """Linha do histórico (aeroporto, hora desde 1970) ou None."""
+        self.consultas += 1
+        i = self._indice.get(iata_code)
+        if i is None:
+            return None
+        linha = self._linha(i, int(hora))
+        if linha is not None:
+            self.encontradas += 1
+        return linha
+
+    def categoria_em(self, iata_code, dt_obj):
+        """Categoria do modelo observada no aeroporto na hora da data, ou None."""
+        hora = calendar.timegm(dt_obj.timetuple()) // 3600
+        linha = self.observacao(iata_code, hora)
+        return None if linha is None else CATEGORIAS_CLIMA[self.categoria[linha]]
+
+    def categorias(self, codigos, horas):
+        """
+        Versão vetorizada: índices em CATEGORIAS_CLIMA para cada par
+        (código, hora desde 1970); SEM_DADO onde não há observação.
+        """
+        horas = np.asarray(horas, dtype=np.int64)
+        indices = np.array([self._indice.get(c, -1) for c in codigos], dtype=np.int64)
+        resultado = np.full(len(horas), SEM_DADO, dtype=np.uint8)
+        conhecidos = indices >= 0
+        if not conhecidos.any():
+            return resultado
+
+        i = indices[conhecidos]
+        base = self.offsets[i]
+        tamanho = self.offsets[i + 1] - base
+        deslocamento = horas[conhecidos] - self.inicio[i]
+        achado = np.full(len(i), SEM_DADO, dtype=np.uint8)
+        for d in [0] + [s * k for k in range(1, self.tolerancia + 1) for s in (-1, 1)]:
+            pos = deslocamento + d
+            dentro = (achado == SEM_DADO) & (pos >= 0) & (pos < tamanho)
+            achado[dentro] = self.categoria[base[dentro] + pos[dentro]]
+        resultado[conhecidos] = achado
+        self.consultas += len(horas)
+        self.encontradas += int((resultado != SEM_DADO).sum())
+        return resultado
+
+    def stats(self):
+        return {
+            'path': self.diretorio,
+            'airports': int(len(self.aeroportos)),
+            'hours_with_data': self.meta.get('hours_with_data'),
+            'first_hour': self.meta.get('first_hour'),
+            'last_hour': self.meta.get('last_hour'),
+            'lookups': self.consultas,
+            'found': self.encontradas
+        }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compila o histórico de clima do pipeline NOAA/VRA")
+    parser.add_argument('csv', help="Saída do Pipeline_Climática_VRA.ipynb (dados_anac_coord_clima.csv)")
+    parser.add_argument('diretorio', help="Diretório de saída (formato mmap)")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    meta = compilar_historico(args.csv, args.diretorio)
+    print(f"Compilado em {time.perf_counter() - inicio:.1f}s: {meta['airports']} aeroportos, "
+          f"{meta['hours_with_data']} horas com dado ({meta['first_hour']} a {meta['last_hour']})")
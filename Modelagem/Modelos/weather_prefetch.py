@@ -0,0 +1,175 @@
+"""
+Prefetch de previsões do tempo em segundo plano.
+
+Mantém a previsão dos aeroportos mais movimentados sempre válida no cache:
+a cada ciclo, os aeroportos-alvo (lista fixa + os N mais consultados no
+tráfego recente) cuja previsão falta ou vence dentro da antecedência
+configurada são atualizados antes de expirar. Assim a requisição nunca
+espera pela API para as origens populares.
+
+As atualizações rodam com concorrência limitada e respeitando um limite de
+chamadas por segundo ao provedor. Cada worker do gunicorn tem o seu
+prefetch, então o limite do nó é dividido igualmente entre os workers.
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from weather import ErroClima
+
+
+class LimitadorTaxa:
+    """Token bucket: no máximo `taxa` chamadas por segundo, com rajada de `rajada`."""
+
+    def __init__(self, taxa, rajada=1):
+        self.taxa = float(taxa)
+        self.rajada = max(1.0, float(rajada))
+        self._fichas = self.rajada
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def aguardar(self):
+        if self.taxa <= 0:
+            return
+        while True:
+            with self._lock:
+                agora = time.monotonic()
+                self._fichas = min(self.rajada, self._fichas + (agora - self._ultimo) * self.taxa)
+                self._ultimo = agora
+                if self._fichas >= 1:
+                    self._fichas -= 1
+                    return
+                espera = (1 - self._fichas) / self.taxa
+            time.sleep(espera)
+
+
+class ForecastPrefetcher:
+    """
+    Atualiza em segundo plano as previsões dos aeroportos-alvo antes de vencerem.
+
+    `taxa_por_segundo` é o limite do nó inteiro; com `workers` processos cada
+    um fica com `taxa_por_segundo / workers` (e a rajada dividida do mesmo jeito).
+    """
+
+    def __init__(self, servico, aeroportos=(), top_n=0, intervalo=60, antecedencia=900,
+                 concorrencia=4, taxa_por_segundo=1.0, workers=1):
+        self.servico = servico
+        self.aeroportos = [a for a in aeroportos if a in servico.airports_db]
+        self.top_n = int(top_n)
+        self.intervalo = float(intervalo)
+        self.antecedencia = float(antecedencia)
+        self.concorrencia = max(1, int(concorrencia))
+        self.workers = max(1, int(workers))
+        self.taxa_no = float(taxa_por_segundo)
+        self.limitador = LimitadorTaxa(self.taxa_no / self.workers,
+                                       rajada=self.concorrencia / self.workers)
+
+        self._lock = threading.Lock()
+        self._atrasos = deque(maxlen=1024)
+        self.ciclos = 0
+        self.atualizadas = 0
+        self.falhas = 0
+        self.ultimo_ciclo = None
+        self.alvos = []
+
+    @property
+    def ativo(self):
+        return bool(self.aeroportos) or self.top_n > 0
+
+    def iniciar(self):
+        """Sobe a thread do prefetch (depois do fork, uma por worker)."""
+        threading.Thread(target=self._laco, name='weather-prefetch', daemon=True).start()
+
+    def _laco(self):
+        while True:
+            try:
+                self.ciclo()
+            except Exception as e:
+                print(f"⚠️ Falha no ciclo de prefetch de clima: {e}")
+            time.sleep(self.intervalo)
+
+    def _vence_em(self, iata):
+        """Segundos até a previsão em cache vencer (negativo = vencida; None = sem cache)."""
+        idade = self.servico.idade(iata)
+        return None if idade is None else self.servico.cache.ttl - idade
+
+    def ciclo(self):
+        """Um ciclo: escolhe os alvos e atualiza os que vencem dentro da antecedência."""
+        inicio = time.perf_counter()
+        alvos = list(dict.fromkeys(self.aeroportos + self.servico.mais_consultados(self.top_n)))
+        pendentes = []
+        celulas = set()
+        for iata in alvos:
+            # Aeroportos da mesma célula compartilham a previsão: uma atualização basta
+            celula = self.servico.celulas.celula(iata)
+            if celula in celulas:
+                continue
+            celulas.add(celula)
+            vence_em = self._vence_em(iata)
+            if vence_em is None or vence_em <= self.antecedencia:
+                pendentes.append((iata, vence_em))
+
+        if pendentes:
+            with ThreadPoolExecutor(max_workers=self.concorrencia) as executor:
+                list(executor.map(lambda p: self._atualizar(*p), pendentes))
+
+        with self._lock:
+            self.ciclos += 1
+            self.alvos = alvos
+            self.ultimo_ciclo = {
+                'at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'targets': len(alvos),
+                'refreshed': len(pendentes),
+                'duration_ms': round((time.perf_counter() - inicio) * 1000, 2)
+            }
+
+    def _atualizar(self, iata, vence_em):
+        self.limitador.aguardar()
+        # Atraso desde que a previsão entrou na janela de antecedência; acima
+        # da própria antecedência, ela chegou a vencer antes de ser renovada
+        atraso = None if vence_em is None else self.antecedencia - vence_em
+        try:
+            self.servico.atualizar(iata)
+            with self._lock:
+                self.atualizadas += 1
+                if atraso is not None:
+                    self._atrasos.append(atraso)
+        except ErroClima:
+            with self._lock:
+                self.falhas += 1
+
+    def stats(self):
+        idades = [self.servico.idade(iata) for iata in self.alvos]
+        conhecidas = [i for i in idades if i is not None]
+        ttl = self.servico.cache.ttl
+        with self._lock:
+            atrasos = np.array(self._atrasos) if self._atrasos else np.zeros(1)
+            return {
+                'enabled': True,
+                'static_airports': len(self.aeroportos),
+                'top_n': self.top_n,
+                'interval_s': self.intervalo,
+                'lead_s': self.antecedencia,
+                'concurrency': self.concorrencia,
+                'rate_limit_per_s': self.taxa_no,
+                'workers': self.workers,
+                'worker_rate_limit_per_s': self.limitador.taxa,
+                'cycles': self.ciclos,
+                'refreshed': self.atualizadas,
+                'failures': self.falhas,
+                'last_cycle': self.ultimo_ciclo,
+                'lag_s': {
+                    'p50': round(float(np.percentile(atrasos, 50)), 1),
+                    'max': round(float(atrasos.max()), 1)
+                },
+                'staleness': {
+                    'targets': len(self.alvos),
+                    'missing': len(idades) - len(conhecidas),
+                    'expired': sum(1 for i in conhecidas if i > ttl),
+                    'max_age_s': round(max(conhecidas), 1) if conhecidas else None,
+                    'avg_age_s': round(sum(conhecidas) / len(conhecidas), 1) if conhecidas else None
+                }
+            }
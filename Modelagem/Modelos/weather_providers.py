@@ -0,0 +1,255 @@
+"""
+Provedores de previsão do tempo.
+
+Todo provedor implementa `buscar(lat, lon)` e devolve a previsão completa
+(weather.ForecastSlots) ou levanta weather.ErroClima. Cada chamada tem um
+orçamento de latência (`orcamento_ms`); estourar o orçamento é tratado como
+falha do provedor.
+
+- OpenWeatherProvider: /forecast da OpenWeather com uma requests.Session
+  compartilhada (pool de conexões keep-alive), sem pagar DNS + TCP + TLS a
+  cada previsão. O orçamento vale para a chamada inteira (conexão + corpo),
+  não por leitura de socket. Opcionalmente grava as respostas em disco para
+  replay.
+- RecordedWeatherProvider: serve previsões gravadas (um JSON por
+  coordenada) ou, na falta delas, uma previsão sintética determinística,
+  com latência configurável. Permite testes de desempenho sem rede.
+"""
+import contextlib
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+from weather import CADENCIA_PREVISAO, ErroClima, ForecastSlots
+
+# Mesmo horizonte do plano gratuito: 5 dias em passos de 3 horas
+SLOTS_PREVISAO = 40
+# Condições usadas na previsão sintética, da mais à menos frequente
+CONDICOES_SINTETICAS = ['Clear', 'Clouds', 'Rain', 'Drizzle', 'Mist', 'Thunderstorm', 'Fog', 'Snow']
+PESOS_SINTETICOS = [0.35, 0.3, 0.15, 0.07, 0.05, 0.04, 0.03, 0.01]
+# Bytes por leitura do corpo da resposta; o prazo é conferido a cada bloco
+BLOCO_LEITURA = 1024
+
+
+def nome_arquivo(lat, lon):
+    """Arquivo de uma coordenada no diretório de gravações."""
+    return f"{float(lat):.2f}_{float(lon):.2f}.json"
+
+
+class WeatherProvider(ABC):
+    """Interface dos provedores, com a contabilidade de latência em comum."""
+
+    nome = 'base'
+    # Valor de weather_context.source nas respostas
+    fonte = ''
+
+    def __init__(self, orcamento_ms=5000):
+        self.orcamento = float(orcamento_ms) / 1000.0
+        self._lock = threading.Lock()
+        self._latencias = deque(maxlen=1024)
+        self.chamadas = 0
+        self.erros = 0
+        self.estouros = 0
+
+    @abstractmethod
+    def _buscar(self, lat, lon):
+        """Implementação do provedor: ForecastSlots ou ErroClima."""
+
+    def buscar(self, lat, lon):
+        inicio = time.perf_counter()
+        try:
+            return self._buscar(lat, lon)
+        except ErroClima:
+            with self._lock:
+                self.erros += 1
+            raise
+        finally:
+            duracao = time.perf_counter() - inicio
+            with self._lock:
+                self.chamadas += 1
+                self._latencias.append(duracao)
+                if duracao > self.orcamento:
+                    self.estouros += 1
+
+    def stats(self):
+        with self._lock:
+            latencias = np.array(self._latencias) * 1000 if self._latencias else np.zeros(1)
+            return {
+                'provider': self.nome,
+                'latency_budget_ms': self.orcamento * 1000,
+                'calls': self.chamadas,
+                'errors': self.erros,
+                'budget_exceeded': self.estouros,
+                'latency_ms': {
+                    'p50': round(float(np.percentile(latencias, 50)), 3),
+                    'p99': round(float(np.percentile(latencias, 99)), 3),
+                    'max': round(float(latencias.max()), 3)
+                }
+            }
+
+
+class OpenWeatherProvider(WeatherProvider):
+    """OpenWeather /forecast sobre um pool de conexões keep-alive."""
+
+    nome = 'openweather'
+    fonte = 'OpenWeatherMap (Main Field)'
+    URL = "https://api.openweathermap.org/data/2.5/forecast"
+
+    def __init__(self, api_key, orcamento_ms=5000, conexoes=10, diretorio_gravacao=None):
+        super().__init__(orcamento_ms)
+        self.api_key = api_key
+        self.diretorio_gravacao = diretorio_gravacao
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=conexoes)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self._executor = ThreadPoolExecutor(max_workers=conexoes, thread_name_prefix='openweather')
+
+    def _buscar(self, lat, lon):
+        # O timeout do requests vale por operação de socket: uma resposta que
+        # chega a conta-gotas nunca o estoura. A chamada roda no pool e a
+        # espera aqui é limitada ao orçamento inteiro.
+        limite = time.monotonic() + self.orcamento
+        futuro = self._executor.submit(self._requisitar, lat, lon, limite)
+        try:
+            status, data = futuro.result(timeout=max(0.0, limite - time.monotonic()))
+        except FuturesTimeout as e:
+            futuro.cancel()
+            print(f"   -> Timeout ({self.orcamento * 1000:.0f} ms)")
+            raise ErroClima('Erro Conexão') from e
+
+        if status != 200:
+            msg = data.get('message', 'Erro desconhecido') if isinstance(data, dict) else 'Erro desconhecido'
+            print(f"   -> Erro API: {msg}")
+            raise ErroClima(f"Erro API: {msg}")
+
+        if self.diretorio_gravacao:
+            self._gravar(lat, lon, data)
+        return ForecastSlots.from_openweather(data)
+
+    def _requisitar(self, lat, lon, limite):
+        """
+        GET com o corpo lido em blocos; passado `limite` (time.monotonic) a
+        leitura é abandonada e a conexão fechada, liberando a thread do pool
+        mesmo que ninguém espere mais pela resposta.
+        """
+        try:
+            with self.session.get(
+                self.URL,
+                params={'lat': lat, 'lon': lon, 'appid': self.api_key},
+                timeout=(self.orcamento, self.orcamento),
+                stream=True
+            ) as response:
+                corpo = bytearray()
+                for bloco in response.iter_content(BLOCO_LEITURA):
+                    corpo.extend(bloco)
+                    if time.monotonic() > limite:
+                        raise requests.Timeout('orçamento de latência esgotado')
+                return response.status_code, json.loads(corpo)
+        except requests.Timeout as e:
+            print(f"   -> Timeout ({self.orcamento * 1000:.0f} ms)")
+            raise ErroClima('Erro Conexão') from e
+        except Exception as e:
+            print(f"   -> Exceção: {e}")
+            raise ErroClima('Erro Conexão') from e
+
+    def _gravar(self, lat, lon, data):
+        # A gravação é só para replay: uma falha aqui fica no log e a
+        # previsão obtida segue normalmente
+        caminho = os.path.join(self.diretorio_gravacao, nome_arquivo(lat, lon))
+        temporario = f'{caminho}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            os.makedirs(self.diretorio_gravacao, exist_ok=True)
+            with open(temporario, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(temporario, caminho)
+        except (OSError, TypeError, ValueError) as e:
+            print(f"   -> Falha ao gravar {caminho}: {e!r}")
+            with contextlib.suppress(OSError):
+                os.remove(temporario)
+
+
+class RecordedWeatherProvider(WeatherProvider):
+    """
+    Substituto local da OpenWeather. Procura `<lat>_<lon>.json` (resposta do
+    /forecast gravada) em `diretorio`; sem arquivo, gera uma previsão
+    sintética determinística para a coordenada. Os horários são deslocados
+    para começar no slot de 3 h atual, então gravações antigas continuam
+    cobrindo os próximos 5 dias.
+
+    `latencia_ms` (+ `variacao_ms` aleatória) simula a ida e volta da rede;
+    `taxa_erro` simula falhas do provedor.
+    """
+
+    nome = 'recorded'
+    fonte = 'Recorded forecast (offline)'
+
+    def __init__(self, diretorio=None, latencia_ms=0, variacao_ms=0, taxa_erro=0.0, orcamento_ms=5000):
+        super().__init__(orcamento_ms)
+        self.diretorio = diretorio
+        self.latencia = float(latencia_ms) / 1000.0
+        self.variacao = float(variacao_ms) / 1000.0
+        self.taxa_erro = float(taxa_erro)
+        self._aleatorio = random.Random(0)
+
+    def _buscar(self, lat, lon):
+        espera = self.latencia + self._aleatorio.uniform(0, self.variacao)
+        if espera > self.orcamento:
+            time.sleep(self.orcamento)
+            raise ErroClima('Erro Conexão')
+        if espera > 0:
+            time.sleep(espera)
+        if self.taxa_erro and self._aleatorio.random() < self.taxa_erro:
+            raise ErroClima('Erro API: falha simulada')
+
+        agora = int(time.time())
+        inicio = agora - agora % CADENCIA_PREVISAO
+        gravado = self._ler(lat, lon)
+        if gravado is not None:
+            timestamps, mains = gravado
+            deslocamento = inicio - min(timestamps)
+            return ForecastSlots([t + deslocamento for t in timestamps], mains)
+        return self._sintetica(lat, lon, inicio)
+
+    def _ler(self, lat, lon):
+        if not self.diretorio:
+            return None
+        caminho = os.path.join(self.diretorio, nome_arquivo(lat, lon))
+        if not os.path.exists(caminho):
+            return None
+        try:
+            with open(caminho, encoding='utf-8') as f:
+                lista = json.load(f).get('list', [])
+            if not lista:
+                return None
+            return [int(item['dt']) for item in lista], [item['weather'][0]['main'] for item in lista]
+        except (OSError, AttributeError, KeyError, IndexError, TypeError, ValueError) as e:
+            print(f"   -> Gravação inválida {caminho}: {e!r}")
+            raise ErroClima('Erro API: gravação inválida') from e
+
+    @staticmethod
+    def _sintetica(lat, lon, inicio):
+        semente = int(hashlib.sha256(nome_arquivo(lat, lon).encode()).hexdigest()[:8], 16)
+        gerador = random.Random(semente)
+        mains = gerador.choices(CONDICOES_SINTETICAS, PESOS_SINTETICOS, k=SLOTS_PREVISAO)
+        return ForecastSlots([inicio + i * CADENCIA_PREVISAO for i in range(SLOTS_PREVISAO)], mains)
+
+
+def criar_provedor(nome, api_key=None, orcamento_ms=5000, conexoes=10, diretorio=None,
+                   latencia_ms=0, variacao_ms=0, taxa_erro=0.0):
+    """Instancia o provedor configurado ('openweather' ou 'recorded')."""
+    if nome == 'openweather':
+        return OpenWeatherProvider(api_key, orcamento_ms, conexoes, diretorio_gravacao=diretorio)
+    if nome == 'recorded':
+        return RecordedWeatherProvider(diretorio, latencia_ms, variacao_ms, taxa_erro, orcamento_ms)
+    raise ValueError(f"Provedor de clima desconhecido: {nome} (use 'openweather' ou 'recorded')")
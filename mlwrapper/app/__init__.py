@@ -5,23 +5,27 @@ from app.config import Config
 from app.middleware import log_request, log_response
 
 
+def _configure_logging():
+    logging.basicConfig(
+        level=getattr(logging, Config.LOG_LEVEL),
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+
 def create_app():
     """Factory function to create Flask application"""
 
     app = Flask(__name__)
 
     # Logging configuration
-    logging.basicConfig(
-        level=getattr(logging, Config.LOG_LEVEL),
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
+    _configure_logging()
 
     # CORS to accept requests from Java API
     CORS(app, resources={
         r"/*": {
             "origins": ["http://localhost:8080", "http://localhost:*"],
             "methods": ["GET", "POST", "OPTIONS"],
-            "allow_headers": ["Content-Type", "X-Correlation-ID"]
+            "allow_headers": ["Content-Type", "X-Correlation-ID", "Cache-Control"]
         }
     })
 
@@ -40,3 +44,29 @@ def create_app():
     logger.info("Flask ML Wrapper initialized successfully")
 
     return app
+
+
+def create_async_app():
+    """
+    Factory function to create the async (aiohttp) application
+
+    Serves the same /predict and /health contract as create_app(), with
+    async handlers and the AsyncMLServiceClient connection pool.
+    """
+    from aiohttp import web
+    from app.middleware.async_logging import log_requests
+    from app.routes import async_prediction_routes
+
+    _configure_logging()
+
+    logger = logging.getLogger(__name__)
+    logger.info("Initializing async ML Wrapper...")
+    logger.info(f"ML Service configured at: {Config.ML_SERVICE_URL}")
+
+    app = web.Application(middlewares=[log_requests])
+    app.add_routes(async_prediction_routes.routes)
+    app.on_cleanup.append(async_prediction_routes.close_client)
+
+    logger.info("Async ML Wrapper initialized successfully")
+
+    return app
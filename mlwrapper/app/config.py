@@ -13,6 +13,41 @@ class Config:
     ML_SERVICE_URL = os.getenv(
         'ML_SERVICE_URL', 'http://ml-service:8000/predict')
     ML_SERVICE_TIMEOUT = int(os.getenv('ML_SERVICE_TIMEOUT', '30'))
+    # Model-service replicas (comma-separated /predict URLs); empty = ML_SERVICE_URL only
+    ML_SERVICE_URLS = [u.strip() for u in os.getenv('ML_SERVICE_URLS', '').split(',') if u.strip()]
+    # Hedging (async client): duplicate a request still unanswered after the
+    # observed latency percentile, capped at HEDGE_BUDGET of requests
+    ML_SERVICE_HEDGE = os.getenv('ML_SERVICE_HEDGE', 'False').lower() == 'true'
+    ML_SERVICE_HEDGE_PERCENTILE = float(os.getenv('ML_SERVICE_HEDGE_PERCENTILE', '95'))
+    ML_SERVICE_HEDGE_MIN_DELAY_MS = float(os.getenv('ML_SERVICE_HEDGE_MIN_DELAY_MS', '10'))
+    ML_SERVICE_HEDGE_BUDGET = float(os.getenv('ML_SERVICE_HEDGE_BUDGET', '0.1'))
+    # Retries: overall deadline per prediction (all attempts), jittered backoff
+    # and a process-wide budget (retries <= RETRY_BUDGET of recent requests)
+    ML_SERVICE_DEADLINE = float(os.getenv('ML_SERVICE_DEADLINE', str(ML_SERVICE_TIMEOUT)))
+    ML_SERVICE_MAX_RETRIES = int(os.getenv('ML_SERVICE_MAX_RETRIES', '3'))
+    ML_SERVICE_RETRY_BACKOFF = float(os.getenv('ML_SERVICE_RETRY_BACKOFF', '0.1'))
+    ML_SERVICE_RETRY_BACKOFF_MAX = float(os.getenv('ML_SERVICE_RETRY_BACKOFF_MAX', '2'))
+    ML_SERVICE_RETRY_ON_TIMEOUT = os.getenv('ML_SERVICE_RETRY_ON_TIMEOUT', 'False').lower() == 'true'
+    ML_SERVICE_RETRY_BUDGET = float(os.getenv('ML_SERVICE_RETRY_BUDGET', '0.1'))
+    ML_SERVICE_RETRY_BUDGET_MIN = int(os.getenv('ML_SERVICE_RETRY_BUDGET_MIN', '3'))
+    # Circuit breaker per replica: opens after N consecutive failures (or calls
+    # slower than SLOW_MS; 0 = off), half-opens after OPEN_SECONDS with PROBES calls
+    ML_SERVICE_BREAKER_FAILURES = int(os.getenv('ML_SERVICE_BREAKER_FAILURES', '5'))
+    ML_SERVICE_BREAKER_SLOW_MS = float(os.getenv('ML_SERVICE_BREAKER_SLOW_MS', '0'))
+    ML_SERVICE_BREAKER_OPEN_SECONDS = float(os.getenv('ML_SERVICE_BREAKER_OPEN_SECONDS', '30'))
+    ML_SERVICE_BREAKER_PROBES = int(os.getenv('ML_SERVICE_BREAKER_PROBES', '1'))
+    # Connections per event loop in the async client (run_async.py)
+    ML_SERVICE_POOL_SIZE = int(os.getenv('ML_SERVICE_POOL_SIZE', '100'))
+
+    # Prediction response cache (per process): SIZE entries (0 = off) valid for
+    # TTL seconds; departure times are rounded down to BUCKET_MINUTES
+    PREDICTION_CACHE_SIZE = int(os.getenv('PREDICTION_CACHE_SIZE', '10000'))
+    PREDICTION_CACHE_TTL = float(os.getenv('PREDICTION_CACHE_TTL', '300'))
+    PREDICTION_CACHE_BUCKET_MINUTES = int(os.getenv('PREDICTION_CACHE_BUCKET_MINUTES', '1'))
+
+    # Token required in the X-Admin-Token header of admin endpoints
+    # (DELETE /cache); unset = those endpoints answer 403
+    ADMIN_TOKEN = os.getenv('ADMIN_TOKEN')
 
     # Logging
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
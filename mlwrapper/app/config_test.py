@@ -17,6 +17,27 @@ class TestConfig:
     # Mock ML Service
     ML_SERVICE_URL = "http://mock-ml-service:8000/predict"
     ML_SERVICE_TIMEOUT = 5
+    ML_SERVICE_URLS = []
+    ML_SERVICE_HEDGE = False
+    ML_SERVICE_HEDGE_PERCENTILE = 95.0
+    ML_SERVICE_HEDGE_MIN_DELAY_MS = 10.0
+    ML_SERVICE_HEDGE_BUDGET = 0.1
+    ML_SERVICE_DEADLINE = 5.0
+    ML_SERVICE_MAX_RETRIES = 3
+    ML_SERVICE_RETRY_BACKOFF = 0.01
+    ML_SERVICE_RETRY_BACKOFF_MAX = 0.1
+    ML_SERVICE_RETRY_ON_TIMEOUT = False
+    ML_SERVICE_RETRY_BUDGET = 0.1
+    ML_SERVICE_RETRY_BUDGET_MIN = 3
+    ML_SERVICE_BREAKER_FAILURES = 5
+    ML_SERVICE_BREAKER_SLOW_MS = 0.0
+    ML_SERVICE_BREAKER_OPEN_SECONDS = 1.0
+    ML_SERVICE_BREAKER_PROBES = 1
+    ML_SERVICE_POOL_SIZE = 10
+    PREDICTION_CACHE_SIZE = 100
+    PREDICTION_CACHE_TTL = 60.0
+    PREDICTION_CACHE_BUCKET_MINUTES = 1
+    ADMIN_TOKEN = "test-admin-token"
 
     # Logging
     LOG_LEVEL = "DEBUG"
@@ -31,6 +31,14 @@ class MLServiceConnectionError(MLServiceError):
         super().__init__(message, status_code=503)
 
 
+class MLServiceCircuitOpenError(MLServiceError):
+    """Exception raised when the circuit breaker of every ML service replica is open"""
+
+    def __init__(self, message: str = "ML service unavailable (circuit open)", retry_after: float = 0.0):
+        super().__init__(message, status_code=503)
+        self.retry_after = retry_after
+
+
 class MLServiceHTTPError(MLServiceError):
     """Exception raised when ML service returns HTTP error"""
 
@@ -0,0 +1,40 @@
+"""
+Request Logging Middleware for the async app (aiohttp)
+
+Same behaviour as logging.log_request/log_response: correlation ID taken
+from (or added to) X-Correlation-ID, request and response logged with it.
+"""
+
+import logging
+import time
+import uuid
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+# Typed request key, so handlers can read request[CORRELATION_ID]
+CORRELATION_ID = web.RequestKey('correlation_id', str)
+
+
+@web.middleware
+async def log_requests(request: web.Request, handler):
+    """Log incoming request and response with correlation ID and duration"""
+    correlation_id = request.headers.get('X-Correlation-ID') or str(uuid.uuid4())
+    request[CORRELATION_ID] = correlation_id
+
+    logger.info(
+        f"[{correlation_id}] Incoming {request.method} {request.path} "
+        f"from {request.remote}"
+    )
+    start_time = time.time()
+
+    response = await handler(request)
+
+    logger.info(
+        f"[{correlation_id}] Response {response.status} "
+        f"in {time.time() - start_time:.3f}s"
+    )
+
+    # Add correlation ID to response headers for client
+    response.headers['X-Correlation-ID'] = correlation_id
+    return response
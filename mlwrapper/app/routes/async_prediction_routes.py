@@ -0,0 +1,192 @@
+"""
+Async versions of /predict and /health (aiohttp)
+
+Same request/response contract as prediction_routes, served by
+create_async_app() (run_async.py). Each request awaits the ML service
+instead of holding a worker, so one process serves many concurrent
+predictions over the client's shared connection pool.
+"""
+
+from aiohttp import web
+from app.services.async_ml_client import AsyncMLServiceClient, get_async_ml_client
+from app.exceptions import MLServiceCircuitOpenError
+from app.routes.prediction_routes import (
+    FlightPredictionRequest,
+    admin_authorized,
+    cache_lookup,
+    get_cache,
+    retry_after_header
+)
+from pydantic import ValidationError
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+routes = web.RouteTableDef()
+
+# Dependency injection - can be replaced for testing
+_ml_client: AsyncMLServiceClient = None
+
+
+def get_client() -> AsyncMLServiceClient:
+    """
+    Get async ML client instance (Dependency Injection)
+
+    Allows easy mocking in tests by calling set_client()
+    """
+    global _ml_client
+    if _ml_client is None:
+        _ml_client = get_async_ml_client()
+    return _ml_client
+
+
+def set_client(client: AsyncMLServiceClient):
+    """Set async ML client instance (for testing)"""
+    global _ml_client
+    _ml_client = client
+
+
+@routes.post('/predict')
+async def predict(request: web.Request) -> web.Response:
+    """
+    Main endpoint for flight delay prediction (async)
+
+    Same request body and response as prediction_routes.predict
+    """
+
+    try:
+        # 1. Receive flight data from Java API
+        try:
+            flight_data = await request.json()
+        except Exception as json_error:
+            logger.warning(f"Invalid JSON or empty body: {json_error}")
+            return web.json_response({
+                "error": "Empty request body"
+            }, status=400)
+
+        if not flight_data:
+            return web.json_response({
+                "error": "Empty request body"
+            }, status=400)
+
+        logger.info(
+            f"Request received from Java API: {flight_data.get('flightNumber')}")
+
+        # 2. Validate input data
+        validated_data = FlightPredictionRequest(**flight_data)
+
+        # 3. Forward to external ML service (awaits without holding the
+        # worker), unless the answer is cached
+        ml_request = validated_data.model_dump()
+        cache_key, ml_result, cache_status = cache_lookup(
+            ml_request, request.headers.get('Cache-Control'))
+        if ml_result is None:
+            ml_client = get_client()
+            ml_result = await ml_client.predict_async(ml_request)
+            if cache_key is not None:
+                get_cache().put(cache_key, ml_result)
+
+        # 4. Map ML service response to Java API format
+        response = {
+            "prediction": ml_result.get("prediction"),
+            # Map probability -> confidence
+            "confidence": ml_result.get("probability")
+        }
+
+        logger.info(f"Returning result to Java API: {response}")
+        headers = {"X-Cache": cache_status} if cache_status else None
+        return web.json_response(response, status=200, headers=headers)
+
+    except ValidationError as e:
+        logger.warning(f"Validation error: {e}")
+        return web.json_response({
+            "error": "Invalid data",
+            "details": e.errors()
+        }, status=400, dumps=_dumps)
+
+    except MLServiceCircuitOpenError as e:
+        # Fails fast while the ML service's circuit is open
+        logger.warning(f"ML service circuit open, retry after {e.retry_after:.1f}s")
+        return web.json_response({
+            "error": "ML service unavailable",
+            "message": e.message
+        }, status=503, headers={"Retry-After": retry_after_header(e)})
+
+    except Exception as e:
+        logger.error(f"Processing error: {str(e)}")
+        return web.json_response({
+            "error": "Integration wrapper error",
+            "message": str(e)
+        }, status=500)
+
+
+@routes.get('/health')
+async def health(request: web.Request) -> web.Response:
+    """
+    Integration wrapper health check (async)
+    """
+
+    try:
+        ml_client = get_client()
+        ml_status = await ml_client.health_check_async()
+
+        wrapper_status = "HEALTHY" if ml_status.get(
+            "status") == "UP" else "DEGRADED"
+
+        return web.json_response({
+            "status": wrapper_status,
+            "service": "Flask ML Wrapper",
+            "ml_service": ml_status
+        }, status=200 if wrapper_status == "HEALTHY" else 503)
+
+    except Exception as e:
+        logger.error(f"Health check failed: {e}")
+        return web.json_response({
+            "status": "DOWN",
+            "error": str(e)
+        }, status=503)
+
+
+@routes.get('/metrics')
+async def metrics(request: web.Request) -> web.Response:
+    """
+    Wrapper metrics in JSON (per worker process, async)
+    """
+
+    return web.json_response({
+        "service": "Flask ML Wrapper",
+        "pid": os.getpid(),
+        "ml_client": get_client().metrics(),
+        "prediction_cache": get_cache().stats()
+    }, status=200)
+
+
+@routes.delete('/cache')
+async def invalidate_cache(request: web.Request) -> web.Response:
+    """
+    Drops cached predictions (this worker process only, async; requires
+    the X-Admin-Token header)
+    """
+
+    if not admin_authorized(request.headers.get('X-Admin-Token')):
+        return web.json_response({"error": "Forbidden"}, status=403)
+
+    removed = get_cache().invalidate(
+        origin=request.query.get('origin'),
+        destination=request.query.get('destination')
+    )
+    logger.info(f"Prediction cache invalidated: {removed} entries removed")
+    return web.json_response({"invalidated": removed}, status=200)
+
+
+async def close_client(app: web.Application):
+    """on_cleanup hook: closes the client's session for this event loop"""
+    if isinstance(_ml_client, AsyncMLServiceClient):
+        await _ml_client.close()
+
+
+def _dumps(value) -> str:
+    """JSON for pydantic error details (ctx may hold exception objects)"""
+    return json.dumps(value, default=str)
@@ -1,8 +1,15 @@
 from flask import Blueprint, request, jsonify
+from app.config import Config
+from app.exceptions import MLServiceCircuitOpenError
 from app.services.ml_client import get_ml_client
 from app.services.ml_client_interface import IMLServiceClient
+from app.services.prediction_cache import PredictionCache, bypass_requested, get_prediction_cache
 from pydantic import BaseModel, Field, ValidationError, field_validator
+from typing import Any, Dict, Optional, Tuple
+import hmac
 import logging
+import math
+import os
 
 logger = logging.getLogger(__name__)
 
@@ -36,6 +43,52 @@ def set_client(client: IMLServiceClient):
     _ml_client = client
 
 
+_cache: PredictionCache = None
+
+
+def get_cache() -> PredictionCache:
+    """Get prediction cache instance (Dependency Injection)"""
+    global _cache
+    if _cache is None:
+        _cache = get_prediction_cache()
+    return _cache
+
+
+def set_cache(cache: PredictionCache):
+    """Set prediction cache instance (for testing)"""
+    global _cache
+    _cache = cache
+
+
+def cache_lookup(flight_data: Dict[str, Any], cache_control: Optional[str]) -> Tuple[Any, Optional[Dict], Optional[str]]:
+    """
+    Looks the request up in the prediction cache
+
+    Returns (key to store the fresh answer under or None, cached ML
+    response or None, X-Cache value: HIT, MISS, BYPASS or None when the
+    request is not cacheable)
+    """
+    cache = get_cache()
+    key = cache.key_for(flight_data) if cache.enabled else None
+    if key is None:
+        return None, None, None
+    if bypass_requested(cache_control):
+        cache.record_bypass()
+        return key, None, "BYPASS"
+    cached = cache.get(key)
+    return key, cached, "HIT" if cached is not None else "MISS"
+
+
+def admin_authorized(token: Optional[str]) -> bool:
+    """
+    Whether an X-Admin-Token header value matches ADMIN_TOKEN (admin
+    endpoints are refused for everyone while ADMIN_TOKEN is unset)
+    """
+    if not Config.ADMIN_TOKEN or token is None:
+        return False
+    return hmac.compare_digest(token.encode(), Config.ADMIN_TOKEN.encode())
+
+
 class FlightPredictionRequest(BaseModel):
     """Pydantic model for request validation"""
 
@@ -99,10 +152,16 @@ def predict():
         # 2. Validate input data (optional but recommended)
         validated_data = FlightPredictionRequest(**flight_data)
 
-        # 3. Forward to external ML service
-        logger.info("Forwarding to external ML service...")
-        ml_client = get_client()  # Use dependency injection
-        ml_result = ml_client.predict(validated_data.model_dump())
+        # 3. Forward to external ML service (unless the answer is cached)
+        ml_request = validated_data.model_dump()
+        cache_key, ml_result, cache_status = cache_lookup(
+            ml_request, request.headers.get('Cache-Control'))
+        if ml_result is None:
+            logger.info("Forwarding to external ML service...")
+            ml_client = get_client()  # Use dependency injection
+            ml_result = ml_client.predict(ml_request)
+            if cache_key is not None:
+                get_cache().put(cache_key, ml_result)
 
         # 4. Map ML service response to Java API format
         # ML service returns: {"prediction": 0/1, "probability": 0.85}
@@ -115,7 +174,8 @@ def predict():
 
         # 5. Return result in format expected by Java API
         logger.info(f"Returning result to Java API: {response}")
-        return jsonify(response), 200
+        headers = {"X-Cache": cache_status} if cache_status else {}
+        return jsonify(response), 200, headers
 
     except ValidationError as e:
         logger.warning(f"Validation error: {e}")
@@ -124,6 +184,14 @@ def predict():
             "details": e.errors()
         }), 400
 
+    except MLServiceCircuitOpenError as e:
+        # Fails fast while the ML service's circuit is open
+        logger.warning(f"ML service circuit open, retry after {e.retry_after:.1f}s")
+        return jsonify({
+            "error": "ML service unavailable",
+            "message": e.message
+        }), 503, {"Retry-After": retry_after_header(e)}
+
     except Exception as e:
         logger.error(f"Processing error: {str(e)}")
         return jsonify({
@@ -132,6 +200,11 @@ def predict():
         }), 500
 
 
+def retry_after_header(error: MLServiceCircuitOpenError) -> str:
+    """Retry-After value in whole seconds (at least 1)"""
+    return str(max(1, math.ceil(error.retry_after)))
+
+
 @bp.route('/health', methods=['GET'])
 def health():
     """
@@ -162,3 +235,43 @@ def health():
             "status": "DOWN",
             "error": str(e)
         }), 503
+
+
+@bp.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Wrapper metrics in JSON (per worker process)
+
+    Includes the ML client counters: retries by reason, retries refused
+    (max retries, deadline, budget exhausted), the retry budget window,
+    each replica's circuit breaker (state, recent transitions) and the
+    prediction cache (hits, misses, evictions).
+    """
+
+    return jsonify({
+        "service": "Flask ML Wrapper",
+        "pid": os.getpid(),
+        "ml_client": get_client().metrics(),
+        "prediction_cache": get_cache().stats()
+    }), 200
+
+
+@bp.route('/cache', methods=['DELETE'])
+def invalidate_cache():
+    """
+    Drops cached predictions (this worker process only: the other
+    workers keep theirs until PREDICTION_CACHE_TTL expires them)
+
+    Requires the X-Admin-Token header. Query parameters (optional):
+    origin, destination. Without them the whole cache is cleared.
+    """
+
+    if not admin_authorized(request.headers.get('X-Admin-Token')):
+        return jsonify({"error": "Forbidden"}), 403
+
+    removed = get_cache().invalidate(
+        origin=request.args.get('origin'),
+        destination=request.args.get('destination')
+    )
+    logger.info(f"Prediction cache invalidated: {removed} entries removed")
+    return jsonify({"invalidated": removed}), 200
@@ -1,3 +1,4 @@
 from .ml_client import MLServiceClient, get_ml_client
+from .async_ml_client import AsyncMLServiceClient, get_async_ml_client
 
-__all__ = ['MLServiceClient', 'get_ml_client']
+__all__ = ['MLServiceClient', 'get_ml_client', 'AsyncMLServiceClient', 'get_async_ml_client']
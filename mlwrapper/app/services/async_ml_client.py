@@ -0,0 +1,316 @@
+"""
+Asyncio HTTP client for the external ML service
+
+MLServiceClient (requests) holds a worker for the whole upstream call, so a
+sync gunicorn deployment can only have as many predictions in flight as it
+has workers. This client sends requests with aiohttp over one connection
+pool per event loop, so a single process can keep hundreds of predictions
+in flight while the model service does the work.
+
+- Async route handlers (app.routes.async_prediction_routes) await
+  predict_async() and health_check_async() directly.
+- Replicas (ML_SERVICE_URLS) are chosen by least outstanding requests,
+  and a slow attempt can be hedged on another replica (ML_SERVICE_HEDGE);
+  the losing request is cancelled.
+- Each replica has a circuit breaker; when every circuit is open, calls
+  fail at once with MLServiceCircuitOpenError.
+- Retries follow the same RetryPolicy as MLServiceClient (deadline,
+  jittered backoff, process-wide budget).
+- The sync predict()/health_check() of IMLServiceClient run the same
+  coroutines on a background event loop, so the Flask routes can use this
+  client too.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from typing import Any, Dict, List
+
+import aiohttp
+
+from app.config import Config
+from app.exceptions import (
+    MLServiceCircuitOpenError,
+    MLServiceConnectionError,
+    MLServiceError,
+    MLServiceHTTPError,
+    MLServiceTimeoutError
+)
+from app.services.circuit_breaker import Admission, is_replica_failure
+from app.services.load_balancer import Endpoint, HedgingPolicy, LeastOutstandingBalancer
+from app.services.ml_client import build_ml_payload, summarize_health
+from app.services.ml_client_interface import IMLServiceClient
+from app.services.retry_policy import Deadline, RetryPolicy
+
+logger = logging.getLogger(__name__)
+
+
+def _error_detail(body: bytes) -> Any:
+    """Error body of an HTTP error (proxies may answer 502/503 with HTML)"""
+    if not body:
+        return {}
+    try:
+        return json.loads(body)
+    except ValueError:
+        return body.decode(errors='replace')
+
+
+class AsyncMLServiceClient(IMLServiceClient):
+    """
+    aiohttp client for the external ML service
+
+    Sessions are created lazily, one per event loop (the aiohttp worker's
+    loop and, if the sync methods are used, the background loop), so
+    nothing is opened before gunicorn forks.
+    """
+
+    def __init__(self, pool_size: int = None, retry_policy: RetryPolicy = None,
+                 urls: List[str] = None, hedging: HedgingPolicy = None):
+        self.balancer = LeastOutstandingBalancer(
+            urls or Config.ML_SERVICE_URLS or [Config.ML_SERVICE_URL])
+        self.ml_service_url = self.balancer.endpoints[0].url
+        self.hedging = hedging or HedgingPolicy.from_config()
+        self.timeout = Config.ML_SERVICE_TIMEOUT
+        self.pool_size = pool_size or Config.ML_SERVICE_POOL_SIZE
+        self.retry_policy = retry_policy or RetryPolicy.from_config()
+
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._background_loop = None
+
+        logger.info(
+            f"AsyncMLServiceClient configured for: "
+            f"{', '.join(e.url for e in self.balancer.endpoints)}"
+        )
+        if self.hedging.enabled:
+            logger.info(f"Hedging after p{self.hedging.percentile:g} of observed latency")
+        logger.info(f"Connection pool: up to {self.pool_size} connections per event loop")
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Returns the session bound to the running event loop"""
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(loop)
+        if session is None or session.closed:
+            session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+                headers={'Content-Type': 'application/json'}
+            )
+            self._sessions[loop] = session
+        return session
+
+    async def predict_async(self, flight_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Sends request to external ML service (coroutine)
+
+        Same contract and exceptions as MLServiceClient.predict()
+        """
+
+        logger.info(
+            f"Sending request to ML service: {flight_data.get('flightNumber')}"
+        )
+
+        ml_payload = build_ml_payload(flight_data)
+
+        deadline = self.retry_policy.start()
+        retries = 0
+        while True:
+            try:
+                return await self._post_prediction(ml_payload, deadline)
+            except MLServiceError as e:
+                delay = self.retry_policy.next_delay(e, retries, deadline)
+                if delay is None:
+                    raise
+                logger.warning(
+                    f"Retrying ML service call in {delay:.2f}s "
+                    f"({self.retry_policy.retry_reason(e)}, retry {retries + 1})"
+                )
+                await asyncio.sleep(delay)
+                retries += 1
+
+    async def _post_prediction(self, ml_payload: Dict[str, Any], deadline: Deadline) -> Dict[str, Any]:
+        """
+        One attempt. If hedging is on and the replica has not answered after
+        the hedge delay, the same request goes to another replica; the first
+        success wins and the other request is cancelled.
+        """
+
+        primary_endpoint, primary_admission = self.balancer.acquire()
+        primary = asyncio.ensure_future(
+            self._post_to(primary_endpoint, primary_admission, ml_payload, deadline))
+
+        delay = self.hedging.delay() if len(self.balancer) > 1 else None
+        if delay is None:
+            return await primary
+
+        done, _ = await asyncio.wait({primary}, timeout=min(delay, deadline.remaining()))
+        if done or not self.hedging.try_hedge():
+            return await primary
+
+        try:
+            hedge_endpoint, hedge_admission = self.balancer.acquire(exclude=[primary_endpoint])
+        except MLServiceCircuitOpenError:
+            # Every other replica's circuit is open: keep waiting on the primary
+            return await primary
+
+        logger.info(f"Hedging ML service call after {delay * 1000:.0f}ms")
+        hedge = asyncio.ensure_future(
+            self._post_to(hedge_endpoint, hedge_admission, ml_payload, deadline))
+
+        pending = {primary, hedge}
+        first_error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self.hedging.record_winner(task is hedge, cancelled=len(pending))
+                        return task.result()
+                    first_error = first_error or task.exception()
+            raise first_error
+        finally:
+            # Cancels the loser (or both, if the caller itself was cancelled)
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+    async def _post_to(self, endpoint: Endpoint, admission: Admission,
+                       ml_payload: Dict[str, Any], deadline: Deadline) -> Dict[str, Any]:
+        """Request to one replica, with the time left in the deadline as timeout"""
+
+        timeout = deadline.timeout(self.timeout)
+        success = False
+
+        # Track performance
+        start_time = time.time()
+        try:
+            if timeout <= 0:
+                success = None  # deadline used up, not the replica's fault
+                raise asyncio.TimeoutError()
+
+            session = self._get_session()
+            async with session.post(
+                endpoint.url,
+                json=ml_payload,
+                timeout=aiohttp.ClientTimeout(total=timeout)
+            ) as response:
+                body = await response.read()
+
+            elapsed_time = time.time() - start_time
+            logger.info(f"ML service responded in {elapsed_time:.2f}s")
+
+            if response.status >= 400:
+                logger.error(f"HTTP error from ML service: {response.status}")
+                success = not is_replica_failure(response.status)
+                error_detail = _error_detail(body)
+                raise MLServiceHTTPError(
+                    f"ML service error: {error_detail}",
+                    status_code=response.status
+                )
+
+            result = json.loads(body)
+
+            logger.info(
+                f"Prediction received from ML service: "
+                f"prediction={result.get('prediction')}, "
+                f"probability={result.get('probability')}"
+            )
+
+            self.hedging.latencies.record(elapsed_time)
+            success = True
+            return result
+
+        except asyncio.CancelledError:
+            # Hedge loser (or caller gone): not an error of the replica
+            success = None
+            raise
+
+        except asyncio.TimeoutError:
+            logger.error(
+                f"Timeout connecting to ML service after {timeout:.2f}s")
+            raise MLServiceTimeoutError()
+
+        except aiohttp.ClientConnectionError as e:
+            logger.error(f"Connection error with ML service: {str(e)}")
+            raise MLServiceConnectionError()
+
+        except MLServiceError:
+            raise
+
+        except Exception as e:
+            logger.error(f"Unexpected error calling ML service: {str(e)}")
+            raise MLServiceError(str(e))
+
+        finally:
+            self.balancer.release(endpoint, admission, success, time.time() - start_time)
+
+    async def health_check_async(self) -> Dict[str, Any]:
+        """
+        Checks if external ML service is available (coroutine; UP if any
+        replica is)
+        """
+
+        results = await asyncio.gather(*(self._check_replica(e) for e in self.balancer.endpoints))
+        return summarize_health(
+            dict(zip((e.url for e in self.balancer.endpoints), results)),
+            self.balancer.breaker_states()
+        )
+
+    async def _check_replica(self, endpoint: Endpoint) -> str:
+        try:
+            session = self._get_session()
+            async with session.get(endpoint.health_url, timeout=aiohttp.ClientTimeout(total=5)) as response:
+                response.raise_for_status()
+            return "OK"
+        except Exception as e:
+            logger.warning(f"ML service health check failed ({endpoint.url}): {e}")
+            return str(e) or type(e).__name__
+
+    def metrics(self) -> Dict[str, Any]:
+        """Client metrics (retries, retry budget, load balancing, circuit breakers, hedging)"""
+        return {
+            "retries": self.retry_policy.stats(),
+            "load_balancer": self.balancer.stats(),
+            "hedging": self.hedging.stats()
+        }
+
+    def predict(self, flight_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Sync entry point: runs predict_async() on the background loop"""
+        return self._run(self.predict_async(flight_data))
+
+    def health_check(self) -> Dict[str, Any]:
+        """Sync entry point: runs health_check_async() on the background loop"""
+        return self._run(self.health_check_async())
+
+    def _run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop_in_background()).result()
+
+    def _loop_in_background(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._background_loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=loop.run_forever, name='ml-client-loop', daemon=True
+                ).start()
+                self._background_loop = loop
+            return self._background_loop
+
+    async def close(self):
+        """Closes the session of the running event loop (app shutdown)"""
+        session = self._sessions.pop(asyncio.get_running_loop(), None)
+        if session is not None:
+            await session.close()
+
+
+# Singleton
+_async_ml_client = None
+
+
+def get_async_ml_client() -> AsyncMLServiceClient:
+    """Returns singleton instance of the async ML client"""
+    global _async_ml_client
+    if _async_ml_client is None:
+        _async_ml_client = AsyncMLServiceClient()
+    return _async_ml_client
@@ -0,0 +1,188 @@
+"""
+Circuit breaker for each model-service replica
+
+When the model service is down or overloaded, every wrapper request used
+to wait for connection timeouts and retries before failing, so worker
+slots piled up and the Java API timed out upstream. With a breaker per
+replica:
+
+- CLOSED: calls go through. `failure_threshold` consecutive failures
+  (connection errors, timeouts, 5xx/429, or calls slower than
+  `slow_call_threshold_s`) open the circuit.
+- OPEN: the replica is skipped; if every replica is open the call fails
+  immediately with MLServiceCircuitOpenError (503 + Retry-After).
+- HALF_OPEN: after `open_seconds`, up to `half_open_probes` calls are let
+  through. If they succeed the circuit closes; any failure opens it again.
+
+allow() hands out an Admission stamped with the breaker's generation (bumped
+on every transition), and record() takes it back. A call admitted before
+the last transition reports a stale result, which is ignored: a success
+from a call sent while the circuit was still closed can't close a
+half-open circuit whose real probe is still in flight.
+
+Transitions are logged and kept (last few) for /health and /metrics.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Dict, NamedTuple, Optional
+
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'CLOSED'
+OPEN = 'OPEN'
+HALF_OPEN = 'HALF_OPEN'
+
+
+def is_replica_failure(status_code: int) -> bool:
+    """5xx and 429 mean the replica is failing; other 4xx are about the request"""
+    return status_code >= 500 or status_code == 429
+
+
+class Admission(NamedTuple):
+    """Ticket of a call let through by CircuitBreaker.allow()"""
+    generation: int
+    probe: bool
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker (thread-safe)"""
+
+    def __init__(self, name: str, failure_threshold: int = 5,
+                 slow_call_threshold_s: Optional[float] = None,
+                 open_seconds: float = 30.0, half_open_probes: int = 1):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.slow_call_threshold_s = slow_call_threshold_s
+        self.open_seconds = open_seconds
+        self.half_open_probes = max(1, half_open_probes)
+
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._consecutive_failures = 0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self._generation = 0
+        self.transitions = deque(maxlen=10)
+        self.times_opened = 0
+        self.stale_results = 0
+
+    @classmethod
+    def from_config(cls, name: str) -> 'CircuitBreaker':
+        slow_ms = Config.ML_SERVICE_BREAKER_SLOW_MS
+        return cls(
+            name,
+            failure_threshold=Config.ML_SERVICE_BREAKER_FAILURES,
+            slow_call_threshold_s=slow_ms / 1000.0 if slow_ms > 0 else None,
+            open_seconds=Config.ML_SERVICE_BREAKER_OPEN_SECONDS,
+            half_open_probes=Config.ML_SERVICE_BREAKER_PROBES
+        )
+
+    def _transition(self, state: str, reason: str):
+        logger.warning(f"Circuit breaker {self.name}: {self._state} -> {state} ({reason})")
+        self.transitions.append({
+            'from': self._state,
+            'to': state,
+            'reason': reason,
+            'at': time.strftime('%Y-%m-%dT%H:%M:%S')
+        })
+        self._state = state
+        self._generation += 1
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+            self.times_opened += 1
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+
+    def _refresh(self):
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._transition(HALF_OPEN, f"{self.open_seconds:g}s elapsed")
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._refresh()
+            return self._state
+
+    def available(self) -> bool:
+        """Whether a call could go through now (does not take a probe)"""
+        with self._lock:
+            self._refresh()
+            if self._state == OPEN:
+                return False
+            return self._state == CLOSED or self._probes_in_flight < self.half_open_probes
+
+    def allow(self) -> Optional[Admission]:
+        """
+        Admits a call (taking a probe slot when half-open): the Admission to
+        pass to record(), or None if the call must not go through
+        """
+        with self._lock:
+            self._refresh()
+            if self._state == CLOSED:
+                return Admission(self._generation, probe=False)
+            if self._state == HALF_OPEN and self._probes_in_flight < self.half_open_probes:
+                self._probes_in_flight += 1
+                return Admission(self._generation, probe=True)
+            return None
+
+    def retry_after(self) -> float:
+        """Seconds until the circuit half-opens (0 if not open)"""
+        with self._lock:
+            if self._state != OPEN:
+                return 0.0
+            return max(0.0, self.open_seconds - (time.monotonic() - self._opened_at))
+
+    def record(self, admission: Admission, success: Optional[bool], duration: float = 0.0):
+        """
+        Outcome of the call admitted with `admission`. A success slower than
+        `slow_call_threshold_s` counts as a failure; None (call cancelled)
+        only frees its probe slot. Results of calls admitted before the last
+        transition are ignored.
+        """
+        with self._lock:
+            if admission.generation != self._generation:
+                self.stale_results += 1
+                return
+            if admission.probe:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+            if success is None:
+                return
+
+            slow = (success and self.slow_call_threshold_s is not None
+                    and duration > self.slow_call_threshold_s)
+            failed = not success or slow
+
+            if self._state == HALF_OPEN:
+                if failed:
+                    self._transition(OPEN, "probe failed" + (" (slow)" if slow else ""))
+                else:
+                    self._probe_successes += 1
+                    if self._probe_successes >= self.half_open_probes:
+                        self._consecutive_failures = 0
+                        self._transition(CLOSED, "probes succeeded")
+                return
+
+            if not failed:
+                self._consecutive_failures = 0
+                return
+            self._consecutive_failures += 1
+            if self._state == CLOSED and self._consecutive_failures >= self.failure_threshold:
+                self._transition(OPEN, f"{self._consecutive_failures} consecutive failures"
+                                       + (" (slow)" if slow else ""))
+
+    def stats(self) -> Dict:
+        with self._lock:
+            self._refresh()
+            return {
+                'state': self._state,
+                'consecutive_failures': self._consecutive_failures,
+                'times_opened': self.times_opened,
+                'stale_results': self.stale_results,
+                'transitions': list(self.transitions)
+            }
@@ -0,0 +1,227 @@
+"""
+Load balancing and hedging across model-service replicas
+
+With a single ML_SERVICE_URL, one slow replica behind it sets the wrapper's
+tail latency. The clients take a list of replicas (ML_SERVICE_URLS) and:
+
+- route each request to the replica with the fewest requests in flight
+  from this process (least outstanding requests; ties broken at random),
+  so a slow replica naturally receives less traffic;
+- skip replicas whose circuit breaker is open (circuit_breaker.py); when
+  every replica is open the call fails fast with MLServiceCircuitOpenError;
+- optionally hedge (async client): if the first attempt has not answered
+  after an adaptive delay (the observed p95 latency by default), send a
+  duplicate to another replica, keep whichever answers first and cancel
+  the other. Hedges are capped at a fraction of the traffic by a budget,
+  so total load grows by a few percent at most.
+"""
+
+import random
+import threading
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.config import Config
+from app.exceptions import MLServiceCircuitOpenError
+from app.services.circuit_breaker import Admission, CircuitBreaker
+from app.services.retry_policy import RetryBudget
+
+
+class Endpoint:
+    """One model-service replica, its circuit breaker and its counters"""
+
+    def __init__(self, url: str, breaker: CircuitBreaker = None):
+        self.url = url
+        self.breaker = breaker or CircuitBreaker.from_config(url)
+        self.outstanding = 0
+        self.requests = 0
+        self.errors = 0
+
+    @property
+    def health_url(self) -> str:
+        return self.url.replace('/predict', '/health')
+
+    def stats(self) -> Dict:
+        return {
+            'url': self.url,
+            'outstanding': self.outstanding,
+            'requests': self.requests,
+            'errors': self.errors,
+            'circuit_breaker': self.breaker.stats()
+        }
+
+
+class LeastOutstandingBalancer:
+    """
+    Picks the replica with the fewest in-flight requests among those whose
+    circuit breaker lets the call through (thread-safe)
+    """
+
+    def __init__(self, urls: Iterable[str], breaker_factory: Callable[[str], CircuitBreaker] = None):
+        factory = breaker_factory or CircuitBreaker.from_config
+        self.endpoints: List[Endpoint] = [Endpoint(url, factory(url)) for url in urls]
+        if not self.endpoints:
+            raise ValueError("At least one ML service URL is required")
+        self._lock = threading.Lock()
+        self.fast_failures = 0
+
+    def __len__(self) -> int:
+        return len(self.endpoints)
+
+    def acquire(self, exclude: Iterable[Endpoint] = ()) -> Tuple[Endpoint, Admission]:
+        """
+        Chooses a replica and counts the request as in flight; returns it
+        with the breaker's admission, to be handed back to release(). Raises
+        MLServiceCircuitOpenError if no replica's circuit admits the call.
+        """
+        with self._lock:
+            candidates = [e for e in self.endpoints if e not in exclude] or self.endpoints
+            ordered = sorted(
+                (e for e in candidates if e.breaker.available()),
+                key=lambda e: (e.outstanding, random.random())
+            )
+            for endpoint in ordered:
+                admission = endpoint.breaker.allow()
+                if admission is not None:
+                    endpoint.outstanding += 1
+                    endpoint.requests += 1
+                    return endpoint, admission
+            self.fast_failures += 1
+        raise MLServiceCircuitOpenError(
+            retry_after=min(e.breaker.retry_after() for e in candidates))
+
+    def release(self, endpoint: Endpoint, admission: Admission,
+                success: Optional[bool] = True, duration: float = 0.0):
+        """
+        Marks the request as finished and reports it to the replica's
+        breaker (success=None: cancelled, not counted)
+        """
+        with self._lock:
+            endpoint.outstanding -= 1
+            if success is False:
+                endpoint.errors += 1
+        endpoint.breaker.record(admission, success, duration)
+
+    def breaker_states(self) -> Dict[str, str]:
+        return {e.url: e.breaker.state for e in self.endpoints}
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'strategy': 'least_outstanding_requests',
+                'fast_failures': self.fast_failures,
+                'endpoints': [e.stats() for e in self.endpoints]
+            }
+
+
+class LatencyTracker:
+    """
+    Recent response times (last `window` samples) and their percentile.
+    The percentile is recomputed every `refresh_every` samples, not on
+    every request.
+    """
+
+    def __init__(self, window: int = 1000, refresh_every: int = 50):
+        self._samples = deque(maxlen=window)
+        self._refresh_every = refresh_every
+        self._since_refresh = 0
+        self._cache: Dict[float, float] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+            self._since_refresh += 1
+            if self._since_refresh >= self._refresh_every:
+                self._since_refresh = 0
+                self._cache.clear()
+
+    def percentile(self, p: float) -> Optional[float]:
+        with self._lock:
+            if not self._samples:
+                return None
+            value = self._cache.get(p)
+            if value is None:
+                ordered = sorted(self._samples)
+                value = ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+                self._cache[p] = value
+            return value
+
+
+class HedgingPolicy:
+    """
+    When to send a hedge: after the `percentile` of recent latencies (never
+    below `min_delay_s`), once `min_samples` responses have been seen, and
+    while the hedge budget (`budget_ratio` of requests) allows it.
+    """
+
+    def __init__(self, enabled: bool = False, percentile: float = 95.0,
+                 min_delay_s: float = 0.01, min_samples: int = 20,
+                 budget_ratio: float = 0.1, latencies: LatencyTracker = None):
+        self.enabled = enabled
+        self.percentile = percentile
+        self.min_delay_s = min_delay_s
+        self.min_samples = min_samples
+        self.latencies = latencies or LatencyTracker()
+        self.budget = RetryBudget(ratio=budget_ratio, min_retries=0)
+
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.hedges = 0
+        self.primary_wins = 0
+        self.hedge_wins = 0
+        self.cancelled = 0
+
+    @classmethod
+    def from_config(cls) -> 'HedgingPolicy':
+        return cls(
+            enabled=Config.ML_SERVICE_HEDGE,
+            percentile=Config.ML_SERVICE_HEDGE_PERCENTILE,
+            min_delay_s=Config.ML_SERVICE_HEDGE_MIN_DELAY_MS / 1000.0,
+            budget_ratio=Config.ML_SERVICE_HEDGE_BUDGET
+        )
+
+    def delay(self) -> Optional[float]:
+        """Seconds to wait before hedging this request, or None for no hedge"""
+        self.budget.record_request()
+        with self._lock:
+            self.requests += 1
+        if not self.enabled or len(self.latencies) < self.min_samples:
+            return None
+        threshold = self.latencies.percentile(self.percentile)
+        return self.min_delay_s if threshold is None else max(self.min_delay_s, threshold)
+
+    def try_hedge(self) -> bool:
+        """Takes a hedge from the budget"""
+        if not self.budget.try_acquire():
+            return False
+        with self._lock:
+            self.hedges += 1
+        return True
+
+    def record_winner(self, hedge_won: bool, cancelled: int):
+        with self._lock:
+            if hedge_won:
+                self.hedge_wins += 1
+            else:
+                self.primary_wins += 1
+            self.cancelled += cancelled
+
+    def stats(self) -> Dict:
+        threshold = self.latencies.percentile(self.percentile)
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'percentile': self.percentile,
+                'threshold_ms': round(max(self.min_delay_s, threshold) * 1000, 1) if threshold is not None else None,
+                'requests': self.requests,
+                'hedges': self.hedges,
+                'hedge_rate': round(self.hedges / self.requests, 4) if self.requests else 0.0,
+                'primary_wins': self.primary_wins,
+                'hedge_wins': self.hedge_wins,
+                'cancelled': self.cancelled,
+                'budget_exhausted': self.budget.exhausted
+            }
@@ -1,7 +1,10 @@
 import requests
-from typing import Dict, Any
+from typing import Dict, Any, List
 from app.config import Config
 from app.services.ml_client_interface import IMLServiceClient
+from app.services.circuit_breaker import is_replica_failure
+from app.services.load_balancer import LeastOutstandingBalancer
+from app.services.retry_policy import Deadline, RetryPolicy
 from app.exceptions import (
     MLServiceTimeoutError,
     MLServiceConnectionError,
@@ -11,38 +14,66 @@ from app.exceptions import (
 import logging
 import time
 from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
 
 logger = logging.getLogger(__name__)
 
 
+def build_ml_payload(flight_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Maps Java API field names to the (Portuguese) field names expected by
+    the external ML service
+    """
+    return {
+        'companhia': flight_data.get('companyName'),
+        'origem': flight_data.get('flightOrigin'),
+        'destino': flight_data.get('flightDestination'),
+        'data_partida': flight_data.get('flightDepartureDate'),
+        # include distance if available (model may ignore)
+        'nr_assentos_ofertados': flight_data.get('flightDistance')
+    }
+
+
+def _error_detail(response) -> Any:
+    """Error body of an HTTP error (proxies may answer 502/503 with HTML)"""
+    if not response.content:
+        return {}
+    try:
+        return response.json()
+    except ValueError:
+        return response.text
+
+
 class MLServiceClient(IMLServiceClient):
     """
     HTTP client for communication with external ML service
 
     This ML service is developed and maintained by the Data Science team.
     Our Flask API only acts as an intermediary between the Java API and the ML service.
+    With several replicas (ML_SERVICE_URLS), each attempt goes to the one
+    with the fewest requests in flight.
     """
 
-    def __init__(self):
-        self.ml_service_url = Config.ML_SERVICE_URL
+    def __init__(self, retry_policy: RetryPolicy = None, urls: List[str] = None):
+        self.balancer = LeastOutstandingBalancer(
+            urls or Config.ML_SERVICE_URLS or [Config.ML_SERVICE_URL])
+        self.ml_service_url = self.balancer.endpoints[0].url
         self.timeout = Config.ML_SERVICE_TIMEOUT
 
-        # Configure session with retry strategy
+        # Retries are done by the RetryPolicy (deadline + budget), not by urllib3
+        self.retry_policy = retry_policy or RetryPolicy.from_config()
         self.session = requests.Session()
-        retry_strategy = Retry(
-            total=3,  # Total retry attempts
-            backoff_factor=1,  # Wait 1, 2, 4 seconds between retries
-            # Retry on these HTTP codes
-            status_forcelist=[429, 500, 502, 503, 504],
-            allowed_methods=["POST", "GET"]
-        )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
+        adapter = HTTPAdapter(max_retries=0)
         self.session.mount("http://", adapter)
         self.session.mount("https://", adapter)
 
-        logger.info(f"MLServiceClient configured for: {self.ml_service_url}")
-        logger.info("Retry strategy: 3 attempts with exponential backoff")
+        logger.info(
+            f"MLServiceClient configured for: "
+            f"{', '.join(e.url for e in self.balancer.endpoints)}"
+        )
+        logger.info(
+            f"Retry policy: up to {self.retry_policy.max_retries} retries "
+            f"within {self.retry_policy.deadline_s}s, jittered backoff, retry budget"
+        )
 
     def predict(self, flight_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -70,31 +101,49 @@ class MLServiceClient(IMLServiceClient):
             Exception: If there's an error communicating with ML service
         """
 
-        try:
-            logger.info(
-                f"Sending request to ML service: {flight_data.get('flightNumber')}"
-            )
+        logger.info(
+            f"Sending request to ML service: {flight_data.get('flightNumber')}"
+        )
 
-            # Track performance
-            start_time = time.time()
-
-            # Prepare payload expected by the external ML service
-            # Map Java API field names -> ML service (Portuguese) field names
-            ml_payload = {
-                'companhia': flight_data.get('companyName'),
-                'origem': flight_data.get('flightOrigin'),
-                'destino': flight_data.get('flightDestination'),
-                'data_partida': flight_data.get('flightDepartureDate'),
-                # include distance if available (model may ignore)
-                'nr_assentos_ofertados': flight_data.get('flightDistance')
-            }
+        # Prepare payload expected by the external ML service
+        ml_payload = build_ml_payload(flight_data)
+
+        deadline = self.retry_policy.start()
+        retries = 0
+        while True:
+            try:
+                return self._post_prediction(ml_payload, deadline)
+            except MLServiceError as e:
+                delay = self.retry_policy.next_delay(e, retries, deadline)
+                if delay is None:
+                    raise
+                logger.warning(
+                    f"Retrying ML service call in {delay:.2f}s "
+                    f"({self.retry_policy.retry_reason(e)}, retry {retries + 1})"
+                )
+                time.sleep(delay)
+                retries += 1
+
+    def _post_prediction(self, ml_payload: Dict[str, Any], deadline: Deadline) -> Dict[str, Any]:
+        """One attempt, with the time left in the deadline as timeout"""
+
+        timeout = deadline.timeout(self.timeout)
+        # Raises MLServiceCircuitOpenError if every replica's circuit is open
+        endpoint, admission = self.balancer.acquire()
+        success = False
+
+        # Track performance
+        start_time = time.time()
+        try:
+            if timeout <= 0:
+                success = None  # deadline used up, not the replica's fault
+                raise requests.exceptions.Timeout()
 
-            # Make HTTP POST request to ML service with retry
             response = self.session.post(
-                self.ml_service_url,
+                endpoint.url,
                 json=ml_payload,
                 headers={'Content-Type': 'application/json'},
-                timeout=self.timeout
+                timeout=timeout
             )
 
             # Calculate response time
@@ -113,11 +162,12 @@ class MLServiceClient(IMLServiceClient):
                 f"probability={result.get('probability')}"
             )
 
+            success = True
             return result
 
         except requests.exceptions.Timeout:
             logger.error(
-                f"Timeout connecting to ML service after {self.timeout}s")
+                f"Timeout connecting to ML service after {timeout:.2f}s")
             raise MLServiceTimeoutError()
 
         except requests.exceptions.ConnectionError as e:
@@ -127,7 +177,8 @@ class MLServiceClient(IMLServiceClient):
         except requests.exceptions.HTTPError as e:
             logger.error(
                 f"HTTP error from ML service: {e.response.status_code}")
-            error_detail = e.response.json() if e.response.content else {}
+            success = not is_replica_failure(e.response.status_code)
+            error_detail = _error_detail(e.response)
             raise MLServiceHTTPError(
                 f"ML service error: {error_detail}",
                 status_code=e.response.status_code
@@ -137,20 +188,52 @@ class MLServiceClient(IMLServiceClient):
             logger.error(f"Unexpected error calling ML service: {str(e)}")
             raise MLServiceError(str(e))
 
+        finally:
+            self.balancer.release(endpoint, admission, success, time.time() - start_time)
+
     def health_check(self) -> Dict[str, Any]:
         """
-        Checks if external ML service is available
+        Checks if external ML service is available (UP if any replica is)
         """
 
-        try:
-            # Try to make request to health endpoint (adjust according to ML service API)
-            health_url = self.ml_service_url.replace('/predict', '/health')
-            response = requests.get(health_url, timeout=5)
-            response.raise_for_status()
-            return {"status": "UP", "ml_service": "OK"}
-        except Exception as e:
-            logger.warning(f"ML service health check failed: {e}")
-            return {"status": "DOWN", "ml_service": str(e)}
+        replicas = {}
+        for endpoint in self.balancer.endpoints:
+            try:
+                # Try to make request to health endpoint (adjust according to ML service API)
+                response = requests.get(endpoint.health_url, timeout=5)
+                response.raise_for_status()
+                replicas[endpoint.url] = "OK"
+            except Exception as e:
+                logger.warning(f"ML service health check failed ({endpoint.url}): {e}")
+                replicas[endpoint.url] = str(e)
+        return summarize_health(replicas, self.balancer.breaker_states())
+
+    def metrics(self) -> Dict[str, Any]:
+        """Client metrics (retries, retry budget, load balancing, circuit breakers)"""
+        return {
+            "retries": self.retry_policy.stats(),
+            "load_balancer": self.balancer.stats()
+        }
+
+
+def summarize_health(replicas: Dict[str, str], breakers: Dict[str, str] = None) -> Dict[str, Any]:
+    """
+    Health of the ML service from the result of each replica ("OK" or the
+    error) and the state of each replica's circuit breaker. With a single
+    replica "ml_service" keeps the original format.
+    """
+    up = sum(1 for status in replicas.values() if status == "OK")
+    if len(replicas) == 1:
+        summary = {"status": "UP" if up else "DOWN", "ml_service": next(iter(replicas.values()))}
+    else:
+        summary = {
+            "status": "UP" if up else "DOWN",
+            "ml_service": "OK" if up == len(replicas) else f"{up}/{len(replicas)} replicas UP",
+            "replicas": replicas
+        }
+    if breakers is not None:
+        summary["circuit_breakers"] = breakers
+    return summary
 
 
 # Singleton
@@ -48,3 +48,12 @@ class IMLServiceClient(ABC):
             Health status dictionary
         """
         pass
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Client metrics exported by /metrics (optional)
+
+        Returns:
+            Metrics dictionary (empty if the client has none)
+        """
+        return {}
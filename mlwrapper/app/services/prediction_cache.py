@@ -0,0 +1,168 @@
+"""
+Response cache for predictions
+
+The Java API asks for the same flight over and over (page refreshes,
+retries, several users following one flight), and every request used to
+go through the network to the model service. The model only looks at
+origin, destination and the departure date/time (month, weekday, HHMM and
+the weather at departure), so two requests that agree on those get the
+same answer:
+
+- key: (origin, destination, departure rounded down to `bucket_minutes`);
+  flightNumber, companyName and flightDistance are not model inputs;
+- LRU with `max_entries` and a TTL, so weather forecast updates on the
+  model side show up after at most `ttl_s` seconds;
+- only successful predictions are stored;
+- `Cache-Control: no-cache` on a request skips the lookup (the fresh
+  answer is still stored), and invalidate() drops everything or one route.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from app.config import Config
+
+CacheKey = Tuple[str, str, str]
+
+
+class PredictionCache:
+    """LRU + TTL cache of ML service responses (thread-safe)"""
+
+    def __init__(self, max_entries: int = 10000, ttl_s: float = 300.0, bucket_minutes: int = 1):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.bucket_minutes = max(1, bucket_minutes)
+
+        self._entries: 'OrderedDict[CacheKey, Tuple[float, Dict[str, Any]]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @classmethod
+    def from_config(cls) -> 'PredictionCache':
+        return cls(
+            max_entries=Config.PREDICTION_CACHE_SIZE,
+            ttl_s=Config.PREDICTION_CACHE_TTL,
+            bucket_minutes=Config.PREDICTION_CACHE_BUCKET_MINUTES
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl_s > 0
+
+    def key_for(self, flight_data: Dict[str, Any]) -> Optional[CacheKey]:
+        """
+        Cache key of a validated request, or None if the departure date
+        can't be parsed (the request is then not cached)
+        """
+        try:
+            departure = datetime.fromisoformat(flight_data['flightDepartureDate'])
+        except (KeyError, TypeError, ValueError):
+            return None
+        minute = departure.minute - departure.minute % self.bucket_minutes
+        departure = departure.replace(minute=minute, second=0, microsecond=0)
+        return (
+            flight_data['flightOrigin'].upper(),
+            flight_data['flightDestination'].upper(),
+            departure.isoformat()
+        )
+
+    def get(self, key: CacheKey) -> Optional[Dict[str, Any]]:
+        """Cached response or None (absent or expired)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: CacheKey, value: Dict[str, Any]):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_s, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def record_bypass(self):
+        with self._lock:
+            self.bypassed += 1
+
+    def invalidate(self, origin: str = None, destination: str = None) -> int:
+        """
+        Drops the cached responses of a route (either side may be omitted),
+        or all of them; returns how many were dropped
+        """
+        origin = origin.upper() if origin else None
+        destination = destination.upper() if destination else None
+        with self._lock:
+            if origin is None and destination is None:
+                removed = len(self._entries)
+                self._entries.clear()
+            else:
+                keys = [
+                    key for key in self._entries
+                    if (origin is None or key[0] == origin)
+                    and (destination is None or key[1] == destination)
+                ]
+                for key in keys:
+                    del self._entries[key]
+                removed = len(keys)
+            self.invalidations += removed
+            return removed
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_s': self.ttl_s,
+                'bucket_minutes': self.bucket_minutes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'bypassed': self.bypassed,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations
+            }
+
+
+def bypass_requested(cache_control: Optional[str]) -> bool:
+    """Whether the request's Cache-Control header asks for a fresh answer"""
+    if not cache_control:
+        return False
+    directives = {d.strip().lower() for d in cache_control.split(',')}
+    return bool(directives & {'no-cache', 'max-age=0'})
+
+
+# Singleton (one cache per worker process)
+_prediction_cache = None
+
+
+def get_prediction_cache() -> PredictionCache:
+    """Returns singleton instance of the prediction cache"""
+    global _prediction_cache
+    if _prediction_cache is None:
+        _prediction_cache = PredictionCache.from_config()
+    return _prediction_cache
@@ -0,0 +1,230 @@
+"""
+Retry policy for calls to the external ML service
+
+Replaces the urllib3 Retry(total=3, backoff_factor=1) mounted on the
+session, which retried each 30 s attempt independently (a struggling model
+service could hold one wrapper request for over a minute) and multiplied
+traffic exactly when the service was overloaded.
+
+- Deadline: every prediction has an overall deadline; each attempt gets
+  only the time that is left, and no retry is started if its backoff would
+  not leave time for the attempt.
+- Jittered backoff ("full jitter"): a random delay between 0 and
+  base * 2^retry, capped, so clients don't retry in lockstep.
+- Retry budget: process-wide, retries may be at most a percentage of the
+  requests seen in the last few seconds (plus a small floor for low
+  traffic). During an overload the extra load is bounded by the budget.
+- Timeouts are not retried by default: the request may still be running
+  on the model service, and retrying it only adds load.
+"""
+
+import random
+import threading
+import time
+from collections import Counter, deque
+from typing import Optional
+
+from app.config import Config
+from app.exceptions import (
+    MLServiceConnectionError,
+    MLServiceError,
+    MLServiceHTTPError,
+    MLServiceTimeoutError
+)
+
+RETRYABLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# A retry is only started if at least this much of the deadline is left after the backoff
+MIN_ATTEMPT_S = 0.05
+
+
+class Deadline:
+    """Overall time limit of one prediction, shared by all its attempts"""
+
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def timeout(self, attempt_timeout: float) -> float:
+        """Timeout for the next attempt: the attempt timeout, capped by what is left"""
+        return min(attempt_timeout, self.remaining())
+
+
+class RetryBudget:
+    """
+    Caps retries at `ratio` of the requests in the last `window_s` seconds,
+    plus `min_retries` so a process with little traffic can still retry.
+    Thread-safe; one instance is shared by every client in the process.
+    """
+
+    def __init__(self, ratio: float = 0.1, window_s: float = 10.0, min_retries: int = 3):
+        self.ratio = ratio
+        self.window_s = window_s
+        self.min_retries = min_retries
+        self._requests = deque()
+        self._retries = deque()
+        self._lock = threading.Lock()
+        self.exhausted = 0
+
+    def _prune(self, now: float):
+        limit = now - self.window_s
+        for events in (self._requests, self._retries):
+            while events and events[0] < limit:
+                events.popleft()
+
+    def record_request(self):
+        with self._lock:
+            now = time.monotonic()
+            self._prune(now)
+            self._requests.append(now)
+
+    def try_acquire(self) -> bool:
+        """Takes one retry from the budget; False if it is exhausted"""
+        with self._lock:
+            now = time.monotonic()
+            self._prune(now)
+            if len(self._retries) >= self.min_retries + self.ratio * len(self._requests):
+                self.exhausted += 1
+                return False
+            self._retries.append(now)
+            return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._prune(time.monotonic())
+            return {
+                'ratio': self.ratio,
+                'window_s': self.window_s,
+                'min_retries': self.min_retries,
+                'requests_in_window': len(self._requests),
+                'retries_in_window': len(self._retries),
+                'exhausted': self.exhausted
+            }
+
+
+class RetryPolicy:
+    """
+    Decides whether (and after how long) a failed attempt is retried
+
+    Usage:
+        deadline = policy.start()
+        while True:
+            try:
+                return attempt(timeout=deadline.timeout(per_attempt_timeout))
+            except MLServiceError as e:
+                delay = policy.next_delay(e, retries, deadline)
+                if delay is None:
+                    raise
+                sleep(delay)
+                retries += 1
+    """
+
+    def __init__(self, max_retries: int = 3, deadline_s: float = 30.0,
+                 backoff_base_s: float = 0.1, backoff_max_s: float = 2.0,
+                 retry_on_timeout: bool = False, retry_statuses=RETRYABLE_STATUSES,
+                 budget: RetryBudget = None):
+        self.max_retries = max_retries
+        self.deadline_s = deadline_s
+        self.backoff_base_s = backoff_base_s
+        self.backoff_max_s = backoff_max_s
+        self.retry_on_timeout = retry_on_timeout
+        self.retry_statuses = frozenset(retry_statuses)
+        self.budget = budget or RetryBudget()
+
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.retries = Counter()
+        self.stops = Counter()
+
+    @classmethod
+    def from_config(cls) -> 'RetryPolicy':
+        return cls(
+            max_retries=Config.ML_SERVICE_MAX_RETRIES,
+            deadline_s=Config.ML_SERVICE_DEADLINE,
+            backoff_base_s=Config.ML_SERVICE_RETRY_BACKOFF,
+            backoff_max_s=Config.ML_SERVICE_RETRY_BACKOFF_MAX,
+            retry_on_timeout=Config.ML_SERVICE_RETRY_ON_TIMEOUT,
+            budget=get_retry_budget()
+        )
+
+    def start(self) -> Deadline:
+        """Registers a new request and returns its deadline"""
+        self.budget.record_request()
+        with self._lock:
+            self.requests += 1
+        return Deadline(self.deadline_s)
+
+    def retry_reason(self, error: MLServiceError) -> Optional[str]:
+        """Why `error` could be retried ('timeout', 'connection_error', 'http_503'...), or None"""
+        if isinstance(error, MLServiceTimeoutError):
+            return 'timeout' if self.retry_on_timeout else None
+        if isinstance(error, MLServiceConnectionError):
+            return 'connection_error'
+        if isinstance(error, MLServiceHTTPError) and error.status_code in self.retry_statuses:
+            return f'http_{error.status_code}'
+        return None
+
+    def backoff(self, retries: int) -> float:
+        """Full jitter: uniform between 0 and the capped exponential backoff"""
+        return random.uniform(0, min(self.backoff_max_s, self.backoff_base_s * (2 ** retries)))
+
+    def next_delay(self, error: MLServiceError, retries: int, deadline: Deadline) -> Optional[float]:
+        """
+        Delay before retrying after `error`, or None if the request must fail
+        now (not retryable, attempts used up, deadline too close or budget
+        exhausted)
+        """
+        reason = self.retry_reason(error)
+        if reason is None:
+            return None
+
+        if retries >= self.max_retries:
+            return self._stop('max_retries')
+
+        delay = self.backoff(retries)
+        if deadline.remaining() - delay < MIN_ATTEMPT_S:
+            return self._stop('deadline')
+
+        if not self.budget.try_acquire():
+            return self._stop('budget_exhausted')
+
+        with self._lock:
+            self.retries[reason] += 1
+        return delay
+
+    def _stop(self, why: str) -> None:
+        with self._lock:
+            self.stops[why] += 1
+        return None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'retries': sum(self.retries.values()),
+                'retries_by_reason': dict(self.retries),
+                'retries_refused': dict(self.stops),
+                'max_retries': self.max_retries,
+                'deadline_s': self.deadline_s,
+                'retry_on_timeout': self.retry_on_timeout,
+                'budget': self.budget.stats()
+            }
+
+
+# Process-wide budget, shared by every client
+_retry_budget = None
+_retry_budget_lock = threading.Lock()
+
+
+def get_retry_budget() -> RetryBudget:
+    """Returns the process-wide retry budget"""
+    global _retry_budget
+    with _retry_budget_lock:
+        if _retry_budget is None:
+            _retry_budget = RetryBudget(
+                ratio=Config.ML_SERVICE_RETRY_BUDGET,
+                min_retries=Config.ML_SERVICE_RETRY_BUDGET_MIN
+            )
+        return _retry_budget
@@ -0,0 +1,17 @@
+"""
+Async entry point (aiohttp)
+
+Development:
+    python run_async.py
+
+Production (one event loop per worker, hundreds of requests in flight each):
+    gunicorn -w 4 -k aiohttp.GunicornWebWorker -b 0.0.0.0:5000 run_async:app
+"""
+from aiohttp import web
+from app import create_async_app
+from app.config import Config
+
+app = create_async_app()
+
+if __name__ == '__main__':
+    web.run_app(app, host='0.0.0.0', port=Config.PORT)
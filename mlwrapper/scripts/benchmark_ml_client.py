@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Benchmark: sync MLServiceClient vs AsyncMLServiceClient at high concurrency
+
+The sync client is driven by a pool of --workers threads (one per gunicorn
+sync worker, so at most that many predictions in flight); the async client
+keeps up to --concurrency predictions in flight on a single event loop.
+By default both hit fake ML service replicas started in-process that
+answer after --latency-ms (--slow-prob of the requests take --slow-ms);
+use --url to point at real model services instead.
+
+With more than one replica the async client also runs with hedging, to
+compare tail latency and the extra load (upstream calls).
+
+Usage examples:
+  python scripts/benchmark_ml_client.py -n 2000 --latency-ms 50
+  python scripts/benchmark_ml_client.py --replicas 3 --slow-prob 0.05 --slow-ms 500
+  python scripts/benchmark_ml_client.py --url http://ml-1:8000/predict,http://ml-2:8000/predict -c 200
+"""
+import argparse
+import asyncio
+import concurrent.futures
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiohttp import web  # noqa: E402
+
+from app.services.async_ml_client import AsyncMLServiceClient  # noqa: E402
+from app.services.load_balancer import HedgingPolicy  # noqa: E402
+from app.services.ml_client import MLServiceClient  # noqa: E402
+
+FLIGHT = {
+    "flightNumber": "AA1234",
+    "companyName": "AA",
+    "flightOrigin": "JFK",
+    "flightDestination": "LAX",
+    "flightDepartureDate": "2025-12-20T14:30:00",
+    "flightDistance": 3974,
+}
+
+
+# Requests received by the fake replicas (includes hedges and retries)
+upstream_calls = 0
+
+
+def start_fake_service(replicas, latency_s, slow_prob, slow_s):
+    """Fake ML service replicas on a background event loop; returns their /predict URLs"""
+
+    async def predict(request):
+        global upstream_calls
+        upstream_calls += 1
+        await request.read()
+        await asyncio.sleep(slow_s if random.random() < slow_prob else latency_s)
+        return web.json_response({"prediction": 0, "probability": 0.42})
+
+    app = web.Application()
+    app.router.add_post('/predict', predict)
+
+    loop = asyncio.new_event_loop()
+    urls = []
+    for _ in range(replicas):
+        runner = web.AppRunner(app, access_log=None)
+        loop.run_until_complete(runner.setup())
+        loop.run_until_complete(web.TCPSite(runner, '127.0.0.1', 0, backlog=4096).start())
+        urls.append(f"http://127.0.0.1:{runner.addresses[0][1]}/predict")
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return urls
+
+
+def summarize(name, latencies, errors, total_time, in_flight, calls):
+    latencies = sorted(latencies)
+
+    def pct(p):
+        if not latencies:
+            return None
+        return round(latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))] * 1000, 1)
+
+    return {
+        "client": name,
+        "max_in_flight": in_flight,
+        "requests": len(latencies) + errors,
+        "failed": errors,
+        "total_time_s": round(total_time, 3),
+        "throughput_rps": round((len(latencies) + errors) / total_time, 1),
+        "p50_ms": pct(50),
+        "p95_ms": pct(95),
+        "p99_ms": pct(99),
+        "upstream_calls": calls,
+    }
+
+
+def run_sync(urls, total, workers):
+    client = MLServiceClient(urls=urls)
+    latencies, errors = [], 0
+    calls_before = upstream_calls
+
+    def one():
+        start = time.perf_counter()
+        client.predict(FLIGHT)
+        return time.perf_counter() - start
+
+    start_all = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as ex:
+        for fut in concurrent.futures.as_completed([ex.submit(one) for _ in range(total)]):
+            try:
+                latencies.append(fut.result())
+            except Exception:
+                errors += 1
+    return summarize("sync (requests)", latencies, errors, time.perf_counter() - start_all, workers,
+                     upstream_calls - calls_before)
+
+
+async def run_async(urls, total, concurrency, hedge=False):
+    client = AsyncMLServiceClient(pool_size=concurrency, urls=urls, hedging=HedgingPolicy(enabled=hedge))
+    calls_before = upstream_calls
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            await client.predict_async(FLIGHT)
+            return time.perf_counter() - start
+
+    start_all = time.perf_counter()
+    results = await asyncio.gather(*(one() for _ in range(total)), return_exceptions=True)
+    total_time = time.perf_counter() - start_all
+    await client.close()
+
+    latencies = [r for r in results if not isinstance(r, BaseException)]
+    summary = summarize("async (aiohttp)" + (" + hedging" if hedge else ""), latencies,
+                        len(results) - len(latencies), total_time, concurrency, upstream_calls - calls_before)
+    if hedge:
+        summary["hedging"] = client.hedging.stats()
+    return summary
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Benchmark sync vs async ML service clients")
+    p.add_argument("--url", help="Real ML service /predict URL(s), comma-separated (default: in-process fake replicas)")
+    p.add_argument("-n", "--requests", type=int, default=2000, help="Requests per client")
+    p.add_argument("-w", "--workers", type=int, default=4, help="Sync client threads (gunicorn sync workers)")
+    p.add_argument("-c", "--concurrency", type=int, default=200, help="Async client in-flight requests")
+    p.add_argument("--latency-ms", type=float, default=50.0, help="Fake service response time")
+    p.add_argument("--replicas", type=int, default=1, help="Fake service replicas")
+    p.add_argument("--slow-prob", type=float, default=0.0, help="Fraction of fake responses that are slow")
+    p.add_argument("--slow-ms", type=float, default=500.0, help="Slow fake response time")
+    p.add_argument("--output", help="Write summaries to JSON file")
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    # The clients log every request at INFO
+    logging.basicConfig(level=getattr(logging, os.getenv("LOG_LEVEL", "WARNING")))
+
+    if args.url:
+        urls = [u.strip() for u in args.url.split(',') if u.strip()]
+    else:
+        urls = start_fake_service(args.replicas, args.latency_ms / 1000.0, args.slow_prob, args.slow_ms / 1000.0)
+    print(f"ML service: {', '.join(urls)}")
+
+    summaries = [
+        run_sync(urls, args.requests, args.workers),
+        asyncio.run(run_async(urls, args.requests, args.concurrency)),
+    ]
+    if len(urls) > 1:
+        summaries.append(asyncio.run(run_async(urls, args.requests, args.concurrency, hedge=True)))
+
+    print("--- Benchmark summary ---")
+    print(json.dumps(summaries, indent=2))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(summaries, f, indent=2)
+        print(f"Results written to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+import pytest
+from app.routes import prediction_routes
+from app.services.prediction_cache import PredictionCache
+
+
+@pytest.fixture(autouse=True)
+def prediction_cache():
+    """Fresh prediction cache per test, so cached answers don't leak between tests"""
+    cache = PredictionCache(max_entries=100, ttl_s=60.0)
+    prediction_routes.set_cache(cache)
+    yield cache
+    prediction_routes.set_cache(None)
@@ -0,0 +1,384 @@
+"""
+Tests for the asyncio ML Service Client and the async routes
+
+Runs a real aiohttp server standing in for the ML service, so the client's
+connection handling and error mapping are exercised end to end.
+"""
+
+import asyncio
+import threading
+import warnings
+import pytest
+from aiohttp import web
+from aiohttp.web_exceptions import NotAppKeyWarning
+from aiohttp.test_utils import TestClient, TestServer
+from unittest.mock import AsyncMock, MagicMock
+from app import create_async_app
+from app.config import Config
+from app.routes import async_prediction_routes
+from app.services.async_ml_client import AsyncMLServiceClient
+from app.services.load_balancer import HedgingPolicy
+from app.services.retry_policy import RetryBudget, RetryPolicy
+from app.exceptions import (
+    MLServiceCircuitOpenError,
+    MLServiceTimeoutError,
+    MLServiceConnectionError,
+    MLServiceHTTPError
+)
+
+FLIGHT = {
+    "flightNumber": "AA1234",
+    "companyName": "AA",
+    "flightOrigin": "JFK",
+    "flightDestination": "LAX",
+    "flightDepartureDate": "2025-12-20T14:30:00",
+    "flightDistance": 3974
+}
+
+
+def fake_ml_service(delay=0.0, status=200, received=None, failures=None):
+    """
+    aiohttp app standing in for the external ML service
+
+    `failures`: the first len(failures) calls answer with these statuses
+    """
+    failures = list(failures or [])
+
+    async def predict(request):
+        payload = await request.json()
+        if received is not None:
+            received.append(payload)
+        await asyncio.sleep(delay)
+        if failures:
+            return web.json_response({"error": "busy"}, status=failures.pop(0))
+        if status != 200:
+            return web.json_response({"error": "boom"}, status=status)
+        return web.json_response({"prediction": 1, "probability": 0.92})
+
+    async def health(request):
+        return web.json_response({"status": "UP"})
+
+    app = web.Application()
+    app.router.add_post('/predict', predict)
+    app.router.add_get('/health', health)
+    return app
+
+
+async def call_predict(ml_app, flight_data=FLIGHT, timeout=None):
+    """Starts ml_app and calls predict_async() against it"""
+    async with TestServer(ml_app) as server:
+        client = make_client(str(server.make_url('/predict')), timeout)
+        try:
+            return await client.predict_async(flight_data)
+        finally:
+            await client.close()
+
+
+def make_client(url, timeout=None):
+    original = (Config.ML_SERVICE_URL, Config.ML_SERVICE_TIMEOUT)
+    Config.ML_SERVICE_URL = url
+    Config.ML_SERVICE_TIMEOUT = timeout or original[1]
+    try:
+        # Own retry budget: the process-wide one is shared with other tests
+        return AsyncMLServiceClient(
+            pool_size=10,
+            retry_policy=RetryPolicy(backoff_base_s=0.01, budget=RetryBudget()))
+    finally:
+        Config.ML_SERVICE_URL, Config.ML_SERVICE_TIMEOUT = original
+
+
+class TestAsyncMLServiceClient:
+    """Tests for AsyncMLServiceClient"""
+
+    def test_predict_success(self):
+        """Test successful prediction and payload mapping"""
+
+        received = []
+        result = asyncio.run(call_predict(fake_ml_service(received=received)))
+
+        assert result == {"prediction": 1, "probability": 0.92}
+        assert received[0]['origem'] == 'JFK'
+        assert received[0]['companhia'] == 'AA'
+        assert received[0]['data_partida'] == '2025-12-20T14:30:00'
+
+    def test_predict_http_error(self):
+        """Test HTTP error from ML service keeps its status code"""
+
+        with pytest.raises(MLServiceHTTPError) as exc_info:
+            asyncio.run(call_predict(fake_ml_service(status=500)))
+
+        assert exc_info.value.status_code == 500
+
+    def test_predict_retries_retryable_status(self):
+        """Test that 503/502 are retried under the retry policy"""
+
+        received = []
+        result = asyncio.run(call_predict(
+            fake_ml_service(received=received, failures=[503, 502])))
+
+        assert result['prediction'] == 1
+        assert len(received) == 3
+
+    def test_predict_timeout(self):
+        """Test prediction timeout"""
+
+        with pytest.raises(MLServiceTimeoutError):
+            asyncio.run(call_predict(fake_ml_service(delay=2), timeout=0.2))
+
+    def test_predict_connection_error(self):
+        """Test connection error (nothing listening)"""
+
+        async def scenario():
+            client = make_client('http://127.0.0.1:9/predict')
+            try:
+                await client.predict_async(FLIGHT)
+            finally:
+                await client.close()
+
+        with pytest.raises(MLServiceConnectionError):
+            asyncio.run(scenario())
+
+    def test_concurrent_requests_share_the_pool(self):
+        """Many in-flight predictions complete in about one service latency"""
+
+        async def scenario():
+            async with TestServer(fake_ml_service(delay=0.2)) as server:
+                client = make_client(str(server.make_url('/predict')))
+                try:
+                    start = asyncio.get_running_loop().time()
+                    results = await asyncio.gather(
+                        *(client.predict_async(FLIGHT) for _ in range(50)))
+                    return results, asyncio.get_running_loop().time() - start
+                finally:
+                    await client.close()
+
+        results, elapsed = asyncio.run(scenario())
+
+        assert len(results) == 50
+        assert elapsed < 2.0
+
+    def test_hedge_on_slow_replica(self):
+        """A slow primary is hedged on the other replica and then cancelled"""
+
+        async def scenario():
+            async with TestServer(fake_ml_service(delay=5)) as slow, \
+                    TestServer(fake_ml_service()) as fast:
+                client = AsyncMLServiceClient(
+                    urls=[str(slow.make_url('/predict')), str(fast.make_url('/predict'))],
+                    hedging=HedgingPolicy(enabled=True, min_samples=0, min_delay_s=0.05,
+                                          budget_ratio=1.0))
+                slow_endpoint, fast_endpoint = client.balancer.endpoints
+                # Keeps the fast replica "busy" so the primary goes to the slow one
+                fast_endpoint.outstanding = 1
+                try:
+                    start = asyncio.get_running_loop().time()
+                    result = await client.predict_async(FLIGHT)
+                    elapsed = asyncio.get_running_loop().time() - start
+                    return result, elapsed, client.metrics(), slow_endpoint
+                finally:
+                    await client.close()
+
+        result, elapsed, metrics, slow_endpoint = asyncio.run(scenario())
+
+        assert result['prediction'] == 1
+        assert elapsed < 1.0
+        assert metrics['hedging']['hedges'] == 1
+        assert metrics['hedging']['hedge_wins'] == 1
+        assert metrics['hedging']['cancelled'] == 1
+        assert slow_endpoint.outstanding == 0
+        assert slow_endpoint.errors == 0
+
+    def test_health_check_multiple_replicas(self):
+        """UP while at least one replica answers"""
+
+        async def scenario():
+            async with TestServer(fake_ml_service()) as server:
+                client = AsyncMLServiceClient(
+                    urls=[str(server.make_url('/predict')), 'http://127.0.0.1:9/predict'])
+                try:
+                    return await client.health_check_async()
+                finally:
+                    await client.close()
+
+        result = asyncio.run(scenario())
+
+        assert result['status'] == 'UP'
+        assert result['ml_service'] == '1/2 replicas UP'
+        assert len(result['replicas']) == 2
+
+    def test_sync_interface(self):
+        """predict()/health_check() work from sync code (IMLServiceClient)"""
+
+        async def start():
+            runner = web.AppRunner(fake_ml_service())
+            await runner.setup()
+            site = web.TCPSite(runner, '127.0.0.1', 0)
+            await site.start()
+            return runner, runner.addresses[0][1]
+
+        loop = asyncio.new_event_loop()
+        runner, port = loop.run_until_complete(start())
+        try:
+            threading.Thread(target=loop.run_forever, daemon=True).start()
+            client = make_client(f'http://127.0.0.1:{port}/predict')
+
+            assert client.predict(FLIGHT)['prediction'] == 1
+            assert client.health_check() == {
+                "status": "UP",
+                "ml_service": "OK",
+                "circuit_breakers": {f'http://127.0.0.1:{port}/predict': 'CLOSED'}
+            }
+        finally:
+            asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+
+    def test_health_check_failure(self):
+        """Test health check when ML service is down"""
+
+        async def scenario():
+            client = make_client('http://127.0.0.1:9/predict')
+            try:
+                return await client.health_check_async()
+            finally:
+                await client.close()
+
+        result = asyncio.run(scenario())
+
+        assert result['status'] == 'DOWN'
+        assert 'ml_service' in result
+
+
+class TestAsyncRoutes:
+    """Tests for the aiohttp /predict and /health handlers"""
+
+    @pytest.fixture
+    def ml_client(self):
+        mock_ml_client = MagicMock()
+        mock_ml_client.predict_async = AsyncMock(
+            return_value={"prediction": 1, "probability": 0.85})
+        mock_ml_client.health_check_async = AsyncMock(
+            return_value={"status": "UP", "ml_service": "OK"})
+        async_prediction_routes.set_client(mock_ml_client)
+        yield mock_ml_client
+        async_prediction_routes.set_client(None)
+
+    @staticmethod
+    def request(method, path, **kwargs):
+        async def scenario():
+            async with TestClient(TestServer(create_async_app())) as client:
+                response = await client.request(method, path, **kwargs)
+                return response.status, await response.json(), response.headers
+
+        return asyncio.run(scenario())
+
+    def test_predict_success(self, ml_client):
+        """Test successful prediction"""
+
+        status, data, headers = self.request('POST', '/predict', json=FLIGHT)
+
+        assert status == 200
+        assert data == {"prediction": 1, "confidence": 0.85}
+        assert 'X-Correlation-ID' in headers
+
+    def test_correlation_id_is_echoed(self, ml_client):
+        """Test that a client-supplied correlation ID comes back without key warnings"""
+
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', NotAppKeyWarning)
+            status, _, headers = self.request('POST', '/predict', json=FLIGHT,
+                                              headers={'X-Correlation-ID': 'abc-123'})
+
+        assert status == 200
+        assert headers['X-Correlation-ID'] == 'abc-123'
+
+    def test_predict_uppercase_conversion(self, ml_client):
+        """Test that codes are converted to uppercase"""
+
+        status, _, _ = self.request('POST', '/predict', json={
+            **FLIGHT, "companyName": "aa", "flightOrigin": "jfk"})
+
+        assert status == 200
+        called_data = ml_client.predict_async.call_args[0][0]
+        assert called_data['companyName'] == 'AA'
+        assert called_data['flightOrigin'] == 'JFK'
+
+    def test_predict_empty_body(self, ml_client):
+        """Test prediction with empty request body"""
+
+        status, data, _ = self.request(
+            'POST', '/predict', data='', headers={'Content-Type': 'application/json'})
+
+        assert status == 400
+        assert 'error' in data
+
+    def test_predict_invalid_data(self, ml_client):
+        """Test prediction with invalid data"""
+
+        status, data, _ = self.request('POST', '/predict', json={**FLIGHT, "flightDistance": -100})
+
+        assert status == 400
+        assert data['error'] == 'Invalid data'
+
+    def test_predict_ml_service_error(self, ml_client):
+        """Test prediction when ML service fails"""
+
+        ml_client.predict_async.side_effect = MLServiceConnectionError()
+
+        status, data, _ = self.request('POST', '/predict', json=FLIGHT)
+
+        assert status == 500
+        assert 'error' in data
+
+    def test_predict_circuit_open(self, ml_client):
+        """Test that an open circuit answers 503 with Retry-After"""
+
+        ml_client.predict_async.side_effect = MLServiceCircuitOpenError(retry_after=0.2)
+
+        status, data, headers = self.request('POST', '/predict', json=FLIGHT)
+
+        assert status == 503
+        assert headers['Retry-After'] == '1'
+        assert data['error'] == 'ML service unavailable'
+
+    def test_predict_cached(self, ml_client, monkeypatch):
+        """Test that a repeated request is answered from the prediction cache"""
+
+        monkeypatch.setattr(Config, 'ADMIN_TOKEN', 'secret')
+
+        async def scenario():
+            async with TestClient(TestServer(create_async_app())) as client:
+                statuses = []
+                for _ in range(2):
+                    response = await client.post('/predict', json=FLIGHT)
+                    statuses.append(response.headers['X-Cache'])
+                refused = (await client.delete('/cache')).status
+                invalidated = await (await client.delete(
+                    '/cache', headers={'X-Admin-Token': 'secret'})).json()
+                return statuses, refused, invalidated
+
+        statuses, refused, invalidated = asyncio.run(scenario())
+
+        assert statuses == ['MISS', 'HIT']
+        assert ml_client.predict_async.await_count == 1
+        assert refused == 403
+        assert invalidated == {"invalidated": 1}
+
+    def test_metrics(self, ml_client):
+        """Test that ML client metrics are exported"""
+
+        ml_client.metrics.return_value = {"retries": {"retries": 0}}
+
+        status, data, _ = self.request('GET', '/metrics')
+
+        assert status == 200
+        assert data['ml_client'] == {"retries": {"retries": 0}}
+
+    def test_health(self, ml_client):
+        """Test health check"""
+
+        status, data, headers = self.request(
+            'GET', '/health', headers={'X-Correlation-ID': 'abc-123'})
+
+        assert status == 200
+        assert data['status'] == 'HEALTHY'
+        assert headers['X-Correlation-ID'] == 'abc-123'
@@ -0,0 +1,141 @@
+"""
+Tests for the per-replica circuit breaker
+"""
+
+import time
+import pytest
+from app.services.circuit_breaker import CircuitBreaker, is_replica_failure
+
+
+class TestCircuitBreaker:
+    """Tests for CircuitBreaker"""
+
+    @pytest.fixture
+    def breaker(self):
+        return CircuitBreaker('http://a/predict', failure_threshold=3,
+                              open_seconds=0.05, half_open_probes=1)
+
+    def call(self, breaker, success, duration=0.0):
+        admission = breaker.allow()
+        assert admission
+        breaker.record(admission, success, duration)
+
+    def trip(self, breaker):
+        for _ in range(breaker.failure_threshold):
+            self.call(breaker, False)
+
+    def test_opens_after_consecutive_failures(self, breaker):
+        """Test that failure_threshold consecutive failures open the circuit"""
+
+        self.call(breaker, False)
+        self.call(breaker, False)
+        assert breaker.state == 'CLOSED'
+
+        self.call(breaker, False)
+        assert breaker.state == 'OPEN'
+        assert not breaker.allow()
+        assert breaker.retry_after() > 0
+
+    def test_success_resets_failures(self, breaker):
+        """Test that only consecutive failures count"""
+
+        for _ in range(5):
+            self.call(breaker, False)
+            self.call(breaker, False)
+            self.call(breaker, True)
+
+        assert breaker.state == 'CLOSED'
+
+    def test_slow_calls_count_as_failures(self):
+        """Test the latency threshold"""
+
+        breaker = CircuitBreaker('x', failure_threshold=2, slow_call_threshold_s=0.5)
+        self.call(breaker, True, duration=0.1)
+        self.call(breaker, True, duration=0.9)
+        self.call(breaker, True, duration=1.2)
+
+        assert breaker.state == 'OPEN'
+        assert breaker.transitions[-1]['reason'] == '2 consecutive failures (slow)'
+
+    def test_half_open_limits_probes(self, breaker):
+        """Test that only half_open_probes calls pass after open_seconds"""
+
+        self.trip(breaker)
+        time.sleep(0.06)
+
+        assert breaker.state == 'HALF_OPEN'
+        assert breaker.allow()
+        assert not breaker.available()
+        assert not breaker.allow()
+
+    def test_probe_success_closes(self, breaker):
+        """Test HALF_OPEN -> CLOSED"""
+
+        self.trip(breaker)
+        time.sleep(0.06)
+        self.call(breaker, True)
+
+        assert breaker.state == 'CLOSED'
+        assert [t['to'] for t in breaker.transitions] == ['OPEN', 'HALF_OPEN', 'CLOSED']
+
+    def test_probe_failure_reopens(self, breaker):
+        """Test HALF_OPEN -> OPEN"""
+
+        self.trip(breaker)
+        time.sleep(0.06)
+        self.call(breaker, False)
+
+        assert breaker.state == 'OPEN'
+        assert breaker.stats()['times_opened'] == 2
+
+    def test_cancelled_probe_frees_slot(self, breaker):
+        """Test that record(None) releases the probe without deciding"""
+
+        self.trip(breaker)
+        time.sleep(0.06)
+        self.call(breaker, None)
+
+        assert breaker.state == 'HALF_OPEN'
+        assert breaker.allow()
+
+    def test_stale_success_does_not_close(self, breaker):
+        """Test that a call admitted before the circuit opened can't close it"""
+
+        early = breaker.allow()
+        self.trip(breaker)
+        time.sleep(0.06)
+        probe = breaker.allow()
+        assert probe.probe
+
+        breaker.record(early, True)
+        assert breaker.state == 'HALF_OPEN'
+        assert not breaker.available()
+        assert breaker.stats()['stale_results'] == 1
+
+        breaker.record(probe, False)
+        assert breaker.state == 'OPEN'
+
+    def test_stale_failure_is_ignored(self):
+        """Test that a probe that lost its circuit to a transition doesn't reopen it"""
+
+        breaker = CircuitBreaker('x', failure_threshold=1, open_seconds=0.05, half_open_probes=2)
+        self.call(breaker, False)
+        time.sleep(0.06)
+        first, second = breaker.allow(), breaker.allow()
+        breaker.record(first, False)
+        time.sleep(0.06)
+        self.call(breaker, True)
+        self.call(breaker, True)
+        assert breaker.state == 'CLOSED'
+
+        breaker.record(second, False)
+        assert breaker.state == 'CLOSED'
+        assert breaker.stats()['consecutive_failures'] == 0
+
+    def test_replica_failure_statuses(self):
+        """Test which HTTP statuses count against the replica"""
+
+        assert is_replica_failure(503)
+        assert is_replica_failure(429)
+        assert not is_replica_failure(400)
+        assert not is_replica_failure(422)
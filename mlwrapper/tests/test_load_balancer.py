@@ -0,0 +1,166 @@
+"""
+Tests for replica load balancing and hedging policy
+"""
+
+import pytest
+from app.exceptions import MLServiceCircuitOpenError
+from app.services.circuit_breaker import CircuitBreaker
+from app.services.load_balancer import (
+    HedgingPolicy,
+    LatencyTracker,
+    LeastOutstandingBalancer
+)
+
+
+class TestLeastOutstandingBalancer:
+    """Tests for LeastOutstandingBalancer"""
+
+    @pytest.fixture
+    def balancer(self):
+        return LeastOutstandingBalancer(['http://a/predict', 'http://b/predict', 'http://c/predict'])
+
+    def test_picks_replica_with_fewest_in_flight(self, balancer):
+        """Test that in-flight requests spread over all replicas"""
+
+        chosen = [balancer.acquire()[0] for _ in range(3)]
+
+        assert {e.url for e in chosen} == {'http://a/predict', 'http://b/predict', 'http://c/predict'}
+
+    def test_release_frees_the_replica(self, balancer):
+        """Test that a finished request makes its replica preferred again"""
+
+        first, second, third = (balancer.acquire() for _ in range(3))
+        balancer.release(*second)
+
+        assert balancer.acquire()[0] is second[0]
+
+    def test_exclude(self, balancer):
+        """Test that a hedge avoids the primary's replica"""
+
+        primary, _ = balancer.acquire()
+        for _ in range(20):
+            other, admission = balancer.acquire(exclude=[primary])
+            assert other is not primary
+            balancer.release(other, admission)
+
+    def test_exclude_single_replica(self):
+        """Test that exclude falls back to the only replica"""
+
+        balancer = LeastOutstandingBalancer(['http://a/predict'])
+        primary, _ = balancer.acquire()
+
+        assert balancer.acquire(exclude=[primary])[0] is primary
+
+    def test_stats(self, balancer):
+        """Test per-replica counters"""
+
+        endpoint, admission = balancer.acquire()
+        balancer.release(endpoint, admission, success=False)
+
+        stats = {e['url']: e for e in balancer.stats()['endpoints']}
+        breaker = stats[endpoint.url].pop('circuit_breaker')
+        assert stats[endpoint.url] == {
+            'url': endpoint.url, 'outstanding': 0, 'requests': 1, 'errors': 1}
+        assert breaker['state'] == 'CLOSED'
+        assert breaker['consecutive_failures'] == 1
+
+    def test_skips_open_circuit(self):
+        """Test that a replica whose circuit is open gets no traffic"""
+
+        balancer = LeastOutstandingBalancer(
+            ['http://a/predict', 'http://b/predict'],
+            breaker_factory=lambda url: CircuitBreaker(url, failure_threshold=1))
+        broken = balancer.endpoints[0]
+        balancer.release(*balancer.acquire(exclude=[balancer.endpoints[1]]), success=False)
+
+        assert broken.breaker.state == 'OPEN'
+        assert all(balancer.acquire()[0] is not broken for _ in range(10))
+
+    def test_all_circuits_open_fails_fast(self):
+        """Test that MLServiceCircuitOpenError is raised when no replica admits the call"""
+
+        balancer = LeastOutstandingBalancer(
+            ['http://a/predict'],
+            breaker_factory=lambda url: CircuitBreaker(url, failure_threshold=1, open_seconds=30))
+        balancer.release(*balancer.acquire(), success=False)
+
+        with pytest.raises(MLServiceCircuitOpenError) as exc_info:
+            balancer.acquire()
+
+        assert exc_info.value.status_code == 503
+        assert 0 < exc_info.value.retry_after <= 30
+        assert balancer.stats()['fast_failures'] == 1
+        assert balancer.breaker_states() == {'http://a/predict': 'OPEN'}
+
+    def test_cancelled_call_is_not_an_error(self, balancer):
+        """Test that success=None (hedge loser) counts neither as error nor as failure"""
+
+        endpoint, admission = balancer.acquire()
+        balancer.release(endpoint, admission, success=None)
+
+        assert endpoint.errors == 0
+        assert endpoint.breaker.stats()['consecutive_failures'] == 0
+
+    def test_requires_a_url(self):
+        """Test that an empty replica list is rejected"""
+
+        with pytest.raises(ValueError):
+            LeastOutstandingBalancer([])
+
+
+class TestHedgingPolicy:
+    """Tests for HedgingPolicy and LatencyTracker"""
+
+    def test_percentile(self):
+        """Test latency percentile over the window"""
+
+        tracker = LatencyTracker(window=100, refresh_every=1)
+        for i in range(100):
+            tracker.record(i / 1000)
+
+        assert tracker.percentile(95) == pytest.approx(0.095)
+        assert tracker.percentile(50) == pytest.approx(0.050)
+
+    def test_no_hedge_when_disabled_or_without_samples(self):
+        """Test that no hedge is planned before there is latency data"""
+
+        assert HedgingPolicy(enabled=False).delay() is None
+        assert HedgingPolicy(enabled=True, min_samples=20).delay() is None
+
+    def test_delay_follows_observed_percentile(self):
+        """Test adaptive hedge delay (never below min_delay_s)"""
+
+        policy = HedgingPolicy(enabled=True, min_samples=10, min_delay_s=0.01,
+                               latencies=LatencyTracker(refresh_every=1))
+        for i in range(100):
+            policy.latencies.record(0.1 if i < 95 else 1.0)
+
+        assert policy.delay() == pytest.approx(1.0)
+
+    def test_hedge_budget(self):
+        """Test hedges capped at budget_ratio of requests"""
+
+        policy = HedgingPolicy(enabled=True, budget_ratio=0.1, min_samples=0)
+        for _ in range(50):
+            policy.delay()
+
+        granted = sum(policy.try_hedge() for _ in range(20))
+
+        assert granted == 5
+        assert policy.stats()['budget_exhausted'] == 15
+
+    def test_stats(self):
+        """Test hedge rate and win/loss split"""
+
+        policy = HedgingPolicy(enabled=True, min_samples=0)
+        for _ in range(10):
+            policy.delay()
+        policy.try_hedge()
+        policy.record_winner(hedge_won=True, cancelled=1)
+
+        stats = policy.stats()
+        assert stats['hedges'] == 1
+        assert stats['hedge_rate'] == 0.1
+        assert stats['hedge_wins'] == 1
+        assert stats['primary_wins'] == 0
+        assert stats['cancelled'] == 1
@@ -11,7 +11,9 @@ Tests the HTTP client layer including:
 import pytest
 from unittest.mock import Mock, patch
 from app.services.ml_client import MLServiceClient
+from app.services.retry_policy import RetryBudget, RetryPolicy
 from app.exceptions import (
+    MLServiceCircuitOpenError,
     MLServiceTimeoutError,
     MLServiceConnectionError,
     MLServiceHTTPError
@@ -103,8 +105,123 @@ class TestMLServiceClient:
             assert 'ml_service' in result
 
     def test_retry_configuration(self, ml_client):
-        """Test that retry strategy is configured"""
+        """Test that retries come from the RetryPolicy, not from urllib3"""
 
         assert ml_client.session is not None
         adapter = ml_client.session.get_adapter('http://')
-        assert adapter.max_retries.total == 3
+        assert adapter.max_retries.total == 0
+        assert ml_client.retry_policy.max_retries == 3
+        assert ml_client.retry_policy.retry_on_timeout is False
+
+    def test_retries_retryable_status_then_succeeds(self):
+        """Test that a 503 is retried and the next attempt's answer returned"""
+
+        ml_client = MLServiceClient(retry_policy=RetryPolicy(backoff_base_s=0.001))
+        unavailable = Mock(status_code=503, content=b'')
+        unavailable.raise_for_status.side_effect = requests.exceptions.HTTPError(
+            response=unavailable)
+        success = Mock(status_code=200)
+        success.json.return_value = {"prediction": 0, "probability": 0.3}
+
+        with patch.object(ml_client.session, 'post', side_effect=[unavailable, success]) as post:
+            result = ml_client.predict({"flightNumber": "AA1234"})
+
+        assert result['prediction'] == 0
+        assert post.call_count == 2
+        assert ml_client.metrics()['retries']['retries_by_reason'] == {'http_503': 1}
+
+    def test_timeout_is_not_retried(self, ml_client):
+        """Test that timeouts are not retried by default"""
+
+        with patch.object(ml_client.session, 'post', side_effect=requests.exceptions.Timeout) as post:
+            with pytest.raises(MLServiceTimeoutError):
+                ml_client.predict({"flightNumber": "AA1234"})
+
+        assert post.call_count == 1
+
+    def test_attempt_timeout_capped_by_deadline(self):
+        """Test that each attempt only gets the time left in the deadline"""
+
+        ml_client = MLServiceClient(retry_policy=RetryPolicy(deadline_s=2.0))
+        success = Mock(status_code=200)
+        success.json.return_value = {"prediction": 1, "probability": 0.9}
+
+        with patch.object(ml_client.session, 'post', return_value=success) as post:
+            ml_client.predict({"flightNumber": "AA1234"})
+
+        assert post.call_args.kwargs['timeout'] <= 2.0
+
+    def test_retry_budget_exhausted(self):
+        """Test that retries stop when the process-wide budget is used up"""
+
+        budget = RetryBudget(ratio=0.0, min_retries=1)
+        ml_client = MLServiceClient(
+            retry_policy=RetryPolicy(backoff_base_s=0.001, budget=budget))
+
+        with patch.object(
+            ml_client.session, 'post',
+            side_effect=requests.exceptions.ConnectionError
+        ) as post:
+            with pytest.raises(MLServiceConnectionError):
+                ml_client.predict({"flightNumber": "AA1234"})
+
+        assert post.call_count == 2
+        stats = ml_client.metrics()['retries']
+        assert stats['retries_refused'] == {'budget_exhausted': 1}
+        assert stats['budget']['exhausted'] == 1
+
+    def test_replicas_least_outstanding(self):
+        """Test that each attempt goes to a replica and is released after it"""
+
+        ml_client = MLServiceClient(urls=['http://ml-1/predict', 'http://ml-2/predict'])
+        success = Mock(status_code=200)
+        success.json.return_value = {"prediction": 1, "probability": 0.9}
+
+        with patch.object(ml_client.session, 'post', return_value=success) as post:
+            ml_client.predict({"flightNumber": "AA1234"})
+
+        assert post.call_args.args[0] in ('http://ml-1/predict', 'http://ml-2/predict')
+        endpoints = ml_client.metrics()['load_balancer']['endpoints']
+        assert sum(e['requests'] for e in endpoints) == 1
+        assert all(e['outstanding'] == 0 for e in endpoints)
+
+    def test_circuit_opens_and_fails_fast(self):
+        """Test that consecutive failures open the circuit and later calls skip the network"""
+
+        ml_client = MLServiceClient(retry_policy=RetryPolicy(max_retries=0))
+
+        with patch.object(
+            ml_client.session, 'post',
+            side_effect=requests.exceptions.ConnectionError
+        ) as post:
+            for _ in range(5):
+                with pytest.raises(MLServiceConnectionError):
+                    ml_client.predict({"flightNumber": "AA1234"})
+            with pytest.raises(MLServiceCircuitOpenError) as exc_info:
+                ml_client.predict({"flightNumber": "AA1234"})
+
+        assert post.call_count == 5
+        assert exc_info.value.status_code == 503
+        breaker = ml_client.metrics()['load_balancer']['endpoints'][0]['circuit_breaker']
+        assert breaker['state'] == 'OPEN'
+        assert breaker['transitions'][-1]['to'] == 'OPEN'
+
+    def test_client_errors_do_not_open_circuit(self):
+        """Test that 4xx (bad request) does not count against the replica"""
+
+        ml_client = MLServiceClient(retry_policy=RetryPolicy(max_retries=0))
+        bad_request = Mock(status_code=400, content=b'{"error": "bad"}')
+        bad_request.json.return_value = {"error": "bad"}
+        http_error = requests.exceptions.HTTPError()
+        http_error.response = bad_request
+
+        with patch.object(ml_client.session, 'post', side_effect=http_error):
+            for _ in range(10):
+                with pytest.raises(MLServiceHTTPError):
+                    ml_client.predict({"flightNumber": "AA1234"})
+
+        with patch('app.services.ml_client.requests.get') as get:
+            health = ml_client.health_check()
+
+        get.assert_called_once()
+        assert health['circuit_breakers'] == {ml_client.ml_service_url: 'CLOSED'}
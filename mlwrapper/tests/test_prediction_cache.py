@@ -0,0 +1,102 @@
+"""
+Tests for the prediction response cache (keys, LRU, TTL, invalidation)
+"""
+
+import time
+from app.services.prediction_cache import PredictionCache, bypass_requested
+
+FLIGHT = {
+    "flightNumber": "AA1234",
+    "companyName": "AA",
+    "flightOrigin": "JFK",
+    "flightDestination": "LAX",
+    "flightDepartureDate": "2025-12-20T14:37:12",
+    "flightDistance": 3974
+}
+
+
+class TestPredictionCache:
+    """Tests for PredictionCache"""
+
+    def test_key_uses_model_inputs_only(self):
+        """Test that flight number, company and distance don't split the key"""
+
+        cache = PredictionCache()
+
+        assert cache.key_for(FLIGHT) == ('JFK', 'LAX', '2025-12-20T14:37:00')
+        assert cache.key_for({**FLIGHT, "flightNumber": "G31000", "companyName": "G3",
+                              "flightDistance": 10}) == cache.key_for(FLIGHT)
+
+    def test_key_bucketed_departure(self):
+        """Test that departures are rounded down to bucket_minutes"""
+
+        cache = PredictionCache(bucket_minutes=15)
+
+        assert cache.key_for(FLIGHT)[2] == '2025-12-20T14:30:00'
+        assert cache.key_for({**FLIGHT, "flightDepartureDate": "2025-12-20T14:45:00"})[2] == '2025-12-20T14:45:00'
+
+    def test_unparseable_date_is_not_cached(self):
+        """Test that a departure the cache can't read gives no key"""
+
+        assert PredictionCache().key_for({**FLIGHT, "flightDepartureDate": "amanhã"}) is None
+
+    def test_lru_eviction(self):
+        """Test size limit: the least recently used entry goes first"""
+
+        cache = PredictionCache(max_entries=2)
+        cache.put('a', {"prediction": 0})
+        cache.put('b', {"prediction": 1})
+        cache.get('a')
+        cache.put('c', {"prediction": 1})
+
+        assert cache.get('b') is None
+        assert cache.get('a') == {"prediction": 0}
+        assert cache.stats()['evictions'] == 1
+
+    def test_ttl(self):
+        """Test that entries expire after ttl_s"""
+
+        cache = PredictionCache(ttl_s=0.05)
+        cache.put('a', {"prediction": 0})
+        time.sleep(0.06)
+
+        assert cache.get('a') is None
+        assert cache.stats()['expirations'] == 1
+
+    def test_stats(self):
+        """Test hit/miss counters"""
+
+        cache = PredictionCache()
+        key = cache.key_for(FLIGHT)
+        cache.get(key)
+        cache.put(key, {"prediction": 1})
+        cache.get(key)
+
+        stats = cache.stats()
+        assert (stats['hits'], stats['misses'], stats['size']) == (1, 1, 1)
+        assert stats['hit_rate'] == 0.5
+
+    def test_invalidate(self):
+        """Test invalidation by origin and of everything"""
+
+        cache = PredictionCache()
+        for destination in ('LAX', 'SFO'):
+            cache.put(cache.key_for({**FLIGHT, "flightDestination": destination}), {})
+        cache.put(cache.key_for({**FLIGHT, "flightOrigin": "GRU"}), {})
+
+        assert cache.invalidate(origin='jfk') == 2
+        assert cache.invalidate() == 1
+        assert len(cache) == 0
+
+    def test_disabled(self):
+        """Test that size 0 turns the cache off"""
+
+        assert not PredictionCache(max_entries=0).enabled
+
+    def test_bypass_requested(self):
+        """Test Cache-Control directives that skip the lookup"""
+
+        assert bypass_requested('no-cache')
+        assert bypass_requested('max-age=0, private')
+        assert not bypass_requested('max-age=60')
+        assert not bypass_requested(None)
@@ -0,0 +1,111 @@
+"""
+Tests for the retry policy (deadline, jittered backoff, retry budget)
+"""
+
+import time
+import pytest
+from app.services.retry_policy import Deadline, RetryBudget, RetryPolicy
+from app.exceptions import (
+    MLServiceConnectionError,
+    MLServiceHTTPError,
+    MLServiceTimeoutError
+)
+
+
+class TestRetryPolicy:
+    """Tests for RetryPolicy"""
+
+    @pytest.fixture
+    def policy(self):
+        return RetryPolicy(max_retries=3, deadline_s=10.0, backoff_base_s=0.1,
+                           backoff_max_s=1.0, budget=RetryBudget(min_retries=100))
+
+    def test_retry_reasons(self, policy):
+        """Test which errors are retryable"""
+
+        assert policy.retry_reason(MLServiceConnectionError()) == 'connection_error'
+        assert policy.retry_reason(MLServiceHTTPError("x", status_code=503)) == 'http_503'
+        assert policy.retry_reason(MLServiceHTTPError("x", status_code=400)) is None
+        assert policy.retry_reason(MLServiceTimeoutError()) is None
+
+    def test_timeout_retry_can_be_enabled(self):
+        """Test retry_on_timeout"""
+
+        policy = RetryPolicy(retry_on_timeout=True)
+
+        assert policy.retry_reason(MLServiceTimeoutError()) == 'timeout'
+
+    def test_backoff_is_jittered_and_capped(self, policy):
+        """Test full jitter between 0 and the capped exponential backoff"""
+
+        delays = [policy.backoff(retries) for retries in range(10) for _ in range(20)]
+
+        assert all(0 <= d <= 1.0 for d in delays)
+        assert len(set(delays)) > 1
+
+    def test_max_retries(self, policy):
+        """Test that retries stop after max_retries"""
+
+        deadline = policy.start()
+        error = MLServiceConnectionError()
+
+        assert all(policy.next_delay(error, n, deadline) is not None for n in range(3))
+        assert policy.next_delay(error, 3, deadline) is None
+        assert policy.stats()['retries_refused'] == {'max_retries': 1}
+
+    def test_no_retry_past_deadline(self, policy):
+        """Test that no retry starts when the deadline is too close"""
+
+        deadline = Deadline(0.01)
+
+        assert policy.next_delay(MLServiceConnectionError(), 0, deadline) is None
+        assert policy.stats()['retries_refused'] == {'deadline': 1}
+
+    def test_stats(self, policy):
+        """Test exported counters"""
+
+        deadline = policy.start()
+        policy.next_delay(MLServiceHTTPError("x", status_code=502), 0, deadline)
+
+        stats = policy.stats()
+        assert stats['requests'] == 1
+        assert stats['retries'] == 1
+        assert stats['retries_by_reason'] == {'http_502': 1}
+
+
+class TestRetryBudget:
+    """Tests for RetryBudget"""
+
+    def test_budget_is_a_fraction_of_requests(self):
+        """Test retries capped at min_retries + ratio * requests"""
+
+        budget = RetryBudget(ratio=0.1, min_retries=2)
+        for _ in range(50):
+            budget.record_request()
+
+        granted = sum(budget.try_acquire() for _ in range(20))
+
+        assert granted == 7
+        assert budget.stats()['exhausted'] == 13
+
+    def test_budget_window_slides(self):
+        """Test that old retries leave the window"""
+
+        budget = RetryBudget(ratio=0.0, window_s=0.05, min_retries=1)
+
+        assert budget.try_acquire() is True
+        assert budget.try_acquire() is False
+        time.sleep(0.06)
+        assert budget.try_acquire() is True
+
+
+class TestDeadline:
+    """Tests for Deadline"""
+
+    def test_attempt_timeout_capped(self):
+        """Test attempt timeout limited by what is left"""
+
+        deadline = Deadline(1.0)
+
+        assert deadline.timeout(30) <= 1.0
+        assert deadline.timeout(0.5) == 0.5
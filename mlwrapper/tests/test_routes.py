@@ -1,6 +1,8 @@
 import pytest
 from app import create_app
+from app.config import Config
 from unittest.mock import patch, MagicMock
+from app.exceptions import MLServiceCircuitOpenError
 
 
 @pytest.fixture
@@ -115,6 +117,27 @@ class TestPredictEndpoint:
             data = response.get_json()
             assert 'error' in data
 
+    def test_predict_circuit_open(self, client):
+        """Test that an open circuit answers 503 with Retry-After"""
+
+        with patch('app.routes.prediction_routes.get_client') as mock_get_client:
+            mock_ml_client = MagicMock()
+            mock_ml_client.predict.side_effect = MLServiceCircuitOpenError(retry_after=12.3)
+            mock_get_client.return_value = mock_ml_client
+
+            response = client.post('/predict', json={
+                "flightNumber": "AA1234",
+                "companyName": "AA",
+                "flightOrigin": "JFK",
+                "flightDestination": "LAX",
+                "flightDepartureDate": "2025-12-20T14:30:00",
+                "flightDistance": 3974
+            })
+
+            assert response.status_code == 503
+            assert response.headers['Retry-After'] == '13'
+            assert response.get_json()['error'] == 'ML service unavailable'
+
     def test_predict_uppercase_conversion(self, client):
         """Test that airport codes are converted to uppercase"""
 
@@ -202,3 +225,112 @@ class TestHealthEndpoint:
             data = response.get_json()
             assert data['status'] == 'DOWN'
             assert 'error' in data
+
+
+class TestMetricsEndpoint:
+    """Tests for /metrics endpoint"""
+
+    def test_metrics(self, client):
+        """Test that ML client metrics are exported"""
+
+        with patch('app.routes.prediction_routes.get_client') as mock_get_client:
+            mock_ml_client = MagicMock()
+            mock_ml_client.metrics.return_value = {"retries": {"retries": 2}}
+            mock_get_client.return_value = mock_ml_client
+
+            response = client.get('/metrics')
+
+            assert response.status_code == 200
+            data = response.get_json()
+            assert data['ml_client']['retries']['retries'] == 2
+            assert 'pid' in data
+            assert data['prediction_cache']['enabled'] is True
+
+
+class TestPredictionCache:
+    """Tests for the prediction response cache in /predict"""
+
+    FLIGHT = {
+        "flightNumber": "AA1234",
+        "companyName": "AA",
+        "flightOrigin": "JFK",
+        "flightDestination": "LAX",
+        "flightDepartureDate": "2025-12-20T14:30:00",
+        "flightDistance": 3974
+    }
+
+    @pytest.fixture
+    def ml_client(self):
+        with patch('app.routes.prediction_routes.get_client') as mock_get_client:
+            mock_ml_client = MagicMock()
+            mock_ml_client.predict.return_value = {"prediction": 1, "probability": 0.85}
+            mock_get_client.return_value = mock_ml_client
+            yield mock_ml_client
+
+    def test_repeated_request_is_served_from_cache(self, client, ml_client):
+        """Test that the same flight (other flight number, same minute) skips the ML service"""
+
+        first = client.post('/predict', json=self.FLIGHT)
+        second = client.post('/predict', json={
+            **self.FLIGHT, "flightNumber": "AA9999", "flightOrigin": "jfk",
+            "flightDepartureDate": "2025-12-20T14:30:45"})
+
+        assert first.headers['X-Cache'] == 'MISS'
+        assert second.headers['X-Cache'] == 'HIT'
+        assert second.get_json() == {"prediction": 1, "confidence": 0.85}
+        assert ml_client.predict.call_count == 1
+
+    def test_bypass_with_no_cache(self, client, ml_client, prediction_cache):
+        """Test that Cache-Control: no-cache goes to the ML service"""
+
+        client.post('/predict', json=self.FLIGHT)
+        response = client.post('/predict', json=self.FLIGHT, headers={'Cache-Control': 'no-cache'})
+
+        assert response.headers['X-Cache'] == 'BYPASS'
+        assert ml_client.predict.call_count == 2
+        assert prediction_cache.stats()['bypassed'] == 1
+
+    def test_errors_are_not_cached(self, client, ml_client):
+        """Test that a failed prediction is asked again"""
+
+        ml_client.predict.side_effect = [Exception("boom"), {"prediction": 0, "probability": 0.7}]
+
+        assert client.post('/predict', json=self.FLIGHT).status_code == 500
+        response = client.post('/predict', json=self.FLIGHT)
+
+        assert response.status_code == 200
+        assert response.headers['X-Cache'] == 'MISS'
+
+    def test_invalidate(self, client, ml_client, monkeypatch):
+        """Test DELETE /cache for one route"""
+
+        monkeypatch.setattr(Config, 'ADMIN_TOKEN', 'secret')
+        client.post('/predict', json=self.FLIGHT)
+        client.post('/predict', json={**self.FLIGHT, "flightDestination": "SFO"})
+
+        response = client.delete('/cache?origin=jfk&destination=lax',
+                                 headers={'X-Admin-Token': 'secret'})
+
+        assert response.get_json() == {"invalidated": 1}
+        assert client.post('/predict', json=self.FLIGHT).headers['X-Cache'] == 'MISS'
+        assert client.post('/predict', json={
+            **self.FLIGHT, "flightDestination": "SFO"}).headers['X-Cache'] == 'HIT'
+
+    @pytest.mark.parametrize('admin_token, header', [
+        (None, None),
+        (None, 'secret'),
+        ('secret', None),
+        ('secret', 'wrong')
+    ])
+    def test_invalidate_requires_admin_token(self, client, ml_client, monkeypatch,
+                                             prediction_cache, admin_token, header):
+        """Test that DELETE /cache is refused without the right X-Admin-Token"""
+
+        monkeypatch.setattr(Config, 'ADMIN_TOKEN', admin_token)
+        client.post('/predict', json=self.FLIGHT)
+
+        headers = {'X-Admin-Token': header} if header is not None else {}
+        response = client.delete('/cache', headers=headers)
+
+        assert response.status_code == 403
+        assert len(prediction_cache) == 1